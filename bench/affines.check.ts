@@ -0,0 +1,35 @@
+import { buildDicomVolumes, parseDicomSlice } from "../src/loaders/dicom";
+import { loadNiftiVolume } from "../src/loaders/nifti";
+import { sourceFromTargetTransform } from "../src/resampling";
+import { syntheticDicomSeries, syntheticNifti } from "./fixtures";
+
+const IDENTITY = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0];
+
+// The synthetic series sits on the LPS identity grid; the same grid written
+// as a NIfTI sform is RAS with x and y flipped. Both loaders must agree, so
+// resampling one onto the other is the identity transform.
+export function checkDicomNiftiAffines(width = 8, height = 8, depth = 4) {
+    const [dicom] = buildDicomVolumes(
+        syntheticDicomSeries(width, height, depth).map((file) =>
+            parseDicomSlice(file),
+        ),
+    );
+    const nifti = loadNiftiVolume(
+        syntheticNifti(width, height, depth, {
+            sform: [-1, 0, 0, 0, 0, -1, 0, 0, 0, 0, 1, 0],
+        }),
+    );
+    const transform = sourceFromTargetTransform(dicom, nifti);
+
+    if (
+        transform.some(
+            (value, index) => Math.abs(value - IDENTITY[index]) > 1e-6,
+        )
+    ) {
+        throw new Error(
+            `DICOM and NIfTI affines disagree on the same grid: [${transform.join(", ")}]`,
+        );
+    }
+
+    console.log("\nDICOM/NIfTI affine check passed");
+}
@@ -0,0 +1,55 @@
+import dicomParser from "dicom-parser";
+import { pixelArray } from "../src/loaders/dicom";
+import { syntheticDicomSeries } from "./fixtures";
+import { formatMs, measure } from "./harness";
+
+function legacyPixelArray(
+    dataSet: dicomParser.DataSet,
+    rows: number,
+    columns: number,
+) {
+    const pixelElement = dataSet.elements.x7fe00010;
+    const pixelRepresentation = dataSet.uint16("x00280103") ?? 0;
+    const pixelCount = rows * columns;
+    const output =
+        pixelRepresentation === 1
+            ? new Int16Array(pixelCount)
+            : new Uint16Array(pixelCount);
+
+    for (let index = 0; index < pixelCount; index += 1) {
+        const dataOffset = pixelElement.dataOffset + index * 2;
+        output[index] =
+            pixelRepresentation === 1
+                ? dataSet.byteArrayParser.readInt16(
+                      dataSet.byteArray,
+                      dataOffset,
+                  )
+                : dataSet.byteArrayParser.readUint16(
+                      dataSet.byteArray,
+                      dataOffset,
+                  );
+    }
+
+    return output;
+}
+
+export function runDicomPixelBenchmarks(size = 512, iterations = 50) {
+    const [file] = syntheticDicomSeries(size, size, 1);
+    const dataSet = dicomParser.parseDicom(file.bytes);
+    const legacy = measure(
+        "legacy",
+        () => legacyPixelArray(dataSet, size, size),
+        { iterations },
+    );
+    const typed = measure("typed", () => pixelArray(dataSet, size, size), {
+        iterations,
+    });
+    const speedup = legacy.medianMs / Math.max(typed.medianMs, 1e-6);
+
+    console.log(`\nDICOM pixel decode ${size}x${size} int16 (median/slice)`);
+    console.log(
+        `  ${formatMs(legacy.medianMs).padStart(11)} -> ${formatMs(typed.medianMs).padStart(11)}  x${speedup.toFixed(1)}`,
+    );
+
+    return { legacy, typed, speedup };
+}
@@ -0,0 +1,228 @@
+import { gzipSync } from "node:zlib";
+import type { MedicalFile } from "../src/types";
+import {
+    SYNTHETIC_RESCALE_INTERCEPT,
+    syntheticStoredVoxels,
+} from "./synthetic";
+
+type DicomElement = {
+    tag: number;
+    vr: string;
+    value: Uint8Array;
+};
+
+const LONG_LENGTH_VRS = new Set(["OB", "OW", "OF", "SQ", "UT", "UN"]);
+const EXPLICIT_VR_LITTLE_ENDIAN = "1.2.840.10008.1.2.1";
+const CT_IMAGE_STORAGE = "1.2.840.10008.5.1.4.1.1.2";
+const textEncoder = new TextEncoder();
+
+function bytesOf(data: ArrayBufferView) {
+    return new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+}
+
+function concatBytes(parts: Uint8Array[]) {
+    const output = new Uint8Array(
+        parts.reduce((total, part) => total + part.byteLength, 0),
+    );
+    let offset = 0;
+
+    for (const part of parts) {
+        output.set(part, offset);
+        offset += part.byteLength;
+    }
+
+    return output;
+}
+
+function textElement(tag: number, vr: string, text: string): DicomElement {
+    const padding = vr === "UI" ? "\0" : " ";
+    const value = text.length % 2 === 0 ? text : `${text}${padding}`;
+    return { tag, vr, value: textEncoder.encode(value) };
+}
+
+function unsignedShortElement(tag: number, value: number): DicomElement {
+    return { tag, vr: "US", value: bytesOf(new Uint16Array([value])) };
+}
+
+function encodeElement({ tag, vr, value }: DicomElement) {
+    const longLength = LONG_LENGTH_VRS.has(vr);
+    const header = new DataView(new ArrayBuffer(longLength ? 12 : 8));
+
+    header.setUint16(0, tag >>> 16, true);
+    header.setUint16(2, tag & 0xffff, true);
+    header.setUint8(4, vr.charCodeAt(0));
+    header.setUint8(5, vr.charCodeAt(1));
+
+    if (longLength) {
+        header.setUint32(8, value.byteLength, true);
+    } else {
+        header.setUint16(6, value.byteLength, true);
+    }
+
+    return concatBytes([new Uint8Array(header.buffer), value]);
+}
+
+function dicomFileBytes(elements: DicomElement[], sopInstanceUid: string) {
+    const metaElements = [
+        { tag: 0x00020001, vr: "OB", value: new Uint8Array([0, 1]) },
+        textElement(0x00020002, "UI", CT_IMAGE_STORAGE),
+        textElement(0x00020003, "UI", sopInstanceUid),
+        textElement(0x00020010, "UI", EXPLICIT_VR_LITTLE_ENDIAN),
+    ].map(encodeElement);
+    const metaLength = metaElements.reduce(
+        (total, element) => total + element.byteLength,
+        0,
+    );
+    const groupLength = encodeElement({
+        tag: 0x00020000,
+        vr: "UL",
+        value: bytesOf(new Uint32Array([metaLength])),
+    });
+
+    return concatBytes([
+        new Uint8Array(128),
+        textEncoder.encode("DICM"),
+        groupLength,
+        ...metaElements,
+        ...elements.map(encodeElement),
+    ]);
+}
+
+export function syntheticDicomSeries(
+    width: number,
+    height: number,
+    depth: number,
+): MedicalFile[] {
+    const voxels = syntheticStoredVoxels(width, height, depth);
+    const planeSize = width * height;
+    const studyUid = "1.2.826.0.1.3680043.10.1";
+    const seriesUid = `${studyUid}.1`;
+
+    return Array.from({ length: depth }, (_, slice) => {
+        const sopInstanceUid = `${seriesUid}.${slice + 1}`;
+        const pixels = voxels.subarray(
+            slice * planeSize,
+            (slice + 1) * planeSize,
+        );
+        const bytes = dicomFileBytes(
+            [
+                textElement(0x00080018, "UI", sopInstanceUid),
+                textElement(0x00080060, "CS", "CT"),
+                textElement(0x00100020, "LO", "BENCH"),
+                textElement(0x0020000d, "UI", studyUid),
+                textElement(0x0020000e, "UI", seriesUid),
+                textElement(0x00200011, "IS", "1"),
+                textElement(0x00200013, "IS", String(slice + 1)),
+                textElement(0x00200032, "DS", `0\\0\\${slice}`),
+                textElement(0x00200037, "DS", "1\\0\\0\\0\\1\\0"),
+                unsignedShortElement(0x00280002, 1),
+                textElement(0x00280004, "CS", "MONOCHROME2"),
+                unsignedShortElement(0x00280010, height),
+                unsignedShortElement(0x00280011, width),
+                textElement(0x00280030, "DS", "1\\1"),
+                unsignedShortElement(0x00280100, 16),
+                unsignedShortElement(0x00280101, 16),
+                unsignedShortElement(0x00280102, 15),
+                unsignedShortElement(0x00280103, 1),
+                textElement(0x00281050, "DS", "40"),
+                textElement(0x00281051, "DS", "400"),
+                textElement(
+                    0x00281052,
+                    "DS",
+                    String(SYNTHETIC_RESCALE_INTERCEPT),
+                ),
+                textElement(0x00281053, "DS", "1"),
+                { tag: 0x7fe00010, vr: "OW", value: bytesOf(pixels) },
+            ],
+            sopInstanceUid,
+        );
+        const name = `slice-${String(slice + 1).padStart(4, "0")}.dcm`;
+
+        return { path: `bench/series/${name}`, name, bytes };
+    });
+}
+
+export function syntheticNifti(
+    width: number,
+    height: number,
+    depth: number,
+    {
+        compressed = false,
+        sform,
+    }: {
+        compressed?: boolean;
+        // Row-major 3x4 voxel-to-RAS transform written as sform_code 1.
+        sform?: number[];
+    } = {},
+): MedicalFile {
+    const voxels = bytesOf(syntheticStoredVoxels(width, height, depth));
+    const voxelOffset = 352;
+    const header = new DataView(new ArrayBuffer(voxelOffset));
+
+    header.setInt32(0, 348, true);
+    [3, width, height, depth, 1, 1, 1, 1].forEach((value, index) =>
+        header.setInt16(40 + index * 2, value, true),
+    );
+    header.setInt16(70, 4, true);
+    header.setInt16(72, 16, true);
+    for (let index = 0; index < 8; index += 1) {
+        header.setFloat32(76 + index * 4, 1, true);
+    }
+    header.setFloat32(108, voxelOffset, true);
+    header.setFloat32(112, 1, true);
+    header.setFloat32(116, SYNTHETIC_RESCALE_INTERCEPT, true);
+    if (sform) {
+        header.setInt16(254, 1, true);
+        sform.forEach((value, index) =>
+            header.setFloat32(280 + index * 4, value, true),
+        );
+    }
+    textEncoder
+        .encode("n+1\0")
+        .forEach((value, index) => header.setUint8(344 + index, value));
+
+    const raw = concatBytes([new Uint8Array(header.buffer), voxels]);
+    const name = compressed ? "bench.nii.gz" : "bench.nii";
+
+    return {
+        path: `bench/${name}`,
+        name,
+        bytes: compressed ? new Uint8Array(gzipSync(raw)) : raw,
+    };
+}
+
+export function syntheticNpy(
+    width: number,
+    height: number,
+    depth: number,
+    channels = 1,
+): MedicalFile {
+    const voxels = syntheticStoredVoxels(width, height, depth * channels);
+    const shape =
+        channels > 1
+            ? `${channels}, ${depth}, ${height}, ${width}`
+            : `${depth}, ${height}, ${width}`;
+    const dictionary = `{'descr': '<i2', 'fortran_order': False, 'shape': (${shape}), }`;
+    const paddedLength = Math.ceil((10 + dictionary.length + 1) / 64) * 64;
+    const headerText = `${dictionary.padEnd(paddedLength - 10 - 1)}\n`;
+    const preamble = new DataView(new ArrayBuffer(10));
+
+    [0x93, ...textEncoder.encode("NUMPY")].forEach((value, index) =>
+        preamble.setUint8(index, value),
+    );
+    preamble.setUint8(6, 1);
+    preamble.setUint8(7, 0);
+    preamble.setUint16(8, headerText.length, true);
+
+    const name = channels > 1 ? "bench-4d.npy" : "bench.npy";
+
+    return {
+        path: `bench/${name}`,
+        name,
+        bytes: concatBytes([
+            new Uint8Array(preamble.buffer),
+            textEncoder.encode(headerText),
+            bytesOf(voxels),
+        ]),
+    };
+}
@@ -0,0 +1,106 @@
+export type BenchmarkSample = {
+    name: string;
+    iterations: number;
+    meanMs: number;
+    medianMs: number;
+    minMs: number;
+};
+
+export type StageResult = BenchmarkSample & {
+    voxels: number;
+    bytes: number;
+    voxelsPerSecond: number;
+    megabytesPerSecond: number;
+    heapGrowthMB: number;
+    peakRssMB: number;
+};
+
+export type MeasureOptions = {
+    iterations?: number;
+    warmup?: number;
+};
+
+export function measure(
+    name: string,
+    run: () => void,
+    { iterations = 20, warmup = 3 }: MeasureOptions = {},
+): BenchmarkSample {
+    for (let index = 0; index < warmup; index += 1) {
+        run();
+    }
+
+    const durations: number[] = [];
+    for (let index = 0; index < iterations; index += 1) {
+        const start = performance.now();
+        run();
+        durations.push(performance.now() - start);
+    }
+
+    durations.sort((left, right) => left - right);
+
+    return {
+        name,
+        iterations,
+        meanMs:
+            durations.reduce((total, value) => total + value, 0) /
+            durations.length,
+        medianMs: durations[Math.floor(durations.length / 2)],
+        minMs: durations[0],
+    };
+}
+
+export function formatMs(value: number) {
+    return `${value.toFixed(2)} ms`;
+}
+
+export type StageOptions = MeasureOptions & {
+    voxels: number;
+    bytes: number;
+};
+
+const MEGABYTE = 1024 * 1024;
+
+function memoryInUse() {
+    const usage = process.memoryUsage();
+    return usage.heapUsed + usage.arrayBuffers;
+}
+
+export function measureStage(
+    name: string,
+    run: () => unknown,
+    { voxels, bytes, ...options }: StageOptions,
+): StageResult {
+    const baseline = memoryInUse();
+    let peak = baseline;
+    const sample = measure(
+        name,
+        () => {
+            run();
+            peak = Math.max(peak, memoryInUse());
+        },
+        options,
+    );
+    const seconds = Math.max(sample.medianMs, 1e-6) / 1000;
+
+    return {
+        ...sample,
+        voxels,
+        bytes,
+        voxelsPerSecond: voxels / seconds,
+        megabytesPerSecond: bytes / MEGABYTE / seconds,
+        heapGrowthMB: (peak - baseline) / MEGABYTE,
+        peakRssMB: process.resourceUsage().maxRSS / 1024,
+    };
+}
+
+export function formatStage(result: StageResult) {
+    const megavoxels = (result.voxelsPerSecond / 1e6).toFixed(1);
+    return [
+        result.name.padEnd(32),
+        formatMs(result.medianMs).padStart(11),
+        `${megavoxels} Mvox/s`.padStart(14),
+        `${result.megabytesPerSecond.toFixed(1)} MB/s`.padStart(13),
+        `+${result.heapGrowthMB.toFixed(0)} MB heap`.padStart(14),
+        `${result.peakRssMB.toFixed(0)} MB rss`.padStart(12),
+    ].join(" ");
+}
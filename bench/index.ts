@@ -0,0 +1,47 @@
+import { mkdirSync, writeFileSync } from "node:fs";
+import { dirname } from "node:path";
+import { checkDicomNiftiAffines } from "./affines.check";
+import { runDicomPixelBenchmarks } from "./dicomPixels.bench";
+import { runLoaderBenchmarks } from "./loaders.bench";
+import { runRenderingBenchmarks } from "./rendering.bench";
+
+function argumentValue(name: string) {
+    const index = process.argv.indexOf(name);
+    return index >= 0 ? process.argv[index + 1] : undefined;
+}
+
+function parseSize(text = "256x256x64") {
+    const [width, height, depth] = text.split("x").map(Number);
+
+    if (![width, height, depth].every((value) => value > 0)) {
+        throw new Error(`Invalid --size ${text}; expected WIDTHxHEIGHTxDEPTH.`);
+    }
+
+    return { width, height, depth };
+}
+
+const size = parseSize(argumentValue("--size"));
+const iterations = Number(argumentValue("--iterations") ?? 5);
+const outputPath = argumentValue("--json") ?? "dist-bench/results.json";
+checkDicomNiftiAffines();
+const rendering = runRenderingBenchmarks();
+const dicomPixels = runDicomPixelBenchmarks();
+const stages = runLoaderBenchmarks({ ...size, iterations });
+
+mkdirSync(dirname(outputPath), { recursive: true });
+writeFileSync(
+    outputPath,
+    `${JSON.stringify(
+        {
+            node: process.version,
+            size,
+            iterations,
+            stages,
+            rendering,
+            dicomPixels,
+        },
+        null,
+        2,
+    )}\n`,
+);
+console.log(`\nResults written to ${outputPath}`);
@@ -0,0 +1,153 @@
+import { measureCompareStats } from "../src/compareStats";
+import {
+    buildDicomVolumes,
+    parseDicomSlice,
+    type DicomSlice,
+} from "../src/loaders/dicom";
+import { loadNiftiVolume } from "../src/loaders/nifti";
+import { loadNpyVolume } from "../src/loaders/npy";
+import {
+    getSliceCount,
+    getSliceSize,
+    renderSliceToCanvas,
+    type RenderCanvas,
+} from "../src/rendering";
+import type { Axis, MedicalFile } from "../src/types";
+import { syntheticDicomSeries, syntheticNifti, syntheticNpy } from "./fixtures";
+import { formatStage, measureStage, type StageResult } from "./harness";
+import { syntheticVolume } from "./synthetic";
+
+export type LoaderBenchmarkOptions = {
+    width: number;
+    height: number;
+    depth: number;
+    iterations: number;
+};
+
+const axes: Axis[] = ["axial", "coronal", "sagittal"];
+
+function totalBytes(files: MedicalFile[]) {
+    return files.reduce((total, file) => total + file.bytes.byteLength, 0);
+}
+
+function benchmarkCanvas(): RenderCanvas {
+    const context = {
+        createImageData: (width: number, height: number) => ({
+            data: new Uint8ClampedArray(width * height * 4),
+            width,
+            height,
+            colorSpace: "srgb",
+        }),
+        putImageData: () => undefined,
+    } as unknown as CanvasImageData;
+
+    return { width: 0, height: 0, getContext: () => context };
+}
+
+export function runLoaderBenchmarks({
+    width,
+    height,
+    depth,
+    iterations,
+}: LoaderBenchmarkOptions) {
+    const voxels = width * height * depth;
+    const volumeBytes = voxels * Int16Array.BYTES_PER_ELEMENT;
+    const series = syntheticDicomSeries(width, height, depth);
+    const seriesBytes = totalBytes(series);
+    const nifti = syntheticNifti(width, height, depth);
+    const compressedNifti = syntheticNifti(width, height, depth, {
+        compressed: true,
+    });
+    const npy = syntheticNpy(width, height, depth);
+    const slices: DicomSlice[] = series.map((file) => parseDicomSlice(file));
+    const first = syntheticVolume(width, height, depth);
+    const second = syntheticVolume(width, height, depth, {
+        id: "synthetic:second",
+        rescaleIntercept: -1000,
+    });
+    const canvas = benchmarkCanvas();
+    const options = { iterations, warmup: 1 };
+    const results: StageResult[] = [
+        measureStage(
+            "parseDicomSlice (series)",
+            () => series.map((file) => parseDicomSlice(file)),
+            { ...options, voxels, bytes: seriesBytes },
+        ),
+        measureStage(
+            "parseDicomSlice (header only)",
+            () =>
+                series.map((file) =>
+                    parseDicomSlice(file, { headerOnly: true }),
+                ),
+            { ...options, voxels, bytes: seriesBytes },
+        ),
+        measureStage("buildDicomVolumes", () => buildDicomVolumes(slices), {
+            ...options,
+            voxels,
+            bytes: volumeBytes,
+        }),
+        measureStage("loadNiftiVolume (.nii)", () => loadNiftiVolume(nifti), {
+            ...options,
+            voxels,
+            bytes: nifti.bytes.byteLength,
+        }),
+        measureStage(
+            "loadNiftiVolume (.nii.gz)",
+            () => loadNiftiVolume(compressedNifti),
+            { ...options, voxels, bytes: compressedNifti.bytes.byteLength },
+        ),
+        measureStage("loadNpyVolume", () => loadNpyVolume(npy), {
+            ...options,
+            voxels,
+            bytes: npy.bytes.byteLength,
+        }),
+        measureStage(
+            "measureCompareStats",
+            () =>
+                measureCompareStats(
+                    { first, second, dataRange: first.max - first.min },
+                    () => undefined,
+                ),
+            { ...options, voxels, bytes: volumeBytes * 2 },
+        ),
+    ];
+
+    for (const axis of axes) {
+        const size = getSliceSize(first, axis);
+        const slice = Math.floor(getSliceCount(first, axis) / 2);
+        const pixels = size.width * size.height;
+
+        results.push(
+            measureStage(
+                `renderSliceToCanvas (${axis})`,
+                () =>
+                    renderSliceToCanvas(
+                        canvas,
+                        first,
+                        axis,
+                        slice,
+                        first.windowCenter,
+                        first.windowWidth,
+                        {
+                            colorMap: "grayscale",
+                            clipMin: first.min,
+                            clipMax: first.max,
+                        },
+                    ),
+                {
+                    iterations: iterations * 10,
+                    warmup: 3,
+                    voxels: pixels,
+                    bytes: pixels * Int16Array.BYTES_PER_ELEMENT,
+                },
+            ),
+        );
+    }
+
+    console.log(`\nLoaders and renderer ${width}x${height}x${depth} (median)`);
+    for (const result of results) {
+        console.log(`  ${formatStage(result)}`);
+    }
+
+    return results;
+}
@@ -0,0 +1,214 @@
+import {
+    colorFromMap,
+    getSliceSize,
+    getVoxel,
+    renderSliceToImageData,
+    type RenderTarget,
+    type RenderVisualizationOptions,
+} from "../src/rendering";
+import type {
+    Axis,
+    LoadedVolume,
+    VisualizationColorMap,
+} from "../src/types";
+import { formatMs, measure, type BenchmarkSample } from "./harness";
+import { syntheticVolume } from "./synthetic";
+
+export type RenderingComparison = {
+    name: string;
+    legacy: BenchmarkSample;
+    lookup: BenchmarkSample;
+    speedup: number;
+};
+
+const colorMaps: VisualizationColorMap[] = [
+    "grayscale",
+    "hot",
+    "viridis",
+    "jet",
+];
+
+function writePixel(
+    target: RenderTarget,
+    pixelIndex: number,
+    red: number,
+    green: number,
+    blue: number,
+) {
+    target.data[pixelIndex] = red;
+    target.data[pixelIndex + 1] = green;
+    target.data[pixelIndex + 2] = blue;
+    target.data[pixelIndex + 3] = 255;
+}
+
+function legacyRenderSlice(
+    target: RenderTarget,
+    volume: LoadedVolume,
+    axis: Axis,
+    slice: number,
+    windowCenter: number,
+    windowWidth: number,
+    visualization: RenderVisualizationOptions,
+) {
+    const low = windowCenter - windowWidth / 2;
+    const high = windowCenter + windowWidth / 2;
+    const clipLow = Math.min(visualization.clipMin, visualization.clipMax);
+    const clipHigh = Math.max(visualization.clipMin, visualization.clipMax);
+    const effectiveLow = Math.max(low, clipLow);
+    const effectiveHigh = Math.min(high, clipHigh);
+    const rangeLow =
+        effectiveLow < effectiveHigh ? effectiveLow : Math.min(low, high);
+    const rangeHigh =
+        effectiveLow < effectiveHigh ? effectiveHigh : Math.max(low, high);
+    const safeRange = Math.max(rangeHigh - rangeLow, 1);
+    const maxAbsDifference = Math.max(
+        Math.abs(volume.min),
+        Math.abs(volume.max),
+        1,
+    );
+
+    for (let row = 0; row < target.height; row += 1) {
+        for (let column = 0; column < target.width; column += 1) {
+            const depthRow = volume.dimensions[2] - 1 - row;
+            const value =
+                axis === "axial"
+                    ? getVoxel(volume, column, row, slice)
+                    : axis === "coronal"
+                      ? getVoxel(volume, column, slice, depthRow)
+                      : getVoxel(volume, slice, column, depthRow);
+            const clippedValue = Math.min(Math.max(value, rangeLow), rangeHigh);
+            const normalized = (clippedValue - rangeLow) / safeRange;
+            const pixelIndex = (row * target.width + column) * 4;
+
+            if (volume.renderMode === "difference") {
+                const magnitude = Math.min(
+                    Math.abs(value) / maxAbsDifference,
+                    1,
+                );
+                const channelFloor = Math.round(255 * (1 - magnitude));
+                if (value > 0) {
+                    writePixel(
+                        target,
+                        pixelIndex,
+                        255,
+                        channelFloor,
+                        channelFloor,
+                    );
+                } else if (value < 0) {
+                    writePixel(
+                        target,
+                        pixelIndex,
+                        channelFloor,
+                        channelFloor,
+                        255,
+                    );
+                } else {
+                    writePixel(target, pixelIndex, 255, 255, 255);
+                }
+                continue;
+            }
+
+            const pixel = colorFromMap(visualization.colorMap, normalized);
+            writePixel(
+                target,
+                pixelIndex,
+                pixel.red,
+                pixel.green,
+                pixel.blue,
+            );
+        }
+    }
+}
+
+function createTarget(volume: LoadedVolume, axis: Axis): RenderTarget {
+    const { width, height } = getSliceSize(volume, axis);
+    return { data: new Uint8ClampedArray(width * height * 4), width, height };
+}
+
+function compare(
+    name: string,
+    volume: LoadedVolume,
+    visualization: RenderVisualizationOptions,
+    iterations: number,
+): RenderingComparison {
+    const target = createTarget(volume, "axial");
+    const slice = Math.floor(volume.dimensions[2] / 2);
+    let windowCenter = volume.windowCenter;
+
+    const legacy = measure(
+        `${name} (per-pixel)`,
+        () => {
+            windowCenter += 1;
+            legacyRenderSlice(
+                target,
+                volume,
+                "axial",
+                slice,
+                windowCenter,
+                volume.windowWidth,
+                visualization,
+            );
+        },
+        { iterations },
+    );
+    const lookup = measure(
+        `${name} (lookup table)`,
+        () => {
+            windowCenter += 1;
+            renderSliceToImageData(
+                target,
+                volume,
+                "axial",
+                slice,
+                windowCenter,
+                volume.windowWidth,
+                visualization,
+            );
+        },
+        { iterations },
+    );
+
+    return {
+        name,
+        legacy,
+        lookup,
+        speedup: legacy.medianMs / Math.max(lookup.medianMs, 1e-6),
+    };
+}
+
+export function runRenderingBenchmarks(size = 512, iterations = 30) {
+    const volume = syntheticVolume(size, size, 8);
+    const differenceVolume = syntheticVolume(size, size, 8, {
+        renderMode: "difference",
+    });
+    const results = colorMaps.map((colorMap) =>
+        compare(
+            colorMap,
+            volume,
+            { colorMap, clipMin: volume.min, clipMax: volume.max },
+            iterations,
+        ),
+    );
+
+    results.push(
+        compare(
+            "difference",
+            differenceVolume,
+            {
+                colorMap: "grayscale",
+                clipMin: differenceVolume.min,
+                clipMax: differenceVolume.max,
+            },
+            iterations,
+        ),
+    );
+
+    console.log(`\nrenderSliceToImageData ${size}x${size} (median)`);
+    for (const result of results) {
+        console.log(
+            `  ${result.name.padEnd(12)} ${formatMs(result.legacy.medianMs).padStart(11)} -> ${formatMs(result.lookup.medianMs).padStart(11)}  x${result.speedup.toFixed(1)}`,
+        );
+    }
+
+    return results;
+}
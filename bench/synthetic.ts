@@ -0,0 +1,58 @@
+import type { LoadedVolume } from "../src/types";
+import { getVoxelRange } from "../src/voxels";
+
+export const SYNTHETIC_RESCALE_INTERCEPT = -1024;
+
+export function syntheticStoredVoxels(
+    width: number,
+    height: number,
+    depth: number,
+) {
+    const data = new Int16Array(width * height * depth);
+    const centerX = width / 2;
+    const centerY = height / 2;
+
+    for (let z = 0; z < depth; z += 1) {
+        for (let y = 0; y < height; y += 1) {
+            for (let x = 0; x < width; x += 1) {
+                const radius = Math.hypot(x - centerX, y - centerY);
+                const value = Math.round(
+                    1000 * Math.cos(radius / 24 + z / 8) - 200,
+                );
+                data[(z * height + y) * width + x] =
+                    value - SYNTHETIC_RESCALE_INTERCEPT;
+            }
+        }
+    }
+
+    return data;
+}
+
+export function syntheticVolume(
+    width: number,
+    height: number,
+    depth: number,
+    overrides: Partial<LoadedVolume> = {},
+): LoadedVolume {
+    const data = syntheticStoredVoxels(width, height, depth);
+    const rescaleIntercept = SYNTHETIC_RESCALE_INTERCEPT;
+    const { min, max } = getVoxelRange(data, 1, rescaleIntercept);
+
+    return {
+        id: `synthetic:${width}x${height}x${depth}`,
+        name: "Synthetic",
+        format: "NPY",
+        patientId: "Synthetic",
+        studyId: "Synthetic",
+        seriesId: "Synthetic",
+        dimensions: [width, height, depth],
+        data,
+        rescaleSlope: 1,
+        rescaleIntercept,
+        windowCenter: 40,
+        windowWidth: 400,
+        min,
+        max,
+        ...overrides,
+    };
+}
@@ -0,0 +1,16 @@
+import { defineConfig } from "vite";
+import { fileURLToPath, URL } from "node:url";
+
+export default defineConfig({
+    build: {
+        ssr: fileURLToPath(new URL("./index.ts", import.meta.url)),
+        outDir: "dist-bench",
+        emptyOutDir: true,
+        target: "node20",
+        rollupOptions: {
+            output: {
+                entryFileNames: "[name].js",
+            },
+        },
+    },
+});
@@ -1,9 +1,22 @@
-import { app, BrowserWindow, dialog, ipcMain } from "electron";
-import { readFile, readdir, stat } from "node:fs/promises";
+import {
+    app,
+    BrowserWindow,
+    dialog,
+    ipcMain,
+    MessageChannelMain,
+    type MessagePortMain,
+} from "electron";
+import { open, readFile, readdir, stat } from "node:fs/promises";
 import { basename, dirname, extname, join } from "node:path";
 import { fileURLToPath } from "node:url";
+import { mapConcurrent } from "../src/loaders/readScheduler";
+import type { CachedVolumeData, Volume } from "../src/types";
+import { volumeSourcePaths } from "../src/voxels";
+import { createVolumeCache, type VolumeCache } from "./volumeCache";
 
 const supportedExtensions = new Set([".dcm", ".dicom", ".nii", ".npy"]);
+const FILE_SYSTEM_CONCURRENCY = 32;
+const VOLUME_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024;
 const selectedMedicalFiles = new Set<string>();
 
 function isSupportedMedicalPath(path: string) {
@@ -14,25 +27,79 @@ function isSupportedMedicalPath(path: string) {
     );
 }
 
-async function collectFiles(paths: string[]): Promise<string[]> {
-    const collected: string[] = [];
+type CollectedFile = {
+    path: string;
+    name: string;
+    size: number;
+};
 
-    for (const targetPath of paths) {
-        const info = await stat(targetPath);
+type CollectedEntry = {
+    file?: CollectedFile;
+    nested?: string[];
+};
 
-        if (info.isDirectory()) {
-            const entries = await readdir(targetPath);
-            const nested = entries.map((entry) => join(targetPath, entry));
-            collected.push(...(await collectFiles(nested)));
-            continue;
-        }
+async function collectEntry(targetPath: string): Promise<CollectedEntry> {
+    const info = await stat(targetPath);
 
-        if (isSupportedMedicalPath(targetPath)) {
-            collected.push(targetPath);
-        }
+    if (info.isDirectory()) {
+        const entries = await readdir(targetPath);
+        return { nested: entries.map((entry) => join(targetPath, entry)) };
+    }
+
+    return isSupportedMedicalPath(targetPath)
+        ? {
+              file: {
+                  path: targetPath,
+                  name: basename(targetPath),
+                  size: info.size,
+              },
+          }
+        : {};
+}
+
+async function collectFiles(paths: string[]): Promise<CollectedFile[]> {
+    const collected: CollectedFile[] = [];
+    let pending = paths;
+
+    while (pending.length > 0) {
+        const entries = await mapConcurrent(
+            pending,
+            FILE_SYSTEM_CONCURRENCY,
+            collectEntry,
+        );
+        pending = entries.flatMap((entry) => entry.nested ?? []);
+        collected.push(
+            ...entries.flatMap((entry) => (entry.file ? [entry.file] : [])),
+        );
+    }
+
+    return collected.sort((left, right) =>
+        left.path.localeCompare(right.path),
+    );
+}
+
+type MedicalFileChannelRequest = {
+    requestId: number;
+    path?: string;
+    cacheKey?: string;
+    offset?: number;
+    length?: number;
+};
+
+function assertSelectedMedicalPath(path: string) {
+    if (!selectedMedicalFiles.has(path) || !isSupportedMedicalPath(path)) {
+        throw new Error("The requested file was not selected.");
     }
+}
 
-    return collected.sort((left, right) => left.localeCompare(right));
+function exactArrayBuffer(buffer: Buffer) {
+    return buffer.byteOffset === 0 &&
+        buffer.byteLength === buffer.buffer.byteLength
+        ? buffer.buffer
+        : buffer.buffer.slice(
+              buffer.byteOffset,
+              buffer.byteOffset + buffer.byteLength,
+          );
 }
 
 async function readMedicalFile(path: string) {
@@ -44,6 +111,87 @@ async function readMedicalFile(path: string) {
     };
 }
 
+async function readMedicalFileRange(
+    path: string,
+    offset: number,
+    length: number,
+) {
+    if (
+        !Number.isSafeInteger(offset) ||
+        !Number.isSafeInteger(length) ||
+        offset < 0 ||
+        length < 0
+    ) {
+        throw new Error("The requested file range is invalid.");
+    }
+
+    const handle = await open(path, "r");
+
+    try {
+        const buffer = Buffer.alloc(length);
+        const { bytesRead } = await handle.read(buffer, 0, length, offset);
+        return buffer.subarray(0, bytesRead);
+    } finally {
+        await handle.close();
+    }
+}
+
+function assertSelectedVolumeSources(volume: Volume) {
+    const paths = volumeSourcePaths(volume);
+    if (paths.length === 0) {
+        throw new Error("The volume has no source files.");
+    }
+    paths.forEach(assertSelectedMedicalPath);
+}
+
+function serveMedicalFileChannel(port: MessagePortMain, cache: VolumeCache) {
+    port.on("message", async (event) => {
+        const { requestId, path, cacheKey, offset, length } =
+            event.data as MedicalFileChannelRequest;
+
+        try {
+            if (cacheKey !== undefined) {
+                const { dataType, bytes } = await cache.read(cacheKey);
+                port.postMessage({
+                    requestId,
+                    dataType,
+                    bytes: exactArrayBuffer(bytes),
+                });
+                return;
+            }
+
+            if (path === undefined) {
+                throw new Error("The request did not name a file.");
+            }
+
+            assertSelectedMedicalPath(path);
+            const buffer =
+                offset !== undefined && length !== undefined
+                    ? await readMedicalFileRange(path, offset, length)
+                    : await readFile(path);
+            port.postMessage({
+                requestId,
+                path,
+                name: basename(path),
+                bytes: exactArrayBuffer(buffer),
+            });
+        } catch (error) {
+            try {
+                port.postMessage({
+                    requestId,
+                    error:
+                        error instanceof Error ? error.message : String(error),
+                });
+            } catch {
+                // The renderer settles its pending reads when the port
+                // closes and retries them through invoke.
+                port.close();
+            }
+        }
+    });
+    port.start();
+}
+
 function createWindow() {
     const currentDirectory = dirname(fileURLToPath(import.meta.url));
     const window = new BrowserWindow({
@@ -68,7 +216,15 @@ function createWindow() {
     }
 }
 
+// Viewport render workers share voxel data through SharedArrayBuffer.
+app.commandLine.appendSwitch("enable-features", "SharedArrayBuffer");
+
 app.whenReady().then(() => {
+    const volumeCache = createVolumeCache(
+        join(app.getPath("userData"), "volume-cache"),
+        VOLUME_CACHE_MAX_BYTES,
+    );
+
     ipcMain.handle("dialog:open-medical-files", async () => {
         const result = await dialog.showOpenDialog({
             title: "Select CT image files or folders",
@@ -86,30 +242,58 @@ app.whenReady().then(() => {
             return [];
         }
 
-        const filePaths = await collectFiles(result.filePaths);
-        selectedMedicalFiles.clear();
-        filePaths.forEach((path) => selectedMedicalFiles.add(path));
-
-        return Promise.all(
-            filePaths.map(async (path) => {
-                const info = await stat(path);
-                return {
-                    path,
-                    name: basename(path),
-                    size: info.size,
-                };
-            }),
-        );
+        const files = await collectFiles(result.filePaths);
+        files.forEach((file) => selectedMedicalFiles.add(file.path));
+
+        return files;
     });
 
     ipcMain.handle("medical-file:read", async (_event, path: string) => {
-        if (!selectedMedicalFiles.has(path) || !isSupportedMedicalPath(path)) {
-            throw new Error("The requested file was not selected.");
-        }
-
+        assertSelectedMedicalPath(path);
         return readMedicalFile(path);
     });
 
+    ipcMain.handle(
+        "medical-file:read-range",
+        async (_event, path: string, offset: number, length: number) => {
+            assertSelectedMedicalPath(path);
+            return readMedicalFileRange(path, offset, length);
+        },
+    );
+
+    // Files stay readable only while a loaded volume still refers to them.
+    ipcMain.on("medical-file:release", (_event, paths: string[]) => {
+        paths.forEach((path) => selectedMedicalFiles.delete(path));
+    });
+
+    ipcMain.on("medical-file:open-channel", (event) => {
+        const { port1, port2 } = new MessageChannelMain();
+        serveMedicalFileChannel(port1, volumeCache);
+        event.sender.postMessage("medical-file:channel", null, [port2]);
+    });
+
+    ipcMain.handle("volume-cache:lookup", (_event, paths: string[]) =>
+        volumeCache.lookup(
+            paths.filter((path) => selectedMedicalFiles.has(path)),
+        ),
+    );
+
+    ipcMain.handle("volume-cache:read", (_event, cacheKey: string) =>
+        volumeCache.read(cacheKey),
+    );
+
+    ipcMain.handle(
+        "volume-cache:store",
+        (_event, volume: Volume, data: CachedVolumeData) => {
+            assertSelectedVolumeSources(volume);
+            return volumeCache.store(volume, data);
+        },
+    );
+
+    ipcMain.handle("volume-cache:clear", () => volumeCache.clear());
+
+    ipcMain.handle("volume-cache:usage", () => volumeCache.usage());
+
     createWindow();
 
     app.on("activate", () => {
@@ -1,7 +1,32 @@
+/// <reference lib="dom" />
+
 import { contextBridge, ipcRenderer } from "electron";
+import type { CachedVolumeData, Volume } from "../src/types";
+
+const MEDICAL_FILE_CHANNEL_MESSAGE = "dcmviewer:medical-file-channel";
+
+ipcRenderer.on("medical-file:channel", (event) => {
+    window.postMessage(MEDICAL_FILE_CHANNEL_MESSAGE, "*", event.ports);
+});
 
 contextBridge.exposeInMainWorld("dcmViewer", {
     openMedicalFiles: () => ipcRenderer.invoke("dialog:open-medical-files"),
     readMedicalFile: (path: string) =>
         ipcRenderer.invoke("medical-file:read", path),
+    readMedicalFileRange: (path: string, offset: number, length: number) =>
+        ipcRenderer.invoke("medical-file:read-range", path, offset, length),
+    openMedicalFileChannel: () =>
+        ipcRenderer.send("medical-file:open-channel"),
+    releaseMedicalFiles: (paths: string[]) =>
+        ipcRenderer.send("medical-file:release", paths),
+    volumeCache: {
+        lookup: (paths: string[]) =>
+            ipcRenderer.invoke("volume-cache:lookup", paths),
+        read: (cacheKey: string) =>
+            ipcRenderer.invoke("volume-cache:read", cacheKey),
+        store: (volume: Volume, data: CachedVolumeData) =>
+            ipcRenderer.invoke("volume-cache:store", volume, data),
+        clear: () => ipcRenderer.invoke("volume-cache:clear"),
+        usage: () => ipcRenderer.invoke("volume-cache:usage"),
+    },
 });
@@ -0,0 +1,293 @@
+import { createHash } from "node:crypto";
+import {
+    mkdir,
+    open,
+    readFile,
+    readdir,
+    rename,
+    rm,
+    stat,
+    writeFile,
+} from "node:fs/promises";
+import { join } from "node:path";
+import { mapConcurrent } from "../src/loaders/readScheduler";
+import { volumeSourcePaths } from "../src/voxels";
+import type {
+    CachedVolumeData,
+    Volume,
+    VolumeCacheUsage,
+    VoxelDataType,
+} from "../src/types";
+
+type SourceFingerprint = {
+    path: string;
+    size: number;
+    mtimeMs: number;
+    contentHash: string;
+};
+
+type VolumeCacheEntry = {
+    format: number;
+    key: string;
+    sources: SourceFingerprint[];
+    volume: Volume;
+    dataType: VoxelDataType;
+    byteLength: number;
+    lastAccess: number;
+};
+
+// Bumped whenever cached headers change meaning (format 2 stores NIfTI
+// affines in LPS), so older entries are dropped instead of served.
+const CACHE_FORMAT = 2;
+const CONTENT_SAMPLE_BYTES = 64 * 1024;
+const FINGERPRINT_CONCURRENCY = 32;
+
+async function readSample(path: string, size: number) {
+    const handle = await open(path, "r");
+
+    try {
+        const hash = createHash("sha256");
+        const headLength = Math.min(size, CONTENT_SAMPLE_BYTES);
+        const tailLength = Math.min(size - headLength, CONTENT_SAMPLE_BYTES);
+        const head = Buffer.alloc(headLength);
+        const tail = Buffer.alloc(tailLength);
+
+        await handle.read(head, 0, headLength, 0);
+        await handle.read(tail, 0, tailLength, size - tailLength);
+        hash.update(String(size)).update(head).update(tail);
+        return hash.digest("hex");
+    } finally {
+        await handle.close();
+    }
+}
+
+async function fingerprintSource(path: string): Promise<SourceFingerprint> {
+    const info = await stat(path);
+    return {
+        path,
+        size: info.size,
+        mtimeMs: info.mtimeMs,
+        contentHash: await readSample(path, info.size),
+    };
+}
+
+function cacheKey(volumeId: string, sources: SourceFingerprint[]) {
+    return createHash("sha256")
+        .update(JSON.stringify({ volumeId, sources }))
+        .digest("hex");
+}
+
+function cachedVolumeHeader(volume: Volume): Volume {
+    const header: Volume = { ...volume };
+    delete header.data;
+    delete header.cacheKey;
+    delete header.slicePlanes;
+    delete header.pyramid;
+    return header;
+}
+
+export function createVolumeCache(directory: string, maxBytes: number) {
+    let entriesPromise: Promise<Map<string, VolumeCacheEntry>> | undefined;
+    let pendingWrite = Promise.resolve();
+
+    const entryPath = (key: string, extension: ".json" | ".bin") =>
+        join(directory, `${key}${extension}`);
+
+    const readEntries = async () => {
+        const entries = new Map<string, VolumeCacheEntry>();
+        const names = await readdir(directory).catch(() => [] as string[]);
+
+        for (const name of names) {
+            if (!name.endsWith(".json")) continue;
+
+            try {
+                const entry = JSON.parse(
+                    await readFile(join(directory, name), "utf8"),
+                ) as VolumeCacheEntry;
+                if (entry.format !== CACHE_FORMAT) {
+                    await rm(join(directory, name), { force: true });
+                    await rm(entryPath(entry.key, ".bin"), { force: true });
+                    continue;
+                }
+                entries.set(entry.key, entry);
+            } catch {
+                await rm(join(directory, name), { force: true });
+            }
+        }
+
+        return entries;
+    };
+
+    const loadEntries = () => {
+        entriesPromise ??= readEntries();
+        return entriesPromise;
+    };
+
+    const serialize = <Result>(task: () => Promise<Result>) => {
+        const result = pendingWrite.then(task);
+        pendingWrite = result.then(
+            () => undefined,
+            () => undefined,
+        );
+        return result;
+    };
+
+    const writeHeader = async (entry: VolumeCacheEntry) => {
+        const temporaryPath = `${entryPath(entry.key, ".json")}.tmp`;
+        await writeFile(temporaryPath, JSON.stringify(entry));
+        await rename(temporaryPath, entryPath(entry.key, ".json"));
+    };
+
+    const removeEntry = async (
+        entries: Map<string, VolumeCacheEntry>,
+        key: string,
+    ) => {
+        entries.delete(key);
+        await rm(entryPath(key, ".json"), { force: true });
+        await rm(entryPath(key, ".bin"), { force: true });
+    };
+
+    const usage = async (): Promise<VolumeCacheUsage> => {
+        const entries = await loadEntries();
+        let bytes = 0;
+
+        for (const entry of entries.values()) {
+            bytes += entry.byteLength;
+        }
+
+        return { entries: entries.size, bytes, maxBytes };
+    };
+
+    const evict = async (entries: Map<string, VolumeCacheEntry>) => {
+        const leastRecent = [...entries.values()].sort(
+            (left, right) => left.lastAccess - right.lastAccess,
+        );
+        let bytes = leastRecent.reduce(
+            (total, entry) => total + entry.byteLength,
+            0,
+        );
+
+        for (const entry of leastRecent) {
+            if (bytes <= maxBytes) return;
+            bytes -= entry.byteLength;
+            await removeEntry(entries, entry.key);
+        }
+    };
+
+    return {
+        lookup: (paths: string[]) =>
+            serialize(async () => {
+                const entries = await loadEntries();
+                const selected = new Set(paths);
+                const candidates = [...entries.values()].filter((entry) =>
+                    entry.sources.every((source) => selected.has(source.path)),
+                );
+                const fingerprints = new Map<
+                    string,
+                    Promise<SourceFingerprint | undefined>
+                >();
+                const fingerprintOf = (path: string) => {
+                    let fingerprint = fingerprints.get(path);
+                    if (!fingerprint) {
+                        fingerprint = fingerprintSource(path).catch(
+                            () => undefined,
+                        );
+                        fingerprints.set(path, fingerprint);
+                    }
+                    return fingerprint;
+                };
+                const matches = await mapConcurrent(
+                    candidates,
+                    FINGERPRINT_CONCURRENCY,
+                    async (entry) => {
+                        for (const source of entry.sources) {
+                            const current = await fingerprintOf(source.path);
+                            if (
+                                !current ||
+                                current.size !== source.size ||
+                                current.mtimeMs !== source.mtimeMs ||
+                                current.contentHash !== source.contentHash
+                            ) {
+                                return false;
+                            }
+                        }
+
+                        return true;
+                    },
+                );
+                const hits: Volume[] = [];
+
+                for (const [index, entry] of candidates.entries()) {
+                    if (!matches[index]) {
+                        await removeEntry(entries, entry.key);
+                        continue;
+                    }
+
+                    entry.lastAccess = Date.now();
+                    await writeHeader(entry);
+                    hits.push({ ...entry.volume, cacheKey: entry.key });
+                }
+
+                return hits;
+            }),
+        read: async (key: string) => {
+            const entries = await loadEntries();
+            const entry = entries.get(key);
+
+            if (!entry) {
+                throw new Error("The cached volume is no longer available.");
+            }
+
+            const bytes = await readFile(entryPath(key, ".bin"));
+            entry.lastAccess = Date.now();
+            void serialize(() => writeHeader(entry));
+            return { dataType: entry.dataType, bytes };
+        },
+        store: (volume: Volume, data: CachedVolumeData) =>
+            serialize(async () => {
+                const bytes =
+                    data.bytes instanceof Uint8Array
+                        ? data.bytes
+                        : new Uint8Array(data.bytes);
+                const sourcePaths = volumeSourcePaths(volume);
+
+                if (sourcePaths.length === 0 || bytes.byteLength > maxBytes) {
+                    return undefined;
+                }
+
+                const entries = await loadEntries();
+                const sources = await mapConcurrent(
+                    sourcePaths,
+                    FINGERPRINT_CONCURRENCY,
+                    fingerprintSource,
+                );
+                const key = cacheKey(volume.id, sources);
+                const entry: VolumeCacheEntry = {
+                    format: CACHE_FORMAT,
+                    key,
+                    sources,
+                    volume: cachedVolumeHeader(volume),
+                    dataType: data.dataType,
+                    byteLength: bytes.byteLength,
+                    lastAccess: Date.now(),
+                };
+
+                await mkdir(directory, { recursive: true });
+                await writeFile(entryPath(key, ".bin"), bytes);
+                await writeHeader(entry);
+                entries.set(key, entry);
+                await evict(entries);
+                return key;
+            }),
+        clear: () =>
+            serialize(async () => {
+                const entries = await loadEntries();
+                entries.clear();
+                await rm(directory, { recursive: true, force: true });
+                return usage();
+            }),
+        usage,
+    };
+}
+
+export type VolumeCache = ReturnType<typeof createVolumeCache>;
@@ -1,10 +1,12 @@
-import { useEffect, useMemo, useRef, useState } from "react";
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import {
     AlertTriangle,
     ChevronDown,
+    ChevronLeft,
     ChevronRight,
     ChevronsDown,
     ChevronsUp,
+    Eraser,
     FolderOpen,
     GitCompare,
     Grid3X3,
@@ -18,24 +20,83 @@ import {
     X,
 } from "lucide-react";
 import { SliceViewport } from "./components/SliceViewport";
+import { CompareStatsPanel } from "./components/CompareStatsPanel";
+import {
+    scanCompareStats,
+    type CompareSliceStats,
+    type CompareStats,
+} from "./compareStats";
+import { withDifferenceRange } from "./differenceSlices";
 import {
     buildStudyTree,
     createDifferenceVolume,
+    createMedicalLoadSession,
     loadMedicalFiles,
+    loadSliceMetadata,
+    loadVolumeData,
 } from "./loaders/medicalLoader";
+import { readMedicalFile } from "./loaders/medicalFileChannel";
+import { runReadScheduler } from "./loaders/readScheduler";
+import {
+    clearVolumeCache,
+    isVolumeCacheAvailable,
+    lookupCachedVolumes,
+    storeCachedVolume,
+    volumeCacheUsage,
+} from "./loaders/volumeCache";
+import {
+    isRangedVolume,
+    isRangedVolumeReference,
+    loadRangedVolumes,
+} from "./loaders/volumeSlabs";
+import { registerVolumes } from "./registration";
 import { getSliceCount } from "./rendering";
+import {
+    needsResampling,
+    resampleVolume,
+    type ResampleBuild,
+} from "./resampling";
+import {
+    buildSlicePlane,
+    canBuildSlicePlanes,
+    type SlicePlaneBuild,
+} from "./slicePlanes";
+import {
+    buildVolumePyramid,
+    canBuildVolumePyramid,
+    estimateVolumePyramidBytes,
+    needsVolumePyramid,
+    type VolumePyramidBuild,
+} from "./volumePyramid";
 import type {
+    LoadedVolume,
     MedicalFile,
     MedicalFileReference,
-    VisualizationColorMap,
+    SlabMode,
+    SlicePlaneAxis,
     ViewportState,
+    VisualizationColorMap,
     Volume,
+    VolumeCacheUsage,
+    VolumeMetadataEntry,
 } from "./types";
+import {
+    DEFAULT_MEMORY_BUDGET_MB,
+    evictVolumesOverBudget,
+    MIN_MEMORY_BUDGET_MB,
+    residentVolumeBytes,
+    touchVolumes,
+} from "./volumeStore";
+import { isVolumeLoaded, volumeSourcePaths } from "./voxels";
 import { DEFAULT_WINDOW_CENTER, DEFAULT_WINDOW_WIDTH } from "./windowing";
 
 const DEFAULT_COLOR_MAP: VisualizationColorMap = "grayscale";
 const DEFAULT_CLIP_MIN = -1000;
 const DEFAULT_CLIP_MAX = 3000;
+const DEFAULT_SLAB_THICKNESS = 10;
+const MAX_SLAB_THICKNESS = 64;
+const READ_CONCURRENCY = 8;
+const READ_BYTES_IN_FLIGHT = 512 * 1024 * 1024;
 
 function createViewport(id: number, volume?: Volume): ViewportState {
     return {
@@ -50,17 +111,25 @@ function createViewport(id: number, volume?: Volume): ViewportState {
         clipMin: volume?.min ?? DEFAULT_CLIP_MIN,
         clipMax: volume?.max ?? DEFAULT_CLIP_MAX,
         showColorbar: true,
+        slabMode: "slice",
+        slabThickness: DEFAULT_SLAB_THICKNESS,
+    };
+}
+
+function inputFilePath(file: File) {
+    return file.webkitRelativePath || file.name;
+}
+
+async function medicalFileFromInput(file: File): Promise<MedicalFile> {
+    return {
+        path: inputFilePath(file),
+        name: file.name,
+        bytes: new Uint8Array(await file.arrayBuffer()),
     };
 }
 
 async function filesFromInput(fileList: FileList): Promise<MedicalFile[]> {
-    return Promise.all(
-        [...fileList].map(async (file) => ({
-            path: file.webkitRelativePath || file.name,
-            name: file.name,
-            bytes: new Uint8Array(await file.arrayBuffer()),
-        })),
-    );
+    return Promise.all([...fileList].map(medicalFileFromInput));
 }
 
 function resizeViewports(
@@ -91,22 +160,6 @@ function displayStudyName(studyId: string) {
     return displayName;
 }
 
-function extensionOfPath(path: string) {
-    const lowerPath = path.toLowerCase();
-    if (lowerPath.endsWith(".nii.gz")) return ".nii.gz";
-    const lastDot = lowerPath.lastIndexOf(".");
-    return lastDot >= 0 ? lowerPath.slice(lastDot) : "";
-}
-
-function isStandaloneVolumeFile(
-    file: Pick<MedicalFileReference, "path" | "name">,
-) {
-    const extension = extensionOfPath(file.name || file.path);
-    return (
-        extension === ".npy" || extension === ".nii" || extension === ".nii.gz"
-    );
-}
-
 function patientTreeNodeId(patientId: string) {
     return `patient:${patientId}`;
 }
@@ -124,6 +177,10 @@ function numericInputValue(value: string) {
     return Number.isFinite(parsedValue) ? parsedValue : undefined;
 }
 
+function formatMegabytes(bytes: number) {
+    return `${Math.round(bytes / (1024 * 1024))} MB`;
+}
+
 function errorMessage(error: unknown) {
     return error instanceof Error ? error.message : "Failed to load files.";
 }
@@ -138,6 +195,31 @@ type LoadingState = {
     message: string;
     current: number;
     total: number;
+    unit?: string;
+};
+
+type CompareStatsState = {
+    volumeId: string;
+    slices: CompareSliceStats[];
+    volume: CompareStats;
+    done: boolean;
+};
+
+type CompareResample = {
+    key: string;
+    volume?: LoadedVolume;
+    current: number;
+    total: number;
+};
+
+type CompareRegistration = {
+    key: string;
+    transform: number[];
+};
+
+type CompareStatsScan = {
+    volumeId: string;
+    cancel: () => void;
 };
 
 const windowingPresets = [
@@ -212,8 +294,44 @@ function sliceFromRatioForViewport(
     return Math.min(Math.max(Math.round(ratio * maxSlice), 0), maxSlice);
 }
 
+// 4D NPY files are cached as one entry per channel. A file counts as cached
+// only when every channel it produces came back from the cache.
+function fullyCachedPaths(cachedVolumes: Volume[]) {
+    const paths = new Set<string>();
+    const channels = new Map<string, { found: Set<number>; total?: number }>();
+
+    for (const volume of cachedVolumes) {
+        for (const path of volumeSourcePaths(volume)) {
+            if (volume.channelIndex === undefined) {
+                paths.add(path);
+                continue;
+            }
+
+            const entry = channels.get(path) ?? { found: new Set<number>() };
+            entry.found.add(volume.channelIndex);
+            entry.total ??= volume.channelCount;
+            channels.set(path, entry);
+        }
+    }
+
+    for (const [path, { found, total }] of channels) {
+        if (found.size === total) paths.add(path);
+    }
+
+    return paths;
+}
+
 function App() {
     const fileInputRef = useRef<HTMLInputElement>(null);
+    const inputFilesRef = useRef(new Map<string, File>());
+    const pixelLoadsRef = useRef(new Set<string>());
+    const failedPixelLoadsRef = useRef(new Set<string>());
+    const volumeLastUsedRef = useRef(new Map<string, number>());
+    const volumePathsRef = useRef(new Set<string>());
+    const slicePlaneBuildsRef = useRef(new Map<string, SlicePlaneBuild>());
+    const pyramidBuildsRef = useRef(new Map<string, VolumePyramidBuild>());
+    const compareStatsScanRef = useRef<CompareStatsScan>();
+    const resampleBuildRef = useRef<{ key: string; build: ResampleBuild }>();
     const [volumes, setVolumes] = useState<Volume[]>([]);
     const [loadErrors, setLoadErrors] = useState<string[]>([]);
     const [loadingState, setLoadingState] = useState<LoadingState | null>(null);
@@ -225,12 +343,27 @@ function App() {
         null,
     );
     const [activeViewportId, setActiveViewportId] = useState("view-1");
-    const [metadataVolume, setMetadataVolume] = useState<Volume | null>(null);
+    const [metadataVolumeId, setMetadataVolumeId] = useState<string | null>(
+        null,
+    );
+    const [metadataSlice, setMetadataSlice] = useState(0);
+    const [metadataEntries, setMetadataEntries] = useState<
+        VolumeMetadataEntry[] | null
+    >(null);
     const [metadataQuery, setMetadataQuery] = useState("");
     const [treePanelExpanded, setTreePanelExpanded] = useState(true);
     const [visualizationPanelExpanded, setVisualizationPanelExpanded] =
         useState(true);
     const [windowingPanelExpanded, setWindowingPanelExpanded] = useState(true);
+    const [storagePanelExpanded, setStoragePanelExpanded] = useState(false);
+    const [cacheUsage, setCacheUsage] = useState<VolumeCacheUsage>();
+    const [compareStats, setCompareStats] = useState<CompareStatsState>();
+    const [compareResample, setCompareResample] = useState<CompareResample>();
+    const [compareRegistration, setCompareRegistration] =
+        useState<CompareRegistration>();
+    const [memoryBudgetMB, setMemoryBudgetMB] = useState(
+        DEFAULT_MEMORY_BUDGET_MB,
+    );
     const [expandedTreeNodes, setExpandedTreeNodes] = useState<Set<string>>(
         () => new Set(),
     );
@@ -255,16 +388,71 @@ function App() {
     const secondaryCompare = volumes.find(
         (volume) => volume.id === viewports[1]?.volumeId,
     );
-    const differenceVolume = useMemo(
+    const comparedPrimary =
+        primaryCompare && isVolumeLoaded(primaryCompare)
+            ? primaryCompare
+            : undefined;
+    const comparedSecondary =
+        secondaryCompare && isVolumeLoaded(secondaryCompare)
+            ? secondaryCompare
+            : undefined;
+    const comparePairKey =
+        compareMode && comparedPrimary && comparedSecondary
+            ? `${comparedPrimary.id}\t${comparedSecondary.id}`
+            : undefined;
+    const registrationTransform =
+        comparePairKey && compareRegistration?.key === comparePairKey
+            ? compareRegistration.transform
+            : undefined;
+    // Case 2 is resampled onto Case 1's grid when their shape or geometry
+    // differ, or through the rigid transform once the pair is registered;
+    // the difference and statistics then read the resampled copy.
+    const needsAlignment =
+        registrationTransform !== undefined ||
+        (comparedPrimary &&
+            comparedSecondary &&
+            needsResampling(comparedPrimary, comparedSecondary));
+    const resampleKey =
+        comparePairKey && needsAlignment
+            ? `${comparePairKey}\t${registrationTransform?.join(",") ?? "grid"}`
+            : undefined;
+    const resampledSecondary =
+        resampleKey && compareResample?.key === resampleKey
+            ? compareResample.volume
+            : undefined;
+    const alignedSecondary = resampleKey
+        ? resampledSecondary
+        : comparedSecondary;
+    const differenceHeader = useMemo(
         () =>
-            primaryCompare && secondaryCompare
-                ? createDifferenceVolume(primaryCompare, secondaryCompare)
+            comparedPrimary && alignedSecondary
+                ? createDifferenceVolume(comparedPrimary, alignedSecondary)
                 : undefined,
-        [primaryCompare, secondaryCompare],
+        [alignedSecondary, comparedPrimary],
     );
+    const differenceStats =
+        differenceHeader && compareStats?.volumeId === differenceHeader.id
+            ? compareStats
+            : undefined;
+    const differenceMaxAbs = differenceStats?.volume.maxAbs;
+    const differenceVolume = useMemo(
+        () =>
+            differenceHeader && differenceMaxAbs !== undefined
+                ? withDifferenceRange(
+                      differenceHeader,
+                      Math.max(differenceMaxAbs, 1),
+                  )
+                : differenceHeader,
+        [differenceHeader, differenceMaxAbs],
+    );
+    const differenceVolumeId = differenceVolume?.id;
     const displayVolumes =
         compareMode && differenceVolume
-            ? [...volumes, differenceVolume]
+            ? [
+                  ...volumes,
+                  ...(resampledSecondary ? [resampledSecondary] : []),
+                  differenceVolume,
+              ]
             : volumes;
     const gridRows = compareMode ? 1 : rows;
     const gridColumns = compareMode ? 3 : columns;
@@ -274,6 +462,20 @@ function App() {
         viewportCount,
         volumes[0],
     );
+    const shownVolumeIds = visibleViewports
+        .flatMap((viewport) => (viewport.volumeId ? [viewport.volumeId] : []))
+        .join("\n");
+    const slicePlaneKeys = visibleViewports
+        .flatMap((viewport) =>
+            viewport.volumeId && viewport.axis !== "axial"
+                ? [`${viewport.volumeId}\t${viewport.axis}`]
+                : [],
+        )
+        .join("\n");
+    const residentBytes = useMemo(
+        () => residentVolumeBytes(volumes),
+        [volumes],
+    );
     const singleViewport = !compareMode
         ? visibleViewports.find((viewport) => viewport.id === singleViewportId)
         : undefined;
@@ -321,11 +523,18 @@ function App() {
                     preset.windowWidth,
         )?.id ?? "";
     const isLoading = loadingState !== null;
+    const metadataVolume = volumes.find(
+        (volume) => volume.id === metadataVolumeId,
+    );
+    const metadataSliceCount = metadataVolume?.sourceFiles?.length ?? 0;
+    const metadataVolumeName = metadataVolume?.name;
+    const metadataSourcePath =
+        metadataVolume?.sourceFiles?.[metadataSlice]?.path;
     const loadingPercent = loadingState?.total
         ? Math.round((loadingState.current / loadingState.total) * 100)
         : 0;
     const filteredMetadata = useMemo(() => {
-        const metadata = metadataVolume?.metadata ?? [];
+        const metadata = metadataEntries ?? [];
         const query = metadataQuery.trim().toLowerCase();
 
         if (!query) return metadata;
@@ -343,19 +552,242 @@ function App() {
                 .toLowerCase()
                 .includes(query),
         );
-    }, [metadataQuery, metadataVolume]);
+    }, [metadataEntries, metadataQuery]);
 
     useEffect(() => {
-        if (!compareMode || !differenceVolume) return;
+        if (!compareMode || !differenceVolumeId) return;
 
         setViewports((current) =>
             resizeViewports(current, 3, volumes[0]).map((viewport, index) =>
                 index === 2
-                    ? { ...viewport, volumeId: differenceVolume.id }
+                    ? { ...viewport, volumeId: differenceVolumeId }
                     : viewport,
             ),
         );
-    }, [compareMode, differenceVolume, volumes]);
+    }, [compareMode, differenceVolumeId, volumes]);
+
+    useEffect(() => {
+        const scan = compareStatsScanRef.current;
+        const volumeId = compareMode ? differenceHeader?.id : undefined;
+        if (scan?.volumeId === volumeId) return;
+
+        scan?.cancel();
+        compareStatsScanRef.current = undefined;
+        if (!volumeId || !comparedPrimary || !alignedSecondary) return;
+
+        // Per-slice statistics stream in from a worker; the difference color
+        // scale follows the running max-abs difference as the scan proceeds.
+        setCompareStats(undefined);
+        compareStatsScanRef.current = {
+            volumeId,
+            cancel: scanCompareStats(
+                comparedPrimary,
+                alignedSecondary,
+                ({ slices, volume, done }) =>
+                    setCompareStats((current) => ({
+                        volumeId,
+                        slices:
+                            current?.volumeId === volumeId
+                                ? [...current.slices, ...slices]
+                                : slices,
+                        volume,
+                        done,
+                    })),
+                (error) => {
+                    if (compareStatsScanRef.current?.volumeId !== volumeId) {
+                        return;
+                    }
+                    compareStatsScanRef.current = undefined;
+                    setCompareStats(undefined);
+                    setLoadErrors((current) => [
+                        ...current,
+                        errorMessage(error),
+                    ]);
+                },
+            ),
+        };
+    }, [alignedSecondary, compareMode, comparedPrimary, differenceHeader]);
+
+    useEffect(() => {
+        const running = resampleBuildRef.current;
+        if (running?.key === resampleKey) return;
+
+        running?.build.cancel();
+        resampleBuildRef.current = undefined;
+        if (!resampleKey || !comparedPrimary || !comparedSecondary) {
+            setCompareResample(undefined);
+            return;
+        }
+
+        const key = resampleKey;
+        const build = resampleVolume(
+            comparedPrimary,
+            comparedSecondary,
+            ({ current, total }) =>
+                setCompareResample({ key, current, total }),
+            registrationTransform,
+        );
+        resampleBuildRef.current = { key, build };
+        setCompareResample({
+            key,
+            current: 0,
+            total: comparedPrimary.dimensions[2],
+        });
+        build.volume
+            .then((volume) => {
+                if (resampleBuildRef.current?.build !== build) return;
+                setCompareResample({
+                    key,
+                    volume,
+                    current: volume.dimensions[2],
+                    total: volume.dimensions[2],
+                });
+            })
+            .catch((error: unknown) => {
+                // A cancelled build has already been replaced in the ref;
+                // only a failure of the current build is reported. The ref
+                // keeps it so the same pair is not retried until it changes.
+                if (resampleBuildRef.current?.build !== build) return;
+                setCompareResample(undefined);
+                setLoadErrors((current) => [...current, errorMessage(error)]);
+            });
+    }, [
+        comparedPrimary,
+        comparedSecondary,
+        registrationTransform,
+        resampleKey,
+    ]);
+
+    useEffect(() => {
+        const paths = new Set(volumes.flatMap(volumeSourcePaths));
+        const released = [...volumePathsRef.current].filter(
+            (path) => !paths.has(path),
+        );
+        volumePathsRef.current = paths;
+        if (released.length > 0) {
+            window.dcmViewer?.releaseMedicalFiles?.(released);
+        }
+    }, [volumes]);
+
+    useEffect(() => {
+        const inUse = new Set(shownVolumeIds.split("\n").filter(Boolean));
+        touchVolumes(volumeLastUsedRef.current, inUse);
+        setVolumes((current) =>
+            evictVolumesOverBudget(current, {
+                budgetBytes: memoryBudgetMB * 1024 * 1024,
+                inUse,
+                lastUsed: volumeLastUsedRef.current,
+            }),
+        );
+    }, [memoryBudgetMB, shownVolumeIds, volumes]);
+
+    useEffect(() => {
+        const wanted = new Set(slicePlaneKeys.split("\n").filter(Boolean));
+        const builds = slicePlaneBuildsRef.current;
+        const budgetBytes = memoryBudgetMB * 1024 * 1024;
+        let plannedBytes = residentVolumeBytes(volumes);
+
+        for (const [key, build] of builds) {
+            if (wanted.has(key)) continue;
+            build.cancel();
+            builds.delete(key);
+        }
+
+        if (!canBuildSlicePlanes()) return;
+
+        for (const key of wanted) {
+            const [volumeId, axis] = key.split("\t") as [
+                string,
+                SlicePlaneAxis,
+            ];
+            const volume = volumes.find((item) => item.id === volumeId);
+
+            if (
+                builds.has(key) ||
+                !volume ||
+                !isVolumeLoaded(volume) ||
+                volume.slicePlanes?.[axis] ||
+                plannedBytes + volume.data.byteLength > budgetBytes
+            ) {
+                continue;
+            }
+
+            const { data } = volume;
+            const build = buildSlicePlane(volume, axis);
+            plannedBytes += data.byteLength;
+            builds.set(key, build);
+            build.plane
+                .then((plane) =>
+                    setVolumes((current) =>
+                        current.map((item) =>
+                            item.id === volumeId && item.data === data
+                                ? {
+                                      ...item,
+                                      slicePlanes: {
+                                          ...item.slicePlanes,
+                                          [axis]: plane,
+                                      },
+                                  }
+                                : item,
+                        ),
+                    ),
+                )
+                .catch(() => undefined)
+                .finally(() => {
+                    if (builds.get(key) === build) builds.delete(key);
+                });
+        }
+    }, [memoryBudgetMB, slicePlaneKeys, volumes]);
+
+    useEffect(() => {
+        const wanted = new Set(shownVolumeIds.split("\n").filter(Boolean));
+        const builds = pyramidBuildsRef.current;
+        const budgetBytes = memoryBudgetMB * 1024 * 1024;
+        let plannedBytes = residentVolumeBytes(volumes);
+
+        for (const [volumeId, build] of builds) {
+            if (wanted.has(volumeId)) continue;
+            build.cancel();
+            builds.delete(volumeId);
+        }
+
+        if (!canBuildVolumePyramid()) return;
+
+        for (const volumeId of wanted) {
+            const volume = volumes.find((item) => item.id === volumeId);
+
+            if (
+                builds.has(volumeId) ||
+                !volume ||
+                !isVolumeLoaded(volume) ||
+                volume.pyramid ||
+                !needsVolumePyramid(volume) ||
+                plannedBytes + estimateVolumePyramidBytes(volume) >
+                    budgetBytes
+            ) {
+                continue;
+            }
+
+            const { data } = volume;
+            const build = buildVolumePyramid(volume);
+            plannedBytes += estimateVolumePyramidBytes(volume);
+            builds.set(volumeId, build);
+            build.levels
+                .then((pyramid) =>
+                    setVolumes((current) =>
+                        current.map((item) =>
+                            item.id === volumeId && item.data === data
+                                ? { ...item, pyramid }
+                                : item,
+                        ),
+                    ),
+                )
+                .catch(() => undefined)
+                .finally(() => {
+                    if (builds.get(volumeId) === build) builds.delete(volumeId);
+                });
+        }
+    }, [memoryBudgetMB, shownVolumeIds, volumes]);
 
     useEffect(() => {
         setExpandedTreeNodes((current) => {
@@ -372,6 +804,159 @@ function App() {
         });
     }, [treeNodeIds]);
 
+    const readSourceFile = useCallback((path: string) => {
+        const inputFile = inputFilesRef.current.get(path);
+        return inputFile
+            ? medicalFileFromInput(inputFile)
+            : readMedicalFile(path);
+    }, []);
+
+    const refreshCacheUsage = async () => {
+        setCacheUsage(await volumeCacheUsage());
+    };
+
+    const cacheLoadedVolume = (volume: LoadedVolume) => {
+        storeCachedVolume(volume)
+            .then(refreshCacheUsage)
+            .catch(() => undefined);
+    };
+
+    const clearCache = async () => {
+        try {
+            setCacheUsage(await clearVolumeCache());
+        } catch (error) {
+            setLoadErrors((current) => [...current, errorMessage(error)]);
+        }
+    };
+
+    useEffect(() => {
+        void refreshCacheUsage().catch(() => undefined);
+    }, []);
+
+    const openMetadata = (volume: Volume) => {
+        const shownSlice =
+            activeViewport?.volumeId === volume.id &&
+            activeViewport.axis === "axial"
+                ? activeViewport.slice
+                : 0;
+
+        setMetadataQuery("");
+        setMetadataEntries(null);
+        setMetadataSlice(shownSlice);
+        setMetadataVolumeId(volume.id);
+    };
+
+    // Keyed on the slice's source path, so pixel loads, plane or pyramid
+    // attachment and eviction, which all replace the volume object, do not
+    // refetch the table.
+    useEffect(() => {
+        if (!metadataVolumeName) return;
+
+        if (!metadataSourcePath) {
+            setMetadataEntries([]);
+            setLoadErrors((current) => [
+                ...current,
+                `${metadataVolumeName} has no slice ${metadataSlice + 1}.`,
+            ]);
+            return;
+        }
+
+        let cancelled = false;
+        setMetadataEntries(null);
+        loadSliceMetadata(metadataSourcePath, readSourceFile)
+            .then((entries) => {
+                if (!cancelled) setMetadataEntries(entries);
+            })
+            .catch((error: unknown) => {
+                if (cancelled) return;
+                setMetadataEntries([]);
+                setLoadErrors((current) => [...current, errorMessage(error)]);
+            });
+
+        return () => {
+            cancelled = true;
+        };
+    }, [metadataSlice, metadataSourcePath, metadataVolumeName, readSourceFile]);
+
+    const loadVolumePixels = async (volume: Volume) => {
+        pixelLoadsRef.current.add(volume.id);
+        setLoadingState({
+            message: `Loading ${volume.name}`,
+            current: 0,
+            total: volume.sourceFiles?.length ?? 1,
+        });
+
+        try {
+            const [loaded, ...siblings] = await loadVolumeData(
+                volume,
+                readSourceFile,
+                { onProgress: setLoadingState },
+            );
+            const group = new Map(
+                [loaded, ...siblings].map((item) => [item.id, item]),
+            );
+            setVolumes((current) =>
+                current.map((item) => {
+                    const next = group.get(item.id);
+                    // Siblings that are already resident keep their data.
+                    if (
+                        !next ||
+                        (item.id !== loaded.id && isVolumeLoaded(item))
+                    ) {
+                        return item;
+                    }
+
+                    // Keep the range layout so the volume can fall back to
+                    // slab reads once its voxel data is evicted again.
+                    return item.voxelLayout
+                        ? { ...next, voxelLayout: item.voxelLayout }
+                        : next;
+                }),
+            );
+            group.forEach(cacheLoadedVolume);
+            setViewports((current) =>
+                current.map((viewport) =>
+                    viewport.volumeId === loaded.id
+                        ? {
+                              ...viewport,
+                              clipMin: loaded.min,
+                              clipMax: loaded.max,
+                          }
+                        : viewport,
+                ),
+            );
+        } catch (error) {
+            failedPixelLoadsRef.current.add(volume.id);
+            setLoadErrors((current) => [...current, errorMessage(error)]);
+        } finally {
+            pixelLoadsRef.current.delete(volume.id);
+            setLoadingState(null);
+        }
+    };
+
+    useEffect(() => {
+        if (isLoading) return;
+
+        const pendingVolume = volumes.find(
+            (volume) =>
+                !isVolumeLoaded(volume) &&
+                !pixelLoadsRef.current.has(volume.id) &&
+                !failedPixelLoadsRef.current.has(volume.id) &&
+                visibleViewports.some(
+                    (viewport) =>
+                        viewport.volumeId === volume.id &&
+                        // Axial views of ranged volumes read slabs on demand.
+                        (compareMode ||
+                            viewport.axis !== "axial" ||
+                            !isRangedVolume(volume)),
+                ),
+        );
+
+        if (pendingVolume) {
+            void loadVolumePixels(pendingVolume);
+        }
+    });
+
     const appendLoadedResult = (result: {
         volumes: Volume[];
         errors: string[];
@@ -396,6 +981,7 @@ function App() {
     const importPreparedFiles = async (files: MedicalFile[]) => {
         const result = await loadMedicalFiles(files, {
             onProgress: setLoadingState,
+            headerOnly: true,
         });
         appendLoadedResult(result);
     };
@@ -434,54 +1020,138 @@ function App() {
 
         try {
             await waitForLoadingModal();
-            const dicomFiles: MedicalFile[] = [];
-            let completed = 0;
+            const cachedHits = await lookupCachedVolumes(
+                fileReferences.map((fileReference) => fileReference.path),
+            );
+            const cachedPaths = fullyCachedPaths(cachedHits);
+            const cachedVolumes = cachedHits.filter((volume) =>
+                volumeSourcePaths(volume).every((path) =>
+                    cachedPaths.has(path),
+                ),
+            );
+            const total = fileReferences.length;
+            let completed = cachedPaths.size;
 
-            for (const fileReference of fileReferences) {
+            const markCompleted = () => {
+                completed += 1;
                 setLoadingState({
-                    message: `Reading ${fileReference.name}`,
+                    message: `Loaded ${completed} of ${total}`,
                     current: completed,
-                    total: fileReferences.length,
+                    total,
+                });
+            };
+
+            const scanFileReferences = async (
+                references: MedicalFileReference[],
+            ) => {
+                const session = createMedicalLoadSession({ headerOnly: true });
+
+                await runReadScheduler(references, {
+                    concurrency: READ_CONCURRENCY,
+                    maxBytesInFlight: READ_BYTES_IN_FLIGHT,
+                    sizeOf: (fileReference) => fileReference.size,
+                    read: (fileReference) =>
+                        readMedicalFile(fileReference.path),
+                    consume: async (_fileReference, file) => {
+                        const loadedVolumes = await session.add(file);
+                        if (loadedVolumes.length > 0) {
+                            appendLoadedResult({
+                                volumes: loadedVolumes,
+                                errors: [],
+                            });
+                            loadedVolumes
+                                .filter(isVolumeLoaded)
+                                .forEach(cacheLoadedVolume);
+                        }
+                        markCompleted();
+                    },
+                    onError: (fileReference, error) => {
+                        session.fail(fileReference.name, error);
+                        markCompleted();
+                    },
                 });
 
-                const file = await window.dcmViewer.readMedicalFile(
-                    fileReference.path,
-                );
-
-                completed += 1;
-
-                if (isStandaloneVolumeFile(fileReference)) {
-                    const result = await loadMedicalFiles([file]);
-                    appendLoadedResult(result);
-                    setLoadingState({
-                        message: `Loaded ${completed} of ${fileReferences.length}`,
-                        current: completed,
-                        total: fileReferences.length,
-                    });
-                    await waitForLoadingModal();
-                    continue;
-                }
-
-                dicomFiles.push(file);
                 setLoadingState({
-                    message: `Read ${completed} of ${fileReferences.length}`,
+                    message: "Building DICOM volumes...",
                     current: completed,
-                    total: fileReferences.length,
+                    total,
                 });
+                await waitForLoadingModal();
+                return session.finish();
+            };
 
-                if (completed % 8 === 0) {
-                    await waitForLoadingModal();
+            const uncachedReferences = fileReferences.filter(
+                (fileReference) => !cachedPaths.has(fileReference.path),
+            );
+            const rangedVolumes: Volume[] = [];
+            const rangedErrors: string[] = [];
+
+            for (const fileReference of uncachedReferences.filter(
+                isRangedVolumeReference,
+            )) {
+                try {
+                    rangedVolumes.push(
+                        ...(await loadRangedVolumes(
+                            fileReference,
+                            setLoadingState,
+                        )),
+                    );
+                } catch (error) {
+                    rangedErrors.push(
+                        `${fileReference.name}: ${errorMessage(error)}`,
+                    );
                 }
+                markCompleted();
             }
 
-            if (dicomFiles.length > 0) {
-                setLoadingState({
-                    message: "Building DICOM volumes...",
-                    current: fileReferences.length,
-                    total: fileReferences.length,
+            const scanned = await scanFileReferences(
+                uncachedReferences.filter(
+                    (fileReference) => !isRangedVolumeReference(fileReference),
+                ),
+            );
+            scanned.volumes.push(...rangedVolumes);
+            scanned.errors.push(...rangedErrors);
+            const scannedIds = new Set(
+                scanned.volumes.map((volume) => volume.id),
+            );
+            const staleIds = new Set(
+                cachedVolumes
+                    .filter((volume) => scannedIds.has(volume.id))
+                    .map((volume) => volume.id),
+            );
+
+            if (staleIds.size === 0) {
+                appendLoadedResult({
+                    volumes: [...cachedVolumes, ...scanned.volumes],
+                    errors: scanned.errors,
                 });
-                await importPreparedFiles(dicomFiles);
+                return;
             }
+
+            // A cached series gained new files; rebuild it from every file.
+            const stalePaths = new Set(
+                [...cachedVolumes, ...scanned.volumes]
+                    .filter((volume) => staleIds.has(volume.id))
+                    .flatMap(volumeSourcePaths),
+            );
+            completed -= stalePaths.size;
+            const rescanned = await scanFileReferences(
+                fileReferences.filter((fileReference) =>
+                    stalePaths.has(fileReference.path),
+                ),
+            );
+            appendLoadedResult({
+                volumes: [
+                    ...cachedVolumes.filter(
+                        (volume) => !staleIds.has(volume.id),
+                    ),
+                    ...scanned.volumes.filter(
+                        (volume) => !staleIds.has(volume.id),
+                    ),
+                    ...rescanned.volumes,
+                ],
+                errors: [...scanned.errors, ...rescanned.errors],
+            });
         } catch (error) {
             setLoadErrors((current) => [...current, errorMessage(error)]);
         } finally {
@@ -498,6 +1168,10 @@ function App() {
             total: fileList.length,
         });
 
+        for (const file of fileList) {
+            inputFilesRef.current.set(inputFilePath(file), file);
+        }
+
         try {
             await importFiles(await filesFromInput(fileList));
         } catch (error) {
@@ -531,6 +1205,39 @@ function App() {
         fileInputRef.current?.click();
     };
 
+    // Rigid registration runs behind the loading modal; its transform then
+    // drives the resampling of Case 2 onto Case 1's grid.
+    const registerCompareVolumes = async () => {
+        if (!comparePairKey || !comparedPrimary || !comparedSecondary) return;
+
+        const key = comparePairKey;
+        setLoadingState({
+            message: "Building registration pyramids...",
+            current: 0,
+            total: 0,
+            unit: "iterations",
+        });
+
+        try {
+            const result = await registerVolumes(
+                comparedPrimary,
+                comparedSecondary,
+                ({ message, current, total }) =>
+                    setLoadingState({
+                        message,
+                        current,
+                        total,
+                        unit: "iterations",
+                    }),
+            );
+            setCompareRegistration({ key, transform: result.sourceFromTarget });
+        } catch (error) {
+            setLoadErrors((current) => [...current, errorMessage(error)]);
+        } finally {
+            setLoadingState(null);
+        }
+    };
+
     const assignVolumeToActive = (volume: Volume) => {
         setViewports((current) =>
             current.map((viewport) =>
@@ -568,19 +1275,24 @@ function App() {
                           clipMax: DEFAULT_CLIP_MAX,
                           colorMap: DEFAULT_COLOR_MAP,
                           showColorbar: true,
+                          slabMode: "slice",
+                          slabThickness: DEFAULT_SLAB_THICKNESS,
                       }
                     : viewport,
             ),
         );
-        setMetadataVolume((current) =>
-            current?.id === volumeId ? null : current,
+        setMetadataVolumeId((current) =>
+            current === volumeId ? null : current,
         );
     };
 
     const removeAllVolumes = () => {
+        inputFilesRef.current.clear();
+        failedPixelLoadsRef.current.clear();
+        volumeLastUsedRef.current.clear();
         setVolumes([]);
         setLoadErrors([]);
-        setMetadataVolume(null);
+        setMetadataVolumeId(null);
         setMetadataQuery("");
         setSingleViewportId(null);
         setCompareMode(false);
@@ -601,6 +1313,8 @@ function App() {
                           clipMax: DEFAULT_CLIP_MAX,
                           colorMap: DEFAULT_COLOR_MAP,
                           showColorbar: true,
+                          slabMode: "slice",
+                          slabThickness: DEFAULT_SLAB_THICKNESS,
                       },
             ),
         );
@@ -730,6 +1444,8 @@ function App() {
                               ),
                     windowCenter: nextViewport.windowCenter,
                     windowWidth: nextViewport.windowWidth,
+                    slabMode: nextViewport.slabMode,
+                    slabThickness: nextViewport.slabThickness,
                 };
             });
         });
@@ -752,6 +1468,13 @@ function App() {
         updateViewport({ ...activeViewport, ...nextVisualization });
     };
 
+    const updateActiveSlab = (
+        nextSlab: Partial<Pick<ViewportState, "slabMode" | "slabThickness">>,
+    ) => {
+        if (!activeViewport) return;
+        updateViewport({ ...activeViewport, ...nextSlab });
+    };
+
     const applyWindowingPreset = (presetId: string) => {
         const preset = windowingPresets.find((item) => item.id === presetId);
         if (!preset) return;
@@ -789,6 +1512,8 @@ function App() {
                               clipMax: DEFAULT_CLIP_MAX,
                               colorMap: DEFAULT_COLOR_MAP,
                               showColorbar: true,
+                              slabMode: "slice",
+                              slabThickness: DEFAULT_SLAB_THICKNESS,
                           }
                         : viewport,
             ),
@@ -1075,14 +1800,11 @@ function App() {
                                                                         type="button"
                                                                         aria-label={`View metadata for ${volume.name}`}
                                                                         title="View metadata"
-                                                                        onClick={() => {
-                                                                            setMetadataQuery(
-                                                                                "",
-                                                                            );
-                                                                            setMetadataVolume(
+                                                                        onClick={() =>
+                                                                            openMetadata(
                                                                                 volume,
-                                                                            );
-                                                                        }}
+                                                                            )
+                                                                        }
                                                                     >
                                                                         <Info
                                                                             size={
@@ -1429,6 +2151,54 @@ function App() {
                                     }
                                 />
                             </label>
+                            <label className="windowingPresetRow">
+                                <span>Slab</span>
+                                <select
+                                    aria-label="Slab projection"
+                                    value={activeViewport?.slabMode ?? "slice"}
+                                    disabled={!activeVolume || !activeViewport}
+                                    onChange={(event) =>
+                                        updateActiveSlab({
+                                            slabMode: event.target
+                                                .value as SlabMode,
+                                        })
+                                    }
+                                >
+                                    <option value="slice">Slice</option>
+                                    <option value="mip">MIP</option>
+                                    <option value="minip">MinIP</option>
+                                    <option value="avgip">AvgIP</option>
+                                </select>
+                            </label>
+                            <label>
+                                <span>
+                                    Thickness{" "}
+                                    {activeViewport?.slabThickness ??
+                                        DEFAULT_SLAB_THICKNESS}{" "}
+                                    slices
+                                </span>
+                                <input
+                                    type="range"
+                                    min={2}
+                                    max={MAX_SLAB_THICKNESS}
+                                    value={
+                                        activeViewport?.slabThickness ??
+                                        DEFAULT_SLAB_THICKNESS
+                                    }
+                                    disabled={
+                                        !activeVolume ||
+                                        !activeViewport ||
+                                        activeViewport.slabMode === "slice"
+                                    }
+                                    onChange={(event) =>
+                                        updateActiveSlab({
+                                            slabThickness: Number(
+                                                event.target.value,
+                                            ),
+                                        })
+                                    }
+                                />
+                            </label>
                         </>
                     )}
                 </section>
@@ -1585,6 +2355,106 @@ function App() {
                         </>
                     )}
                 </section>
+
+                <section className="windowingPanel sidebarPanel">
+                    <div className="windowingPanelHeader">
+                        <button
+                            className="panelToggleButton"
+                            type="button"
+                            aria-label={
+                                storagePanelExpanded
+                                    ? "Collapse storage panel"
+                                    : "Expand storage panel"
+                            }
+                            onClick={() =>
+                                setStoragePanelExpanded((current) => !current)
+                            }
+                        >
+                            {storagePanelExpanded ? (
+                                <ChevronDown size={14} />
+                            ) : (
+                                <ChevronRight size={14} />
+                            )}
+                        </button>
+                        <span>Storage</span>
+                        <strong>
+                            {formatMegabytes(residentBytes)} /{" "}
+                            {formatMegabytes(memoryBudgetMB * 1024 * 1024)}
+                        </strong>
+                    </div>
+                    {storagePanelExpanded && (
+                        <>
+                            <label className="windowingPresetRow">
+                                <span>Memory</span>
+                                <input
+                                    className="numberInput"
+                                    type="number"
+                                    aria-label="Volume memory budget (MB)"
+                                    min={MIN_MEMORY_BUDGET_MB}
+                                    step={256}
+                                    value={memoryBudgetMB}
+                                    onChange={(event) => {
+                                        const nextValue = numericInputValue(
+                                            event.target.value,
+                                        );
+                                        if (nextValue === undefined) return;
+                                        setMemoryBudgetMB(
+                                            Math.max(
+                                                nextValue,
+                                                MIN_MEMORY_BUDGET_MB,
+                                            ),
+                                        );
+                                    }}
+                                />
+                            </label>
+                            {isVolumeCacheAvailable() && (
+                                <div className="storageRow">
+                                    <span>
+                                        Disk cache{" "}
+                                        {cacheUsage
+                                            ? `${cacheUsage.entries} · ${formatMegabytes(cacheUsage.bytes)} / ${formatMegabytes(cacheUsage.maxBytes)}`
+                                            : "-"}
+                                    </span>
+                                    <button
+                                        className="treeActionButton"
+                                        type="button"
+                                        aria-label="Clear volume cache"
+                                        title="Clear cache"
+                                        disabled={!cacheUsage?.entries}
+                                        onClick={() => void clearCache()}
+                                    >
+                                        <Eraser size={13} />
+                                    </button>
+                                </div>
+                            )}
+                        </>
+                    )}
+                </section>
+
+                {compareMode && (differenceHeader || resampleKey) && (
+                    <CompareStatsPanel
+                        slices={differenceStats?.slices ?? []}
+                        volume={differenceStats?.volume}
+                        done={differenceStats?.done ?? false}
+                        resampling={
+                            resampleKey && !resampledSecondary
+                                ? compareResample
+                                : undefined
+                        }
+                        sliceCount={comparedPrimary?.dimensions[2] ?? 1}
+                        registered={registrationTransform !== undefined}
+                        canRegister={!isLoading && comparePairKey !== undefined}
+                        onRegister={() => void registerCompareVolumes()}
+                        onClearRegistration={() =>
+                            setCompareRegistration(undefined)
+                        }
+                        currentSlice={
+                            visibleViewports[0]?.axis === "axial"
+                                ? visibleViewports[0].slice
+                                : undefined
+                        }
+                    />
+                )}
             </aside>
 
             <section className="workspace">
@@ -1729,8 +2599,10 @@ function App() {
                         </div>
                         <span>
                             {loadingState.total > 0
-                                ? `${loadingState.current}/${loadingState.total} files (${loadingPercent}%)`
-                                : "Waiting for file selection..."}
+                                ? `${loadingState.current}/${loadingState.total} ${loadingState.unit ?? "files"} (${loadingPercent}%)`
+                                : loadingState.unit
+                                  ? "Preparing..."
+                                  : "Waiting for file selection..."}
                         </span>
                     </div>
                 </div>
@@ -1744,7 +2616,7 @@ function App() {
                     aria-label={`Metadata for ${metadataVolume.name}`}
                     onMouseDown={(event) => {
                         if (event.target === event.currentTarget) {
-                            setMetadataVolume(null);
+                            setMetadataVolumeId(null);
                         }
                     }}
                 >
@@ -1759,11 +2631,66 @@ function App() {
                                 type="button"
                                 aria-label="Close metadata"
                                 title="Close"
-                                onClick={() => setMetadataVolume(null)}
+                                onClick={() => setMetadataVolumeId(null)}
                             >
                                 <X size={17} />
                             </button>
                         </header>
+                        <div className="metadataSliceRow">
+                            <span>Slice</span>
+                            <button
+                                className="stepButton"
+                                type="button"
+                                aria-label="Previous slice metadata"
+                                disabled={metadataSlice <= 0}
+                                onClick={() =>
+                                    setMetadataSlice((current) =>
+                                        Math.max(current - 1, 0),
+                                    )
+                                }
+                            >
+                                <ChevronLeft size={14} />
+                            </button>
+                            <input
+                                className="numberInput"
+                                type="number"
+                                aria-label="Metadata slice"
+                                min={1}
+                                max={metadataSliceCount}
+                                value={metadataSlice + 1}
+                                onChange={(event) => {
+                                    const nextValue = numericInputValue(
+                                        event.target.value,
+                                    );
+                                    if (nextValue === undefined) return;
+                                    setMetadataSlice(
+                                        Math.min(
+                                            Math.max(Math.round(nextValue), 1),
+                                            metadataSliceCount,
+                                        ) - 1,
+                                    );
+                                }}
+                            />
+                            <span>/ {metadataSliceCount}</span>
+                            <button
+                                className="stepButton"
+                                type="button"
+                                aria-label="Next slice metadata"
+                                disabled={
+                                    metadataSlice >= metadataSliceCount - 1
+                                }
+                                onClick={() =>
+                                    setMetadataSlice((current) =>
+                                        Math.min(
+                                            current + 1,
+                                            metadataSliceCount - 1,
+                                        ),
+                                    )
+                                }
+                            >
+                                <ChevronRight size={14} />
+                            </button>
+                        </div>
                         <div className="metadataSearchRow">
                             <Search size={15} />
                             <input
@@ -1777,7 +2704,7 @@ function App() {
                             />
                             <span>
                                 {filteredMetadata.length}/
-                                {metadataVolume.metadata?.length ?? 0}
+                                {metadataEntries?.length ?? 0}
                             </span>
                         </div>
                         <div className="metadataGrid" role="table">
@@ -1788,6 +2715,11 @@ function App() {
                                 <span role="columnheader">VR</span>
                                 <span role="columnheader">Length</span>
                             </div>
+                            {metadataEntries === null && (
+                                <div className="metadataGridRow" role="row">
+                                    <span role="cell">Loading...</span>
+                                </div>
+                            )}
                             {filteredMetadata.map((entry) => (
                                 <div
                                     key={entry.tagId}
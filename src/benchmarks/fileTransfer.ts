@@ -0,0 +1,72 @@
+import {
+    medicalFileChannel,
+    readMedicalFileViaChannel,
+} from "../loaders/medicalFileChannel";
+import type { MedicalFile } from "../types";
+
+declare global {
+    interface Window {
+        dcmViewerBenchmarks?: {
+            fileTransfer: typeof benchmarkFileTransfer;
+        };
+    }
+}
+
+export type FileTransferBenchmarkResult = {
+    path: "invoke" | "message-port";
+    files: number;
+    megabytes: number;
+    seconds: number;
+    megabytesPerSecond: number;
+};
+
+async function measureTransfer(
+    path: FileTransferBenchmarkResult["path"],
+    filePaths: string[],
+    read: (path: string) => Promise<MedicalFile>,
+): Promise<FileTransferBenchmarkResult> {
+    let totalBytes = 0;
+    const start = performance.now();
+
+    for (const filePath of filePaths) {
+        const file = await read(filePath);
+        totalBytes += file.bytes.byteLength;
+    }
+
+    const seconds = (performance.now() - start) / 1000;
+    const megabytes = totalBytes / (1024 * 1024);
+
+    return {
+        path,
+        files: filePaths.length,
+        megabytes,
+        seconds,
+        megabytesPerSecond: megabytes / Math.max(seconds, 1e-9),
+    };
+}
+
+export async function benchmarkFileTransfer(filePaths: string[], rounds = 3) {
+    const api = window.dcmViewer;
+    const port = await medicalFileChannel();
+
+    if (!api || !port) {
+        throw new Error(
+            "The file transfer benchmark requires the desktop app.",
+        );
+    }
+
+    const results: FileTransferBenchmarkResult[] = [];
+    for (let round = 0; round < rounds; round += 1) {
+        results.push(
+            await measureTransfer("invoke", filePaths, (path) =>
+                api.readMedicalFile(path),
+            ),
+            await measureTransfer("message-port", filePaths, (path) =>
+                readMedicalFileViaChannel(port, path),
+            ),
+        );
+    }
+
+    console.table(results);
+    return results;
+}
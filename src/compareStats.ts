@@ -0,0 +1,218 @@
+import type { DifferenceSource } from "./differenceSlices";
+import type { LoadedVolume } from "./types";
+import { shareVolumeData } from "./voxels";
+
+export type CompareStats = {
+    mae: number;
+    rmse: number;
+    maxAbs: number;
+    psnr: number;
+    ssim: number;
+};
+
+export type CompareSliceStats = CompareStats & { slice: number };
+
+export type CompareStatsRequest = {
+    first: DifferenceSource;
+    second: DifferenceSource;
+    dataRange: number;
+};
+
+export type CompareStatsProgress = {
+    slices: CompareSliceStats[];
+    volume: CompareStats;
+    done: boolean;
+};
+
+type CompareTotals = {
+    voxels: number;
+    sumAbs: number;
+    sumSquares: number;
+    maxAbs: number;
+    ssimSum: number;
+    blocks: number;
+};
+
+const SSIM_BLOCK_SIZE = 8;
+const PROGRESS_VOXELS = 4 * 1024 * 1024;
+
+function emptyTotals(): CompareTotals {
+    return {
+        voxels: 0,
+        sumAbs: 0,
+        sumSquares: 0,
+        maxAbs: 0,
+        ssimSum: 0,
+        blocks: 0,
+    };
+}
+
+function addTotals(target: CompareTotals, source: CompareTotals) {
+    target.voxels += source.voxels;
+    target.sumAbs += source.sumAbs;
+    target.sumSquares += source.sumSquares;
+    target.maxAbs = Math.max(target.maxAbs, source.maxAbs);
+    target.ssimSum += source.ssimSum;
+    target.blocks += source.blocks;
+}
+
+function statsFromTotals(totals: CompareTotals, dataRange: number) {
+    const voxels = Math.max(totals.voxels, 1);
+    const mse = totals.sumSquares / voxels;
+
+    return {
+        mae: totals.sumAbs / voxels,
+        rmse: Math.sqrt(mse),
+        maxAbs: totals.maxAbs,
+        psnr:
+            mse > 0
+                ? 10 * Math.log10((dataRange * dataRange) / mse)
+                : Number.POSITIVE_INFINITY,
+        ssim: totals.blocks > 0 ? totals.ssimSum / totals.blocks : 1,
+    };
+}
+
+// Error sums cover every voxel of the axial slice; SSIM is the mean over
+// non-overlapping 8x8 blocks, using the stabilising constants of the
+// original SSIM definition scaled to the Case 1 data range.
+function measureSlice(
+    { first, second, dataRange }: CompareStatsRequest,
+    z: number,
+): CompareTotals {
+    const [width, height] = first.dimensions;
+    const sliceStart = z * width * height;
+    const c1 = (0.01 * dataRange) ** 2;
+    const c2 = (0.03 * dataRange) ** 2;
+    const totals = emptyTotals();
+
+    for (let blockY = 0; blockY < height; blockY += SSIM_BLOCK_SIZE) {
+        const blockBottom = Math.min(blockY + SSIM_BLOCK_SIZE, height);
+
+        for (let blockX = 0; blockX < width; blockX += SSIM_BLOCK_SIZE) {
+            const blockRight = Math.min(blockX + SSIM_BLOCK_SIZE, width);
+            let sumFirst = 0;
+            let sumSecond = 0;
+            let sumFirstSquares = 0;
+            let sumSecondSquares = 0;
+            let sumProducts = 0;
+
+            for (let y = blockY; y < blockBottom; y += 1) {
+                const row = y * width;
+
+                for (let x = blockX; x < blockRight; x += 1) {
+                    const index = sliceStart + row + x;
+                    const a =
+                        first.data[index] * first.rescaleSlope +
+                        first.rescaleIntercept;
+                    const b =
+                        second.data[index] * second.rescaleSlope +
+                        second.rescaleIntercept;
+                    const difference = Math.abs(b - a);
+
+                    totals.sumAbs += difference;
+                    totals.sumSquares += difference * difference;
+                    if (difference > totals.maxAbs) totals.maxAbs = difference;
+                    sumFirst += a;
+                    sumSecond += b;
+                    sumFirstSquares += a * a;
+                    sumSecondSquares += b * b;
+                    sumProducts += a * b;
+                }
+            }
+
+            const count = (blockBottom - blockY) * (blockRight - blockX);
+            const meanFirst = sumFirst / count;
+            const meanSecond = sumSecond / count;
+            const varianceFirst = sumFirstSquares / count - meanFirst ** 2;
+            const varianceSecond = sumSecondSquares / count - meanSecond ** 2;
+            const covariance = sumProducts / count - meanFirst * meanSecond;
+
+            totals.voxels += count;
+            totals.ssimSum +=
+                ((2 * meanFirst * meanSecond + c1) * (2 * covariance + c2)) /
+                ((meanFirst ** 2 + meanSecond ** 2 + c1) *
+                    (varianceFirst + varianceSecond + c2));
+            totals.blocks += 1;
+        }
+    }
+
+    return totals;
+}
+
+export function measureCompareStats(
+    request: CompareStatsRequest,
+    onProgress: (progress: CompareStatsProgress) => void,
+) {
+    const [width, height, depth] = request.first.dimensions;
+    const chunkSlices = Math.max(
+        Math.floor(PROGRESS_VOXELS / Math.max(width * height, 1)),
+        1,
+    );
+    const volumeTotals = emptyTotals();
+
+    for (let z = 0; z < depth; z += chunkSlices) {
+        const chunkEnd = Math.min(z + chunkSlices, depth);
+        const slices: CompareSliceStats[] = [];
+
+        for (let slice = z; slice < chunkEnd; slice += 1) {
+            const totals = measureSlice(request, slice);
+            addTotals(volumeTotals, totals);
+            slices.push({
+                ...statsFromTotals(totals, request.dataRange),
+                slice,
+            });
+        }
+
+        onProgress({
+            slices,
+            volume: statsFromTotals(volumeTotals, request.dataRange),
+            done: chunkEnd >= depth,
+        });
+    }
+}
+
+function compareSource(volume: LoadedVolume): DifferenceSource {
+    const { data, dimensions, rescaleSlope, rescaleIntercept } =
+        shareVolumeData(volume);
+    return { data, dimensions, rescaleSlope, rescaleIntercept };
+}
+
+// Both volumes are handed to the worker as views over their shared buffers,
+// so the statistics pass reads the resident voxels without copying them.
+export function scanCompareStats(
+    first: LoadedVolume,
+    second: LoadedVolume,
+    onProgress: (progress: CompareStatsProgress) => void,
+    onError: (error: Error) => void,
+) {
+    const request: CompareStatsRequest = {
+        first: compareSource(first),
+        second: compareSource(second),
+        dataRange: Math.max(first.max - first.min, 1),
+    };
+
+    if (typeof Worker === "undefined") {
+        measureCompareStats(request, onProgress);
+        return () => undefined;
+    }
+
+    const worker = new Worker(
+        new URL("./compareStatsWorker.ts", import.meta.url),
+        { type: "module" },
+    );
+    worker.addEventListener(
+        "message",
+        (event: MessageEvent<CompareStatsProgress>) => {
+            onProgress(event.data);
+            if (event.data.done) worker.terminate();
+        },
+    );
+    worker.addEventListener("error", (event) => {
+        event.preventDefault();
+        worker.terminate();
+        onError(new Error(event.message || "Comparison statistics failed."));
+    });
+    worker.postMessage(request);
+
+    return () => worker.terminate();
+}
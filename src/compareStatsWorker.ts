@@ -0,0 +1,13 @@
+import {
+    measureCompareStats,
+    type CompareStatsRequest,
+} from "./compareStats";
+
+globalThis.addEventListener(
+    "message",
+    (event: MessageEvent<CompareStatsRequest>) => {
+        measureCompareStats(event.data, (progress) =>
+            globalThis.postMessage(progress),
+        );
+    },
+);
@@ -0,0 +1,187 @@
+import { useState } from "react";
+import { ChevronDown, ChevronRight, Crosshair, Undo2 } from "lucide-react";
+import type { CompareSliceStats, CompareStats } from "../compareStats";
+
+type Props = {
+    slices: CompareSliceStats[];
+    volume?: CompareStats;
+    done: boolean;
+    sliceCount: number;
+    currentSlice?: number;
+    resampling?: { current: number; total: number };
+    registered: boolean;
+    canRegister: boolean;
+    onRegister: () => void;
+    onClearRegistration: () => void;
+};
+
+type CompareMetric = keyof CompareStats;
+
+const metricLabels: Record<CompareMetric, string> = {
+    mae: "MAE",
+    rmse: "RMSE",
+    maxAbs: "Max",
+    psnr: "PSNR",
+    ssim: "SSIM",
+};
+
+const metrics = Object.keys(metricLabels) as CompareMetric[];
+const SPARKLINE_HEIGHT = 100;
+
+function formatMetric(metric: CompareMetric, value?: number) {
+    if (value === undefined) return "-";
+    if (value === Number.POSITIVE_INFINITY) return "∞";
+    if (metric === "ssim") return value.toFixed(4);
+    if (metric === "psnr") return `${value.toFixed(2)} dB`;
+    return value.toFixed(2);
+}
+
+function sparklinePoints(slices: CompareSliceStats[], metric: CompareMetric) {
+    const finiteValues = slices
+        .map((slice) => slice[metric])
+        .filter((value) => Number.isFinite(value));
+    if (finiteValues.length === 0) return "";
+
+    const low = Math.min(...finiteValues);
+    const high = Math.max(...finiteValues);
+    const span = Math.max(high - low, Number.EPSILON);
+
+    return slices
+        .map((slice) => {
+            const value = Number.isFinite(slice[metric]) ? slice[metric] : high;
+            const y =
+                SPARKLINE_HEIGHT - ((value - low) / span) * SPARKLINE_HEIGHT;
+            return `${slice.slice + 0.5},${y.toFixed(2)}`;
+        })
+        .join(" ");
+}
+
+export function CompareStatsPanel({
+    slices,
+    volume,
+    done,
+    sliceCount,
+    currentSlice,
+    resampling,
+    registered,
+    canRegister,
+    onRegister,
+    onClearRegistration,
+}: Props) {
+    const [expanded, setExpanded] = useState(true);
+    const [metric, setMetric] = useState<CompareMetric>("mae");
+    const current = slices.find((slice) => slice.slice === currentSlice);
+    const resamplePercent =
+        resampling &&
+        Math.round((resampling.current / Math.max(resampling.total, 1)) * 100);
+
+    return (
+        <section className="windowingPanel sidebarPanel">
+            <div className="windowingPanelHeader">
+                <button
+                    className="panelToggleButton"
+                    type="button"
+                    aria-label={
+                        expanded
+                            ? "Collapse compare panel"
+                            : "Expand compare panel"
+                    }
+                    onClick={() => setExpanded((value) => !value)}
+                >
+                    {expanded ? (
+                        <ChevronDown size={14} />
+                    ) : (
+                        <ChevronRight size={14} />
+                    )}
+                </button>
+                <span>Compare</span>
+                <strong>
+                    {resamplePercent !== undefined
+                        ? `Resampling ${resamplePercent}%`
+                        : done
+                          ? `SSIM ${formatMetric("ssim", volume?.ssim)}`
+                          : `${slices.length}/${sliceCount} slices`}
+                </strong>
+            </div>
+            {expanded && (
+                <>
+                    <div className="storageRow compareAlignmentRow">
+                        <span>
+                            Alignment {registered ? "rigid" : "geometry"}
+                        </span>
+                        <button
+                            className="treeActionButton"
+                            type="button"
+                            aria-label="Register Case 2 to Case 1"
+                            title="Register"
+                            disabled={!canRegister}
+                            onClick={onRegister}
+                        >
+                            <Crosshair size={13} />
+                        </button>
+                        <button
+                            className="treeActionButton"
+                            type="button"
+                            aria-label="Clear registration"
+                            title="Clear registration"
+                            disabled={!registered}
+                            onClick={onClearRegistration}
+                        >
+                            <Undo2 size={13} />
+                        </button>
+                    </div>
+                    <div className="compareStatsGrid">
+                        <span />
+                        <span>Volume</span>
+                        <span>Slice</span>
+                        {metrics.map((item) => (
+                            <div className="compareStatsRow" key={item}>
+                                <span>{metricLabels[item]}</span>
+                                <strong>
+                                    {formatMetric(item, volume?.[item])}
+                                </strong>
+                                <strong>
+                                    {formatMetric(item, current?.[item])}
+                                </strong>
+                            </div>
+                        ))}
+                    </div>
+                    <label className="windowingPresetRow">
+                        <span>Plot</span>
+                        <select
+                            value={metric}
+                            aria-label="Plotted compare metric"
+                            onChange={(event) =>
+                                setMetric(event.target.value as CompareMetric)
+                            }
+                        >
+                            {metrics.map((item) => (
+                                <option key={item} value={item}>
+                                    {metricLabels[item]}
+                                </option>
+                            ))}
+                        </select>
+                    </label>
+                    <svg
+                        className="compareSparkline"
+                        viewBox={`0 0 ${Math.max(sliceCount, 1)} ${SPARKLINE_HEIGHT}`}
+                        preserveAspectRatio="none"
+                        role="img"
+                        aria-label={`${metricLabels[metric]} by slice`}
+                    >
+                        {currentSlice !== undefined && (
+                            <line
+                                className="compareSparklineCursor"
+                                x1={currentSlice + 0.5}
+                                x2={currentSlice + 0.5}
+                                y1={0}
+                                y2={SPARKLINE_HEIGHT}
+                            />
+                        )}
+                        <polyline points={sparklinePoints(slices, metric)} />
+                    </svg>
+                </>
+            )}
+        </section>
+    );
+}
@@ -1,18 +1,26 @@
-import { useCallback, useEffect, useRef, useState } from "react";
+import { useCallback, useEffect, useMemo, useRef, useState } from "react";
 import type { PointerEvent } from "react";
 import { Link2, Unlink2 } from "lucide-react";
 import type {
     Axis,
+    SlabMode,
     ViewportState,
     VisualizationColorMap,
     Volume,
 } from "../types";
+import { getSliceCount, getSliceSize, getVoxel } from "../rendering";
 import {
-    getSliceCount,
-    getSliceSize,
-    getVoxel,
-    renderSliceToCanvas,
-} from "../rendering";
+    createViewportRenderer,
+    type ViewportRenderer,
+} from "../viewportRenderer";
+import {
+    isRangedVolume,
+    readAxialSlab,
+    type VolumeSlab,
+} from "../loaders/volumeSlabs";
+import { differenceSliceVolume } from "../differenceSlices";
+import { isVolumeLoaded } from "../voxels";
+import { useFrameCoalescedChange } from "../hooks/useFrameCoalescedChange";
 import { DEFAULT_WINDOW_CENTER, DEFAULT_WINDOW_WIDTH } from "../windowing";
 
 type Props = {
@@ -31,6 +39,15 @@ const axisLabels: Record<Axis, string> = {
     sagittal: "Sagittal",
 };
 
+const slabModeLabels: Record<SlabMode, string> = {
+    slice: "Slice",
+    mip: "MIP",
+    minip: "MinIP",
+    avgip: "AvgIP",
+};
+
+const WINDOW_SETTLE_MS = 150;
+
 type WindowDragState = {
     startX: number;
     startY: number;
@@ -38,6 +55,12 @@ type WindowDragState = {
     windowWidth: number;
 };
 
+type SlabError = {
+    volumeId: string;
+    slice: number;
+    message: string;
+};
+
 type HoverVoxel = {
     x: number;
     y: number;
@@ -83,35 +106,111 @@ export function SliceViewport({
     onToggleSingleView,
     onChange,
 }: Props) {
-    const canvasRef = useRef<HTMLCanvasElement>(null);
+    const rendererRef = useRef<ViewportRenderer>();
     const stageRef = useRef<HTMLDivElement>(null);
     const windowDragRef = useRef<WindowDragState | null>(null);
+    const windowSettleRef = useRef<number>();
+    const [windowDragging, setWindowDragging] = useState(false);
     const [hoverVoxel, setHoverVoxel] = useState<HoverVoxel | null>(null);
+    const [slab, setSlab] = useState<VolumeSlab>();
+    const [slabError, setSlabError] = useState<SlabError>();
     const volume = volumes.find((item) => item.id === state.volumeId);
+    const channelVolumes =
+        volume?.channelIndex !== undefined
+            ? volumes
+                  .filter(
+                      (item) =>
+                          item.channelIndex !== undefined &&
+                          item.sourcePath === volume.sourcePath,
+                  )
+                  .sort(
+                      (left, right) =>
+                          (left.channelIndex ?? 0) - (right.channelIndex ?? 0),
+                  )
+            : [];
     const sliceCount = volume ? getSliceCount(volume, state.axis) : 1;
     const boundedSlice = Math.min(Math.max(state.slice, 0), sliceCount - 1);
-
-    const changeSlice = useCallback(
-        (nextSlice: number) => {
-            const clampedSlice = Math.min(
-                Math.max(nextSlice, 0),
-                sliceCount - 1,
-            );
-            if (clampedSlice === boundedSlice) return;
-            onChange({ ...state, slice: clampedSlice });
+    const slabReadable =
+        volume !== undefined &&
+        !isVolumeLoaded(volume) &&
+        isRangedVolume(volume) &&
+        state.axis === "axial";
+    const currentSlab =
+        slabReadable &&
+        slab &&
+        slab.volumeId === volume.id &&
+        boundedSlice >= slab.firstSlice &&
+        boundedSlice < slab.firstSlice + slab.volume.dimensions[2]
+            ? slab
+            : undefined;
+    const currentSlabError =
+        slabReadable &&
+        slabError?.volumeId === volume.id &&
+        slabError.slice === boundedSlice
+            ? slabError.message
+            : undefined;
+    const [firstSourceId, secondSourceId] = volume?.differenceSources ?? [];
+    const firstSource = volumes.find((item) => item.id === firstSourceId);
+    const secondSource = volumes.find((item) => item.id === secondSourceId);
+    const differenceSlice = useMemo(
+        () =>
+            volume &&
+            firstSource &&
+            secondSource &&
+            isVolumeLoaded(firstSource) &&
+            isVolumeLoaded(secondSource)
+                ? differenceSliceVolume(
+                      volume,
+                      firstSource,
+                      secondSource,
+                      state.axis,
+                      boundedSlice,
+                  )
+                : undefined,
+        [boundedSlice, firstSource, secondSource, state.axis, volume],
+    );
+    // Ranged volumes without resident voxels draw from the axial slab that
+    // holds the current slice, and difference volumes from a one-slice
+    // volume; both are offset into their own slice range along the axis.
+    const loadedVolume =
+        volume && isVolumeLoaded(volume)
+            ? volume
+            : (currentSlab?.volume ?? differenceSlice);
+    const sliceOffset =
+        currentSlab?.firstSlice ?? (differenceSlice ? boundedSlice : 0);
+    // Thick-slab projections need every slice of the slab resident, so they
+    // apply only to fully loaded volumes.
+    const slabMode =
+        volume && isVolumeLoaded(volume) && state.slabThickness > 1
+            ? state.slabMode
+            : "slice";
+
+    const queueChange = useFrameCoalescedChange(state, onChange);
+
+    const stepSlice = useCallback(
+        (step: number) => {
+            queueChange((current) => {
+                const nextSlice = Math.min(
+                    Math.max(current.slice + step, 0),
+                    sliceCount - 1,
+                );
+                return nextSlice === current.slice
+                    ? current
+                    : { ...current, slice: nextSlice };
+            });
         },
-        [boundedSlice, onChange, sliceCount, state],
+        [queueChange, sliceCount],
     );
 
     const updateHoverVoxel = useCallback(
         (event: PointerEvent<HTMLDivElement>) => {
-            if (!volume || !stageRef.current) {
+            if (!loadedVolume || !stageRef.current) {
                 setHoverVoxel(null);
                 return;
             }
 
             const stageRect = stageRef.current.getBoundingClientRect();
-            const sliceSize = getSliceSize(volume, state.axis);
+            const sliceSize = getSliceSize(loadedVolume, state.axis);
 
             if (
                 stageRect.width <= 0 ||
@@ -152,7 +251,7 @@ export function SliceViewport({
                 Math.max(Math.floor(localY / scale), 0),
                 sliceSize.height - 1,
             );
-            const depthRow = volume.dimensions[2] - 1 - sliceY;
+            const depthRow = (volume?.dimensions[2] ?? 1) - 1 - sliceY;
             const voxel =
                 state.axis === "axial"
                     ? { x: sliceX, y: sliceY, z: boundedSlice }
@@ -162,10 +261,15 @@ export function SliceViewport({
 
             setHoverVoxel({
                 ...voxel,
-                value: getVoxel(volume, voxel.x, voxel.y, voxel.z),
+                value: getVoxel(
+                    loadedVolume,
+                    voxel.x - (state.axis === "sagittal" ? sliceOffset : 0),
+                    voxel.y - (state.axis === "coronal" ? sliceOffset : 0),
+                    voxel.z - (state.axis === "axial" ? sliceOffset : 0),
+                ),
             });
         },
-        [boundedSlice, state.axis, volume],
+        [boundedSlice, loadedVolume, sliceOffset, state.axis],
     );
 
     const handlePointerDown = (event: PointerEvent<HTMLDivElement>) => {
@@ -190,37 +294,61 @@ export function SliceViewport({
         const deltaX = event.clientX - dragState.startX;
         const deltaY = event.clientY - dragState.startY;
 
-        onChange({
-            ...state,
+        queueChange((current) => ({
+            ...current,
             windowCenter: dragState.windowCenter - deltaY,
             windowWidth: Math.max(dragState.windowWidth + deltaX, 1),
-        });
+        }));
+
+        // Drag frames render from the volume pyramid; once the pointer rests
+        // or is released, the slice is drawn again at full resolution.
+        setWindowDragging(true);
+        window.clearTimeout(windowSettleRef.current);
+        windowSettleRef.current = window.setTimeout(
+            () => setWindowDragging(false),
+            WINDOW_SETTLE_MS,
+        );
     };
 
     const stopWindowDrag = (event: PointerEvent<HTMLDivElement>) => {
         if (!windowDragRef.current) return;
 
         windowDragRef.current = null;
+        window.clearTimeout(windowSettleRef.current);
+        setWindowDragging(false);
         if (event.currentTarget.hasPointerCapture(event.pointerId)) {
             event.currentTarget.releasePointerCapture(event.pointerId);
         }
     };
 
+    const attachCanvas = useCallback((canvas: HTMLCanvasElement | null) => {
+        rendererRef.current?.dispose();
+        rendererRef.current = canvas
+            ? createViewportRenderer(canvas)
+            : undefined;
+    }, []);
+
     useEffect(() => {
-        if (!volume || !canvasRef.current) return;
-        renderSliceToCanvas(
-            canvasRef.current,
-            volume,
-            state.axis,
-            boundedSlice,
-            state.windowCenter,
-            state.windowWidth,
-            {
+        const renderer = rendererRef.current;
+        if (!loadedVolume || !renderer) return;
+
+        renderer.setVolume(loadedVolume);
+        renderer.render({
+            axis: state.axis,
+            slice: boundedSlice - sliceOffset,
+            windowCenter: state.windowCenter,
+            windowWidth: state.windowWidth,
+            visualization: {
                 colorMap: state.colorMap,
                 clipMin: state.clipMin,
                 clipMax: state.clipMax,
             },
-        );
+            interactive: windowDragging,
+            slab:
+                slabMode === "slice"
+                    ? undefined
+                    : { mode: slabMode, thickness: state.slabThickness },
+        });
     }, [
         boundedSlice,
         state.axis,
@@ -229,9 +357,41 @@ export function SliceViewport({
         state.colorMap,
         state.clipMin,
         state.clipMax,
-        volume,
+        loadedVolume,
+        sliceOffset,
+        slabMode,
+        state.slabThickness,
+        windowDragging,
     ]);
 
+    useEffect(() => () => window.clearTimeout(windowSettleRef.current), []);
+
+    useEffect(() => {
+        if (!volume || !slabReadable || currentSlab) return undefined;
+
+        // A failed read is shown in the viewport and retried as soon as the
+        // slice changes, since the effect runs again for the new slice.
+        let cancelled = false;
+        setSlabError(undefined);
+        readAxialSlab(volume, boundedSlice)
+            .then((nextSlab) => {
+                if (!cancelled) setSlab(nextSlab);
+            })
+            .catch((error: unknown) => {
+                if (cancelled) return;
+                setSlabError({
+                    volumeId: volume.id,
+                    slice: boundedSlice,
+                    message:
+                        error instanceof Error ? error.message : String(error),
+                });
+            });
+
+        return () => {
+            cancelled = true;
+        };
+    }, [boundedSlice, currentSlab, slabReadable, volume]);
+
     useEffect(() => {
         if (volume && state.slice !== boundedSlice) {
             onChange({ ...state, slice: boundedSlice });
@@ -247,12 +407,12 @@ export function SliceViewport({
 
             event.preventDefault();
             onActivate();
-            changeSlice(boundedSlice + (event.deltaY > 0 ? 1 : -1));
+            stepSlice(event.deltaY > 0 ? 1 : -1);
         };
 
         stage.addEventListener("wheel", handleWheel, { passive: false });
         return () => stage.removeEventListener("wheel", handleWheel);
-    }, [boundedSlice, changeSlice, onActivate, volume]);
+    }, [onActivate, stepSlice, volume]);
 
     return (
         <section
@@ -271,7 +431,7 @@ export function SliceViewport({
             }}
         >
             <div
-                className={`viewportHeader ${linkEnabled ? "" : "viewportHeaderNoLink"}`}
+                className={`viewportHeader ${linkEnabled ? "" : "viewportHeaderNoLink"} ${channelVolumes.length > 1 ? "viewportHeaderChannels" : ""}`}
             >
                 {linkEnabled && (
                     <button
@@ -327,6 +487,34 @@ export function SliceViewport({
                         </option>
                     ))}
                 </select>
+                {channelVolumes.length > 1 && (
+                    <select
+                        aria-label="Select channel"
+                        value={state.volumeId}
+                        onChange={(event) => {
+                            const nextChannel = channelVolumes.find(
+                                (item) => item.id === event.target.value,
+                            );
+                            if (!nextChannel) return;
+
+                            // Channels are views over one buffer, so only the
+                            // volume and its clip range change.
+                            onChange({
+                                ...state,
+                                volumeId: nextChannel.id,
+                                clipMin: nextChannel.min,
+                                clipMax: nextChannel.max,
+                            });
+                        }}
+                    >
+                        {channelVolumes.map((item) => (
+                            <option key={item.id} value={item.id}>
+                                {item.channelLabel ??
+                                    `Channel ${(item.channelIndex ?? 0) + 1}`}
+                            </option>
+                        ))}
+                    </select>
+                )}
                 <div
                     className="segmented"
                     role="group"
@@ -371,12 +559,18 @@ export function SliceViewport({
                 onPointerLeave={() => setHoverVoxel(null)}
                 onContextMenu={(event) => event.preventDefault()}
             >
-                {volume ? (
-                    <canvas ref={canvasRef} />
+                {loadedVolume ? (
+                    <canvas ref={attachCanvas} />
                 ) : (
-                    <div className="emptyViewport">Select a volume</div>
+                    <div className="emptyViewport">
+                        {currentSlabError
+                            ? `Could not read slice ${boundedSlice + 1}: ${currentSlabError}`
+                            : volume
+                              ? "Loading volume..."
+                              : "Select a volume"}
+                    </div>
                 )}
-                {volume && (
+                {loadedVolume && (
                     <div className="voxelInfoPanel" aria-live="polite">
                         <span>X: {hoverVoxel ? hoverVoxel.x : "-"}</span>
                         <span>Y: {hoverVoxel ? hoverVoxel.y : "-"}</span>
@@ -408,6 +602,8 @@ export function SliceViewport({
                 <label>
                     <span>
                         Slice {boundedSlice + 1}/{sliceCount}
+                        {slabMode !== "slice" &&
+                            ` · ${slabModeLabels[slabMode]} ${state.slabThickness}`}
                     </span>
                     <input
                         type="range"
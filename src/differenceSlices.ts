@@ -0,0 +1,114 @@
+import type { Axis, LoadedVolume, Volume } from "./types";
+
+export type DifferenceSource = Pick<
+    LoadedVolume,
+    "data" | "dimensions" | "rescaleSlope" | "rescaleIntercept"
+>;
+
+type DifferenceBox = [number, number, number, number, number, number];
+
+const MAX_CACHED_SLICE_BYTES = 64 * 1024 * 1024;
+const cachedSlices = new Map<string, Float32Array>();
+let cachedSliceBytes = 0;
+
+// Difference slices pair voxels index for index, so Case 2 must already be
+// on Case 1's grid (see `resampleVolume`).
+export function canCompareVolumes(first: Volume, second: Volume) {
+    return first.dimensions.every(
+        (size, axis) => size === second.dimensions[axis],
+    );
+}
+
+// Writes `second - first` over [x0, x1) x [y0, y1) x [z0, z1) of the first
+// volume's grid to the output in z, y, x order.
+export function differenceBox(
+    first: DifferenceSource,
+    second: DifferenceSource,
+    [x0, x1, y0, y1, z0, z1]: DifferenceBox,
+    output: Float32Array,
+) {
+    const [width, height] = first.dimensions;
+    const planeSize = width * height;
+    const firstData = first.data;
+    const secondData = second.data;
+    const firstSlope = first.rescaleSlope;
+    const secondSlope = second.rescaleSlope;
+    const interceptDelta = second.rescaleIntercept - first.rescaleIntercept;
+    let target = 0;
+
+    for (let z = z0; z < z1; z += 1) {
+        for (let y = y0; y < y1; y += 1) {
+            const row = z * planeSize + y * width;
+
+            for (let x = x0; x < x1; x += 1) {
+                output[target] =
+                    secondData[row + x] * secondSlope -
+                    firstData[row + x] * firstSlope +
+                    interceptDelta;
+                target += 1;
+            }
+        }
+    }
+}
+
+export function withDifferenceRange(volume: Volume, maxAbs: number): Volume {
+    return {
+        ...volume,
+        windowWidth: maxAbs * 2,
+        min: -maxAbs,
+        max: maxAbs,
+    };
+}
+
+function rememberSlice(key: string, data: Float32Array) {
+    cachedSlices.set(key, data);
+    cachedSliceBytes += data.byteLength;
+
+    for (const [cachedKey, cached] of cachedSlices) {
+        if (cachedSliceBytes <= MAX_CACHED_SLICE_BYTES) break;
+        if (cachedKey === key) continue;
+        cachedSlices.delete(cachedKey);
+        cachedSliceBytes -= cached.byteLength;
+    }
+}
+
+// Difference volumes carry no voxels of their own. Each rendered slice is
+// computed on demand as a one-slice volume and kept in a bounded cache.
+export function differenceSliceVolume(
+    volume: Volume,
+    first: LoadedVolume,
+    second: LoadedVolume,
+    axis: Axis,
+    slice: number,
+): LoadedVolume {
+    const [width, height, depth] = first.dimensions;
+    const box: DifferenceBox =
+        axis === "axial"
+            ? [0, width, 0, height, slice, slice + 1]
+            : axis === "coronal"
+              ? [0, width, slice, slice + 1, 0, depth]
+              : [slice, slice + 1, 0, height, 0, depth];
+    const dimensions: [number, number, number] = [
+        box[1] - box[0],
+        box[3] - box[2],
+        box[5] - box[4],
+    ];
+    const key = `${volume.id}:${axis}:${slice}`;
+    let data = cachedSlices.get(key);
+
+    if (data) {
+        cachedSlices.delete(key);
+        cachedSlices.set(key, data);
+    } else {
+        const length = dimensions[0] * dimensions[1] * dimensions[2];
+        const bytes = length * Float32Array.BYTES_PER_ELEMENT;
+        data =
+            typeof SharedArrayBuffer === "undefined"
+                ? new Float32Array(length)
+                : new Float32Array(new SharedArrayBuffer(bytes));
+        differenceBox(first, second, box, data);
+        rememberSlice(key, data);
+    }
+
+    return { ...volume, id: key, dimensions, data };
+}
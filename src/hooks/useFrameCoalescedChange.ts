@@ -0,0 +1,64 @@
+import { useCallback, useEffect, useRef } from "react";
+
+type Update<State> = (current: State) => State;
+
+function requestFrame(callback: () => void) {
+    if (typeof requestAnimationFrame === "function") {
+        const handle = requestAnimationFrame(callback);
+        return () => cancelAnimationFrame(handle);
+    }
+
+    const handle = setTimeout(callback, 16);
+    return () => clearTimeout(handle);
+}
+
+// Input handlers can fire many times per frame. Updates are applied to the
+// pending state as they arrive, so relative steps such as wheel ticks are
+// never lost, and the result is committed once on the next animation frame.
+export function useFrameCoalescedChange<State>(
+    state: State,
+    onChange: (nextState: State) => void,
+) {
+    const stateRef = useRef(state);
+    const propsRef = useRef(state);
+    const onChangeRef = useRef(onChange);
+    const pendingRef = useRef<State>();
+    const cancelFrameRef = useRef<() => void>();
+
+    // A committed state stays current until different props arrive, so an
+    // update between the commit and the re-render builds on it instead of
+    // on the stale props.
+    if (propsRef.current !== state) {
+        propsRef.current = state;
+        stateRef.current = state;
+    }
+    onChangeRef.current = onChange;
+
+    const flush = useCallback(() => {
+        cancelFrameRef.current = undefined;
+        const pending = pendingRef.current;
+        pendingRef.current = undefined;
+        if (pending !== undefined && pending !== stateRef.current) {
+            stateRef.current = pending;
+            onChangeRef.current(pending);
+        }
+    }, []);
+
+    useEffect(
+        () => () => {
+            cancelFrameRef.current?.();
+            flush();
+        },
+        [flush],
+    );
+
+    return useCallback(
+        (update: Update<State>) => {
+            pendingRef.current = update(
+                pendingRef.current ?? stateRef.current,
+            );
+            cancelFrameRef.current ??= requestFrame(flush);
+        },
+        [flush],
+    );
+}
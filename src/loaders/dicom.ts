@@ -1,7 +1,18 @@
 import dicomParser from "dicom-parser";
-import type { Volume } from "../types";
-
-type DicomSlice = {
+import type {
+    LoadedVolume,
+    MedicalFile,
+    Volume,
+    VolumeMetadataEntry,
+} from "../types";
+import {
+    allocateVoxelData,
+    getVoxelRange,
+    littleEndianHost,
+    voxelArrayConstructor,
+} from "../voxels";
+
+export type DicomSlice = {
     filePath: string;
     fileName: string;
     patientId: string;
@@ -14,23 +25,28 @@ type DicomSlice = {
     studyDate: string;
     pixelSpacing: string;
     sliceThickness: string;
+    pixelSpacingValues?: number[];
+    imagePosition?: number[];
+    imageOrientation?: number[];
     rows: number;
     columns: number;
     instanceNumber: number;
     sortPosition: number;
     windowCenter?: number;
     windowWidth?: number;
-    metadata: Array<{
-        tagId: string;
-        tagName: string;
-        vr: string;
-        length: string;
-        label: string;
-        value: string;
-    }>;
-    pixels: Float32Array;
+    pixels?: StoredPixelArray;
+    rescaleSlope: number;
+    rescaleIntercept: number;
 };
 
+export type StoredPixelArray =
+    | Int8Array
+    | Uint8Array
+    | Int16Array
+    | Uint16Array;
+
+const BIG_ENDIAN_TRANSFER_SYNTAX = "1.2.840.10008.1.2.2";
+
 const tagNames: Record<string, string> = {
     x00020000: "File Meta Information Group Length",
     x00020001: "File Meta Information Version",
@@ -220,7 +236,9 @@ function elementValue(
     }
 }
 
-function collectMetadata(dataSet: dicomParser.DataSet) {
+function collectMetadata(
+    dataSet: dicomParser.DataSet,
+): VolumeMetadataEntry[] {
     return Object.entries(dataSet.elements)
         .sort(([left], [right]) => left.localeCompare(right))
         .map(([tag, element]) => {
@@ -281,10 +299,6 @@ function dotProduct(left: number[], right: number[]) {
     return left.reduce((sum, value, index) => sum + value * right[index], 0);
 }
 
-function int8Value(value: number) {
-    return value > 127 ? value - 256 : value;
-}
-
 function sliceSortPosition(dataSet: dicomParser.DataSet) {
     const imagePosition = decimalValues(dataSet, "x00200032", 3);
     const imageOrientation = decimalValues(dataSet, "x00200037", 6);
@@ -301,11 +315,42 @@ function sliceSortPosition(dataSet: dicomParser.DataSet) {
     return numberValue(dataSet, "x00201041", numberValue(dataSet, "x00200013"));
 }
 
-function pixelArray(
+// Columns run along the row direction and rows along the column direction
+// of Image Orientation (Patient); slices step between the first and last
+// Image Position (Patient), or along the normal by the slice thickness.
+function dicomAffine(sortedSlices: DicomSlice[]) {
+    const first = sortedSlices[0];
+    const last = sortedSlices[sortedSlices.length - 1];
+    const spacing = first.pixelSpacingValues;
+    const origin = first.imagePosition;
+    const orientation = first.imageOrientation;
+    if (!spacing || !origin || !orientation) return undefined;
+
+    const rowDirection = orientation.slice(0, 3);
+    const columnDirection = orientation.slice(3, 6);
+    const sliceStep =
+        sortedSlices.length > 1 && last.imagePosition
+            ? last.imagePosition.map(
+                  (value, axis) =>
+                      (value - origin[axis]) / (sortedSlices.length - 1),
+              )
+            : crossProduct(rowDirection, columnDirection).map(
+                  (value) => value * (Number(first.sliceThickness) || 1),
+              );
+
+    return [0, 1, 2].flatMap((axis) => [
+        rowDirection[axis] * spacing[1],
+        columnDirection[axis] * spacing[0],
+        sliceStep[axis],
+        origin[axis],
+    ]);
+}
+
+export function pixelArray(
     dataSet: dicomParser.DataSet,
     rows: number,
     columns: number,
-) {
+): StoredPixelArray {
     const pixelElement = dataSet.elements.x7fe00010;
     if (!pixelElement) {
         throw new Error("DICOM pixel data was not found.");
@@ -314,10 +359,7 @@ function pixelArray(
     const samplesPerPixel = numberValue(dataSet, "x00280002", 1);
     const bitsAllocated = numberValue(dataSet, "x00280100", 16);
     const pixelRepresentation = numberValue(dataSet, "x00280103", 0);
-    const slope = numberValue(dataSet, "x00281053", 1);
-    const intercept = numberValue(dataSet, "x00281052", 0);
     const pixelCount = rows * columns;
-    const output = new Float32Array(pixelCount);
 
     if (samplesPerPixel !== 1) {
         throw new Error("Only single-channel DICOM pixel data is supported.");
@@ -340,35 +382,58 @@ function pixelArray(
         );
     }
 
+    const pixelBytes = dataSet.byteArray;
+    const pixelStart = pixelElement.dataOffset;
+    const bigEndian =
+        textValue(dataSet, "x00020010", "") === BIG_ENDIAN_TRANSFER_SYNTAX;
+
+    if (bitsAllocated === 8 || (littleEndianHost && !bigEndian)) {
+        // Copying the raw bytes into a fresh buffer both aligns the data and
+        // releases the file buffer, so the stored values can be viewed as-is.
+        const copied = pixelBytes.slice(
+            pixelStart,
+            pixelStart + expectedLength,
+        ).buffer;
+
+        if (bitsAllocated === 8) {
+            return pixelRepresentation === 1
+                ? new Int8Array(copied)
+                : new Uint8Array(copied);
+        }
+
+        return pixelRepresentation === 1
+            ? new Int16Array(copied)
+            : new Uint16Array(copied);
+    }
+
+    const output =
+        pixelRepresentation === 1
+            ? new Int16Array(pixelCount)
+            : new Uint16Array(pixelCount);
+    const readValue =
+        pixelRepresentation === 1
+            ? dataSet.byteArrayParser.readInt16
+            : dataSet.byteArrayParser.readUint16;
+
     for (let index = 0; index < pixelCount; index += 1) {
-        const offset = bitsAllocated === 8 ? index : index * 2;
-        const dataOffset = pixelElement.dataOffset + offset;
-        const stored =
-            bitsAllocated === 8
-                ? pixelRepresentation === 1
-                    ? int8Value(dataSet.byteArray[dataOffset])
-                    : dataSet.byteArray[dataOffset]
-                : pixelRepresentation === 1
-                  ? dataSet.byteArrayParser.readInt16(
-                        dataSet.byteArray,
-                        dataOffset,
-                    )
-                  : dataSet.byteArrayParser.readUint16(
-                        dataSet.byteArray,
-                        dataOffset,
-                    );
-        output[index] = stored * slope + intercept;
+        output[index] = readValue(pixelBytes, pixelStart + index * 2);
     }
 
     return output;
 }
 
-export function parseDicomSlice(file: {
-    path: string;
-    name: string;
-    bytes: Uint8Array;
-}): DicomSlice {
-    const dataSet = dicomParser.parseDicom(file.bytes);
+export function parseDicomSlice(
+    file: {
+        path: string;
+        name: string;
+        bytes: Uint8Array;
+    },
+    options: { headerOnly?: boolean } = {},
+): DicomSlice {
+    const dataSet = dicomParser.parseDicom(
+        file.bytes,
+        options.headerOnly ? { untilTag: "x7fe00010" } : undefined,
+    );
     const rows = numberValue(dataSet, "x00280010");
     const columns = numberValue(dataSet, "x00280011");
 
@@ -401,27 +466,116 @@ export function parseDicomSlice(file: {
         studyDate: displayTextValue(dataSet, "x00080020"),
         pixelSpacing: displayTextValue(dataSet, "x00280030"),
         sliceThickness: displayTextValue(dataSet, "x00180050"),
+        pixelSpacingValues: decimalValues(dataSet, "x00280030", 2),
+        imagePosition: decimalValues(dataSet, "x00200032", 3),
+        imageOrientation: decimalValues(dataSet, "x00200037", 6),
         rows,
         columns,
         instanceNumber: numberValue(dataSet, "x00200013"),
         sortPosition: sliceSortPosition(dataSet),
         windowCenter: numberValue(dataSet, "x00281050", Number.NaN),
         windowWidth: numberValue(dataSet, "x00281051", Number.NaN),
-        metadata: collectMetadata(dataSet),
-        pixels: pixelArray(dataSet, rows, columns),
+        pixels: options.headerOnly
+            ? undefined
+            : pixelArray(dataSet, rows, columns),
+        rescaleSlope: numberValue(dataSet, "x00281053", 1),
+        rescaleIntercept: numberValue(dataSet, "x00281052", 0),
     };
 }
 
-function getMinMax(data: Float32Array) {
-    let min = Number.POSITIVE_INFINITY;
-    let max = Number.NEGATIVE_INFINITY;
+export function readDicomMetadata(file: MedicalFile) {
+    return collectMetadata(
+        dicomParser.parseDicom(file.bytes, { untilTag: "x7fe00010" }),
+    );
+}
+
+function sliceHasPixels(
+    slice: DicomSlice,
+): slice is DicomSlice & { pixels: StoredPixelArray } {
+    return slice.pixels !== undefined;
+}
+
+function assembleDicomData(sorted: DicomSlice[]) {
+    const first = sorted[0];
+    const pixelSlices = sorted.filter(sliceHasPixels);
 
-    for (const value of data) {
-        if (value < min) min = value;
-        if (value > max) max = value;
+    if (pixelSlices.length !== sorted.length) {
+        throw new Error(`${first.fileName} pixel data has not been loaded.`);
     }
 
-    return { min, max };
+    const pixelsPerSlice = first.rows * first.columns;
+    const voxelCount = pixelsPerSlice * sorted.length;
+    const firstPixels = pixelSlices[0].pixels;
+    const uniformStorage = pixelSlices.every(
+        (slice) =>
+            slice.rescaleSlope === first.rescaleSlope &&
+            slice.rescaleIntercept === first.rescaleIntercept &&
+            slice.pixels.constructor === firstPixels.constructor,
+    );
+    const data = allocateVoxelData(
+        uniformStorage ? voxelArrayConstructor(firstPixels) : Float32Array,
+        voxelCount,
+    );
+
+    pixelSlices.forEach((slice, index) => {
+        if (slice.rows !== first.rows || slice.columns !== first.columns) {
+            throw new Error(
+                `${slice.fileName} has a different row/column size than other slices in the same series.`,
+            );
+        }
+
+        const sliceOffset = index * pixelsPerSlice;
+
+        if (uniformStorage) {
+            data.set(slice.pixels, sliceOffset);
+            return;
+        }
+
+        for (let pixel = 0; pixel < pixelsPerSlice; pixel += 1) {
+            data[sliceOffset + pixel] =
+                slice.pixels[pixel] * slice.rescaleSlope +
+                slice.rescaleIntercept;
+        }
+    });
+
+    const rescaleSlope = uniformStorage ? first.rescaleSlope : 1;
+    const rescaleIntercept = uniformStorage ? first.rescaleIntercept : 0;
+    const { min, max } = getVoxelRange(data, rescaleSlope, rescaleIntercept);
+
+    return { data, rescaleSlope, rescaleIntercept, min, max };
+}
+
+function dicomWindow(first: DicomSlice, min: number, max: number) {
+    const storedCenter = first.windowCenter;
+    const storedWidth = first.windowWidth;
+    const windowCenter =
+        typeof storedCenter === "number" && Number.isFinite(storedCenter)
+            ? storedCenter
+            : (min + max) / 2;
+    const windowWidth =
+        typeof storedWidth === "number" && Number.isFinite(storedWidth)
+            ? Math.max(storedWidth, 1)
+            : Math.max(max - min, 1);
+
+    return { windowCenter, windowWidth };
+}
+
+function headerValueRange(first: DicomSlice) {
+    const { windowCenter, windowWidth } = first;
+
+    if (
+        typeof windowCenter === "number" &&
+        typeof windowWidth === "number" &&
+        Number.isFinite(windowCenter) &&
+        Number.isFinite(windowWidth)
+    ) {
+        return {
+            min: windowCenter - windowWidth / 2,
+            max: windowCenter + windowWidth / 2,
+        };
+    }
+
+    return { min: 0, max: 1 };
 }
 
 export function buildDicomVolumes(slices: DicomSlice[]): Volume[] {
@@ -441,32 +595,7 @@ export function buildDicomVolumes(slices: DicomSlice[]): Volume[] {
         });
         const first = sorted[0];
         const seriesName = first.seriesDescription || `Series ${seriesNumber}`;
-        const pixelsPerSlice = first.rows * first.columns;
-        const volumeData = new Float32Array(pixelsPerSlice * sorted.length);
-
-        sorted.forEach((slice, index) => {
-            if (slice.rows !== first.rows || slice.columns !== first.columns) {
-                throw new Error(
-                    `${slice.fileName} has a different row/column size than other slices in the same series.`,
-                );
-            }
-            volumeData.set(slice.pixels, index * pixelsPerSlice);
-        });
-
-        const { min, max } = getMinMax(volumeData);
-        const storedCenter = first.windowCenter;
-        const storedWidth = first.windowWidth;
-        const windowCenter =
-            typeof storedCenter === "number" && Number.isFinite(storedCenter)
-                ? storedCenter
-                : (min + max) / 2;
-        const windowWidth =
-            typeof storedWidth === "number" && Number.isFinite(storedWidth)
-                ? Math.max(storedWidth, 1)
-                : Math.max(max - min, 1);
-        const metadata = first.metadata;
-
-        return {
+        const header: Volume = {
             id: `dicom:${patientId}:${studyId}:${seriesNumber}`,
             name: seriesName,
             format: "DICOM",
@@ -474,15 +603,51 @@ export function buildDicomVolumes(slices: DicomSlice[]): Volume[] {
             studyId,
             seriesId: seriesNumber,
             dimensions: [first.columns, first.rows, sorted.length],
-            data: volumeData,
-            windowCenter,
-            windowWidth,
-            min,
-            max,
-            metadata,
+            affine: dicomAffine(sorted),
+            rescaleSlope: first.rescaleSlope,
+            rescaleIntercept: first.rescaleIntercept,
+            ...dicomWindow(first, 0, 1),
+            ...headerValueRange(first),
             sourcePath: first.filePath,
             sourceFileName: first.fileName,
             sourceParentDir: parentFolderName(first.filePath),
+            sourceFiles: sorted.map((slice) => ({
+                path: slice.filePath,
+                name: slice.fileName,
+            })),
         };
+
+        return sorted.every(sliceHasPixels)
+            ? buildDicomVolumeData(header, sorted)
+            : header;
     });
 }
+
+export function buildDicomVolumeData(
+    volume: Volume,
+    sortedSlices: DicomSlice[],
+): LoadedVolume {
+    const first = sortedSlices[0];
+
+    if (
+        !first ||
+        sortedSlices.length !== volume.dimensions[2] ||
+        first.columns !== volume.dimensions[0] ||
+        first.rows !== volume.dimensions[1]
+    ) {
+        throw new Error(`${volume.name} no longer matches its source files.`);
+    }
+
+    const { data, rescaleSlope, rescaleIntercept, min, max } =
+        assembleDicomData(sortedSlices);
+
+    return {
+        ...volume,
+        data,
+        rescaleSlope,
+        rescaleIntercept,
+        ...dicomWindow(first, min, max),
+        min,
+        max,
+    };
+}
@@ -0,0 +1,18 @@
+import { parseDicomSlice, type DicomSlice } from "./dicom";
+import { handleWorkerPoolRequests, transferableBuffer } from "./workerPool";
+import type { MedicalFile } from "../types";
+
+export type DicomParseRequest = {
+    file: MedicalFile;
+    headerOnly: boolean;
+};
+
+handleWorkerPoolRequests<DicomParseRequest, DicomSlice>(
+    ({ file, headerOnly }) => {
+        const slice = parseDicomSlice(file, { headerOnly });
+        return {
+            result: slice,
+            transfer: slice.pixels ? transferableBuffer(slice.pixels) : [],
+        };
+    },
+);
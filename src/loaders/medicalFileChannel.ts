@@ -0,0 +1,199 @@
+import type { CachedVolumeData, MedicalFile, VoxelDataType } from "../types";
+
+type MedicalFileChannelRequest = {
+    path?: string;
+    cacheKey?: string;
+    offset?: number;
+    length?: number;
+};
+
+type MedicalFileChannelReply = {
+    requestId: number;
+    path?: string;
+    name?: string;
+    dataType?: VoxelDataType;
+    bytes?: ArrayBuffer;
+    error?: string;
+};
+
+type PendingRead = {
+    resolve: (reply?: MedicalFileChannelReply) => void;
+    reject: (error: Error) => void;
+};
+
+const MEDICAL_FILE_CHANNEL_MESSAGE = "dcmviewer:medical-file-channel";
+const CHANNEL_OPEN_TIMEOUT_MS = 5000;
+const pendingReads = new Map<number, PendingRead>();
+let channelPort: Promise<MessagePort | undefined> | undefined;
+let channelClosed = false;
+let nextRequestId = 0;
+
+function handleChannelReply(event: MessageEvent<MedicalFileChannelReply>) {
+    const pendingRead = pendingReads.get(event.data.requestId);
+    if (!pendingRead) return;
+
+    pendingReads.delete(event.data.requestId);
+
+    if (event.data.error !== undefined) {
+        pendingRead.reject(new Error(event.data.error));
+        return;
+    }
+
+    pendingRead.resolve(event.data);
+}
+
+// A closed or broken port never replies, so every pending request settles
+// without a reply and later reads go through the invoke path instead.
+function closeChannel() {
+    channelClosed = true;
+    channelPort = Promise.resolve(undefined);
+
+    for (const pendingRead of pendingReads.values()) {
+        pendingRead.resolve(undefined);
+    }
+    pendingReads.clear();
+}
+
+function openChannelPort() {
+    const openMedicalFileChannel = window.dcmViewer?.openMedicalFileChannel;
+    if (!openMedicalFileChannel) return Promise.resolve(undefined);
+
+    return new Promise<MessagePort | undefined>((resolve) => {
+        const finish = (port?: MessagePort) => {
+            window.clearTimeout(timeout);
+            window.removeEventListener("message", handleMessage);
+            resolve(port);
+        };
+        const handleMessage = (event: MessageEvent) => {
+            if (
+                event.source !== window ||
+                event.data !== MEDICAL_FILE_CHANNEL_MESSAGE ||
+                !event.ports[0]
+            ) {
+                return;
+            }
+
+            const [port] = event.ports;
+            port.onmessage = handleChannelReply;
+            port.onmessageerror = closeChannel;
+            port.addEventListener("close", closeChannel);
+            finish(port);
+        };
+        const timeout = window.setTimeout(
+            () => finish(undefined),
+            CHANNEL_OPEN_TIMEOUT_MS,
+        );
+
+        window.addEventListener("message", handleMessage);
+        openMedicalFileChannel();
+    });
+}
+
+// Resolves without a reply when the channel closes first; callers then fall
+// back to the invoke path.
+function requestViaChannel(
+    port: MessagePort,
+    request: MedicalFileChannelRequest,
+) {
+    return new Promise<MedicalFileChannelReply | undefined>(
+        (resolve, reject) => {
+            if (channelClosed) {
+                resolve(undefined);
+                return;
+            }
+
+            const requestId = nextRequestId;
+            nextRequestId += 1;
+            pendingReads.set(requestId, { resolve, reject });
+            port.postMessage({ ...request, requestId });
+        },
+    );
+}
+
+function medicalFileFromReply(reply: MedicalFileChannelReply): MedicalFile {
+    if (!reply.path || !reply.name || !reply.bytes) {
+        throw new Error("Failed to read the file.");
+    }
+
+    return {
+        path: reply.path,
+        name: reply.name,
+        bytes: new Uint8Array(reply.bytes),
+    };
+}
+
+export async function readMedicalFileViaChannel(
+    port: MessagePort,
+    path: string,
+): Promise<MedicalFile> {
+    const reply = await requestViaChannel(port, { path });
+    if (!reply) {
+        throw new Error("The file channel closed before replying.");
+    }
+
+    return medicalFileFromReply(reply);
+}
+
+export function medicalFileChannel() {
+    channelPort ??= openChannelPort();
+    return channelPort;
+}
+
+export async function readMedicalFile(path: string): Promise<MedicalFile> {
+    if (!window.dcmViewer) {
+        throw new Error("File access is only available in the desktop app.");
+    }
+
+    const port = await medicalFileChannel();
+    const reply = port && (await requestViaChannel(port, { path }));
+    return reply
+        ? medicalFileFromReply(reply)
+        : window.dcmViewer.readMedicalFile(path);
+}
+
+export function canReadMedicalFileRange() {
+    return window.dcmViewer?.readMedicalFileRange !== undefined;
+}
+
+export async function readMedicalFileRange(
+    path: string,
+    offset: number,
+    length: number,
+): Promise<Uint8Array> {
+    const readRange = window.dcmViewer?.readMedicalFileRange;
+    if (!readRange) {
+        throw new Error("File access is only available in the desktop app.");
+    }
+
+    const port = await medicalFileChannel();
+    const reply =
+        port && (await requestViaChannel(port, { path, offset, length }));
+    if (!reply) return readRange(path, offset, length);
+
+    if (!reply.bytes) {
+        throw new Error("Failed to read the file.");
+    }
+
+    return new Uint8Array(reply.bytes);
+}
+
+export async function readCachedVolumeData(
+    cacheKey: string,
+): Promise<CachedVolumeData> {
+    const volumeCache = window.dcmViewer?.volumeCache;
+    if (!volumeCache) {
+        throw new Error(
+            "The volume cache is only available in the desktop app.",
+        );
+    }
+
+    const port = await medicalFileChannel();
+    const reply = port && (await requestViaChannel(port, { cacheKey }));
+    if (!reply) return volumeCache.read(cacheKey);
+
+    if (!reply.dataType || !reply.bytes) {
+        throw new Error("Failed to read the cached volume.");
+    }
+
+    return { dataType: reply.dataType, bytes: reply.bytes };
+}
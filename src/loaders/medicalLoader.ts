@@ -1,7 +1,31 @@
-import { buildDicomVolumes, parseDicomSlice } from "./dicom";
+import {
+    buildDicomVolumeData,
+    buildDicomVolumes,
+    parseDicomSlice,
+    readDicomMetadata,
+    type DicomSlice,
+} from "./dicom";
+import type { DicomParseRequest } from "./dicomWorker";
 import { loadNiftiVolume } from "./nifti";
+import { canStreamNifti, loadCompressedNiftiVolume } from "./niftiStream";
 import { loadNpyVolume } from "./npy";
-import type { MedicalFile, StudyNode, Volume } from "../types";
+import { runReadScheduler } from "./readScheduler";
+import { loadCachedVolume } from "./volumeCache";
+import {
+    canUseWorkers,
+    createWorkerPool,
+    transferableBuffer,
+    type WorkerPool,
+} from "./workerPool";
+import type {
+    LoadedVolume,
+    MedicalFile,
+    StudyNode,
+    Volume,
+    VolumeMetadataEntry,
+} from "../types";
+import { canCompareVolumes } from "../differenceSlices";
+import { isVolumeLoaded } from "../voxels";
 
 type LoadProgress = {
     current: number;
@@ -11,8 +35,24 @@ type LoadProgress = {
 
 type LoadMedicalFilesOptions = {
     onProgress?: (progress: LoadProgress) => void;
+    headerOnly?: boolean;
 };
 
+type ParseMedicalFileOptions = {
+    headerOnly?: boolean;
+};
+
+export type ReadSourceFile = (path: string) => Promise<MedicalFile>;
+
+const SOURCE_READ_CONCURRENCY = 8;
+const NIFTI_DECODER_POOL_SIZE = 2;
+const MAX_CACHED_METADATA_TABLES = 32;
+const metadataTables = new Map<string, VolumeMetadataEntry[]>();
+let sharedDicomParserPool:
+    | WorkerPool<DicomParseRequest, DicomSlice>
+    | undefined;
+let sharedNiftiDecoderPool: WorkerPool<MedicalFile, Volume> | undefined;
+
 function normalizeBytes(bytes: Uint8Array | ArrayBuffer | number[]) {
     if (bytes instanceof Uint8Array) return bytes;
     if (bytes instanceof ArrayBuffer) return new Uint8Array(bytes);
@@ -32,56 +72,294 @@ function waitForProgressPaint() {
     });
 }
 
+function dicomParserPool() {
+    if (!canUseWorkers()) return undefined;
+
+    sharedDicomParserPool ??= createWorkerPool<
+        DicomParseRequest,
+        DicomSlice
+    >(
+        () =>
+            new Worker(new URL("./dicomWorker.ts", import.meta.url), {
+                type: "module",
+            }),
+    );
+    return sharedDicomParserPool;
+}
+
+function niftiDecoderPool() {
+    if (!canUseWorkers()) return undefined;
+
+    sharedNiftiDecoderPool ??= createWorkerPool<MedicalFile, Volume>(
+        () =>
+            new Worker(new URL("./niftiWorker.ts", import.meta.url), {
+                type: "module",
+            }),
+        NIFTI_DECODER_POOL_SIZE,
+    );
+    return sharedNiftiDecoderPool;
+}
+
+function fileErrorMessage(name: string, error: unknown) {
+    return `${name}: ${error instanceof Error ? error.message : String(error)}`;
+}
+
+function isStandaloneVolumeName(fileName: string) {
+    const extension = extensionOf(fileName);
+    return (
+        extension === ".nii" || extension === ".nii.gz" || extension === ".npy"
+    );
+}
+
+async function parseDicomFile(file: MedicalFile, headerOnly: boolean) {
+    const pool = dicomParserPool();
+    return pool
+        ? pool.run({ file, headerOnly }, transferableBuffer(file.bytes))
+        : parseDicomSlice(file, { headerOnly });
+}
+
+async function parseCompressedNiftiFile(file: MedicalFile) {
+    const pool = niftiDecoderPool();
+    return pool
+        ? pool.run(file, transferableBuffer(file.bytes))
+        : loadCompressedNiftiVolume(file);
+}
+
+export async function parseMedicalFile(
+    file: MedicalFile,
+    options: ParseMedicalFileOptions = {},
+) {
+    const normalizedFile = { ...file, bytes: normalizeBytes(file.bytes) };
+    const extension = extensionOf(file.name || file.path);
+
+    if (extension === ".nii.gz" && canStreamNifti()) {
+        return { volumes: [await parseCompressedNiftiFile(normalizedFile)] };
+    }
+
+    if (extension === ".nii" || extension === ".nii.gz") {
+        return { volumes: [loadNiftiVolume(normalizedFile)] };
+    }
+
+    if (extension === ".npy") {
+        return { volumes: loadNpyVolume(normalizedFile) };
+    }
+
+    const dicomSlice = await parseDicomFile(
+        normalizedFile,
+        options.headerOnly ?? false,
+    );
+
+    return { volumes: [] as Volume[], dicomSlice };
+}
+
+export function createMedicalLoadSession(
+    options: ParseMedicalFileOptions = {},
+) {
+    const dicomSlices: DicomSlice[] = [];
+    const errors: string[] = [];
+
+    return {
+        add: async (file: MedicalFile) => {
+            try {
+                const parsed = await parseMedicalFile(file, options);
+                if (parsed.dicomSlice) dicomSlices.push(parsed.dicomSlice);
+                return parsed.volumes;
+            } catch (error) {
+                errors.push(fileErrorMessage(file.name, error));
+                return [];
+            }
+        },
+        fail: (name: string, error: unknown) => {
+            errors.push(fileErrorMessage(name, error));
+        },
+        finish: () => {
+            const volumes: Volume[] = [];
+
+            try {
+                volumes.push(...buildDicomVolumes(dicomSlices));
+            } catch (error) {
+                errors.push(
+                    error instanceof Error ? error.message : String(error),
+                );
+            }
+
+            return { volumes, errors };
+        },
+    };
+}
+
 export async function loadMedicalFiles(
     files: MedicalFile[],
     options: LoadMedicalFilesOptions = {},
 ) {
-    const dicomSlices = [];
+    const session = createMedicalLoadSession({
+        headerOnly: options.headerOnly,
+    });
     const volumes: Volume[] = [];
-    const errors: string[] = [];
+    const dicomJobs: Promise<void>[] = [];
     const total = files.length;
+    const parallelDicom = dicomParserPool() !== undefined;
+    let completed = 0;
 
-    for (const [index, file] of files.entries()) {
-        const normalizedFile = { ...file, bytes: normalizeBytes(file.bytes) };
-        const extension = extensionOf(file.name || file.path);
-
-        try {
-            if (extension === ".nii" || extension === ".nii.gz") {
-                volumes.push(loadNiftiVolume(normalizedFile));
-            } else if (extension === ".npy") {
-                volumes.push(...loadNpyVolume(normalizedFile));
-            } else {
-                dicomSlices.push(parseDicomSlice(normalizedFile));
-            }
-        } catch (error) {
-            errors.push(
-                `${file.name}: ${error instanceof Error ? error.message : String(error)}`,
-            );
-        }
-
+    const addFile = async (file: MedicalFile) => {
+        volumes.push(...(await session.add(file)));
+        completed += 1;
         options.onProgress?.({
-            current: index + 1,
+            current: completed,
             total,
-            message: `Processing ${index + 1} of ${total}`,
+            message: `Processing ${completed} of ${total}`,
         });
+    };
+
+    for (const [index, file] of files.entries()) {
+        if (parallelDicom && !isStandaloneVolumeName(file.name || file.path)) {
+            dicomJobs.push(addFile(file));
+            continue;
+        }
+
+        await addFile(file);
 
         if ((index + 1) % 8 === 0 || index + 1 === total) {
             await waitForProgressPaint();
         }
     }
 
-    try {
-        options.onProgress?.({
-            current: total,
-            total,
-            message: "Building volumes...",
-        });
-        volumes.push(...buildDicomVolumes(dicomSlices));
-    } catch (error) {
-        errors.push(error instanceof Error ? error.message : String(error));
+    await Promise.all(dicomJobs);
+
+    options.onProgress?.({
+        current: total,
+        total,
+        message: "Building volumes...",
+    });
+    const built = session.finish();
+
+    return { volumes: [...volumes, ...built.volumes], errors: built.errors };
+}
+
+async function loadDicomVolumeData(
+    volume: Volume,
+    sourceFiles: NonNullable<Volume["sourceFiles"]>,
+    readSourceFile: ReadSourceFile,
+    options: LoadMedicalFilesOptions,
+) {
+    const slices = new Array<DicomSlice>(sourceFiles.length);
+    const total = sourceFiles.length;
+    let completed = 0;
+    let firstError: unknown;
+
+    await runReadScheduler(
+        sourceFiles.map((sourceFile, index) => ({ ...sourceFile, index })),
+        {
+            concurrency: SOURCE_READ_CONCURRENCY,
+            read: (sourceFile) => readSourceFile(sourceFile.path),
+            consume: async (sourceFile, file) => {
+                slices[sourceFile.index] = await parseDicomFile(
+                    { ...file, bytes: normalizeBytes(file.bytes) },
+                    false,
+                );
+                completed += 1;
+                options.onProgress?.({
+                    current: completed,
+                    total,
+                    message: `Loading ${volume.name}`,
+                });
+            },
+            onError: (sourceFile, error) => {
+                firstError ??= new Error(
+                    fileErrorMessage(sourceFile.name, error),
+                );
+            },
+        },
+    );
+
+    if (firstError !== undefined) {
+        throw firstError;
+    }
+
+    return buildDicomVolumeData(volume, slices);
+}
+
+// Resolves to the volume first, followed by any channels that came out of
+// the same parse: a 4D NPY's channels are views over one tensor buffer, so
+// they load, and are later evicted, as a group.
+export async function loadVolumeData(
+    volume: Volume,
+    readSourceFile: ReadSourceFile,
+    options: LoadMedicalFilesOptions = {},
+): Promise<LoadedVolume[]> {
+    if (isVolumeLoaded(volume)) return [volume];
+
+    if (volume.cacheKey) {
+        try {
+            return [await loadCachedVolume(volume, volume.cacheKey)];
+        } catch {
+            volume = { ...volume, cacheKey: undefined };
+        }
+    }
+
+    if (volume.sourceFiles) {
+        return [
+            await loadDicomVolumeData(
+                volume,
+                volume.sourceFiles,
+                readSourceFile,
+                options,
+            ),
+        ];
+    }
+
+    if (!volume.sourcePath) {
+        throw new Error(`${volume.name} has no source file to load.`);
     }
 
-    return { volumes, errors };
+    options.onProgress?.({
+        current: 0,
+        total: 1,
+        message: `Loading ${volume.name}`,
+    });
+    const { volumes } = await parseMedicalFile(
+        await readSourceFile(volume.sourcePath),
+    );
+    const loaded = volumes.find((item) => item.id === volume.id);
+
+    if (!loaded || !isVolumeLoaded(loaded)) {
+        throw new Error(`${volume.name} was not found in its source file.`);
+    }
+
+    const siblings =
+        loaded.channelIndex === undefined
+            ? []
+            : volumes.filter(
+                  (item): item is LoadedVolume =>
+                      item !== loaded &&
+                      item.channelIndex !== undefined &&
+                      isVolumeLoaded(item) &&
+                      item.data.buffer === loaded.data.buffer,
+              );
+
+    return [loaded, ...siblings];
+}
+
+export async function loadSliceMetadata(
+    sourcePath: string,
+    readSourceFile: ReadSourceFile,
+) {
+    const cached = metadataTables.get(sourcePath);
+    if (cached) {
+        metadataTables.delete(sourcePath);
+        metadataTables.set(sourcePath, cached);
+        return cached;
+    }
+
+    const metadata = readDicomMetadata(await readSourceFile(sourcePath));
+    metadataTables.set(sourcePath, metadata);
+
+    if (metadataTables.size > MAX_CACHED_METADATA_TABLES) {
+        const oldestPath = metadataTables.keys().next().value;
+        if (oldestPath !== undefined) metadataTables.delete(oldestPath);
+    }
+
+    return metadata;
 }
 
 export function buildStudyTree(volumes: Volume[]): StudyNode[] {
@@ -138,36 +416,13 @@ export function buildStudyTree(volumes: Volume[]): StudyNode[] {
 }
 
 export function createDifferenceVolume(
-    first: Volume,
-    second: Volume,
+    first: LoadedVolume,
+    second: LoadedVolume,
 ): Volume | undefined {
-    const [width, height, depth] = first.dimensions;
-    const samePlane =
-        width === second.dimensions[0] && height === second.dimensions[1];
-
-    if (!samePlane) {
+    if (!canCompareVolumes(first, second)) {
         return undefined;
     }
 
-    const data = new Float32Array(first.data.length);
-    let maxAbs = 1;
-    const firstMaxSlice = Math.max(depth - 1, 0);
-    const secondMaxSlice = Math.max(second.dimensions[2] - 1, 0);
-    const planeSize = width * height;
-
-    for (let z = 0; z < depth; z += 1) {
-        const sliceRatio = firstMaxSlice > 0 ? z / firstMaxSlice : 0;
-        const secondZ = Math.round(sliceRatio * secondMaxSlice);
-
-        for (let index = 0; index < planeSize; index += 1) {
-            const firstIndex = z * planeSize + index;
-            const secondIndex = secondZ * planeSize + index;
-            const value = second.data[secondIndex] - first.data[firstIndex];
-            data[firstIndex] = value;
-            maxAbs = Math.max(maxAbs, Math.abs(value));
-        }
-    }
-
     return {
         id: `diff:${first.id}:${second.id}`,
         name: `${second.name} - ${first.name}`,
@@ -176,12 +431,14 @@ export function createDifferenceVolume(
         studyId: "Difference",
         seriesId: "Difference",
         dimensions: first.dimensions,
-        data,
+        rescaleSlope: 1,
+        rescaleIntercept: 0,
         windowCenter: 0,
-        windowWidth: maxAbs * 2,
-        min: -maxAbs,
-        max: maxAbs,
+        windowWidth: 2,
+        min: -1,
+        max: 1,
         renderMode: "difference",
+        differenceSources: [first.id, second.id],
         sourceParentDir: "Difference",
     };
 }
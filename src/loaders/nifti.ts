@@ -1,5 +1,17 @@
 import * as nifti from "nifti-reader-js";
-import type { Volume } from "../types";
+import type {
+    RawVoxelType,
+    Volume,
+    VolumeVoxelLayout,
+    VoxelData,
+} from "../types";
+import {
+    decodeRawVoxels,
+    getVoxelRange,
+    rescaleVoxelRange,
+    toSharedVoxelData,
+    type VoxelRange,
+} from "../voxels";
 
 function toArrayBuffer(bytes: Uint8Array) {
     return bytes.buffer.slice(
@@ -8,47 +20,61 @@ function toArrayBuffer(bytes: Uint8Array) {
     );
 }
 
-function getTypedArray(
-    header: nifti.NIFTI1 | nifti.NIFTI2,
-    imageBuffer: ArrayBuffer,
-) {
-    switch (header.datatypeCode) {
+export function niftiVoxelType(datatypeCode: number): RawVoxelType {
+    switch (datatypeCode) {
         case nifti.NIFTI1.TYPE_UINT8:
-            return new Uint8Array(imageBuffer);
+            return "uint8";
         case nifti.NIFTI1.TYPE_INT16:
-            return new Int16Array(imageBuffer);
+            return "int16";
         case nifti.NIFTI1.TYPE_INT32:
-            return new Int32Array(imageBuffer);
+            return "int32";
         case nifti.NIFTI1.TYPE_FLOAT32:
-            return new Float32Array(imageBuffer);
+            return "float32";
         case nifti.NIFTI1.TYPE_FLOAT64:
-            return new Float64Array(imageBuffer);
+            return "float64";
         case nifti.NIFTI1.TYPE_INT8:
-            return new Int8Array(imageBuffer);
+            return "int8";
         case nifti.NIFTI1.TYPE_UINT16:
-            return new Uint16Array(imageBuffer);
+            return "uint16";
         case nifti.NIFTI1.TYPE_UINT32:
-            return new Uint32Array(imageBuffer);
+            return "uint32";
         default:
-            throw new Error(
-                `NIfTI datatype ${header.datatypeCode} is not supported.`,
-            );
+            throw new Error(`NIfTI datatype ${datatypeCode} is not supported.`);
     }
 }
 
-function toFloat32(data: ArrayLike<number>, slope: number, intercept: number) {
-    const output = new Float32Array(data.length);
-    let min = Number.POSITIVE_INFINITY;
-    let max = Number.NEGATIVE_INFINITY;
+export function niftiVoxelLayout(
+    header: nifti.NIFTI1 | nifti.NIFTI2,
+): VolumeVoxelLayout {
+    return {
+        dataType: niftiVoxelType(header.datatypeCode),
+        byteOffset: header.vox_offset,
+        littleEndian: header.littleEndian,
+    };
+}
+
+export function niftiVoxelCount(header: nifti.NIFTI1 | nifti.NIFTI2) {
+    return header.dims[1] * header.dims[2] * Math.max(header.dims[3], 1);
+}
 
-    for (let index = 0; index < data.length; index += 1) {
-        const value = data[index] * slope + intercept;
-        output[index] = value;
-        if (value < min) min = value;
-        if (value > max) max = value;
+// nifti-reader-js resolves the sform/qform into `affine`; files with neither
+// fall back to a diagonal transform built from the voxel sizes in pixdim.
+// NIfTI patient space is RAS while DICOM's is LPS, so the x and y rows are
+// negated to store every affine in the DICOM convention.
+export function niftiAffine(header: nifti.NIFTI1 | nifti.NIFTI2) {
+    const rows = header.affine.slice(0, 3).map((row) => row.slice(0, 4));
+    const [[a, b, c], [d, e, f], [g, h, i]] = rows;
+    const determinant =
+        a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g);
+
+    if (rows.flat().every(Number.isFinite) && Math.abs(determinant) > 1e-9) {
+        return rows.flatMap((row, axis) =>
+            axis < 2 ? row.map((value) => -value) : row,
+        );
     }
 
-    return { data: output, min, max };
+    const [, x = 1, y = 1, z = 1] = header.pixDims;
+    return [-(x || 1), 0, 0, 0, 0, -(y || 1), 0, 0, 0, 0, z || 1, 0];
 }
 
 function parentFolderName(path: string) {
@@ -72,11 +98,31 @@ export function loadNiftiVolume(file: {
     }
 
     const header = nifti.readHeader(buffer);
-    const image = nifti.readImage(header, buffer);
-    const typed = getTypedArray(header, image);
-    const slope = header.scl_slope || 1;
-    const intercept = header.scl_inter || 0;
-    const { data, min, max } = toFloat32(typed, slope, intercept);
+    const layout = niftiVoxelLayout(header);
+    const data = toSharedVoxelData(
+        decodeRawVoxels(
+            new Uint8Array(buffer, layout.byteOffset),
+            layout.dataType,
+            layout.littleEndian,
+            niftiVoxelCount(header),
+        ),
+    );
+    return buildNiftiVolume(file, header, getVoxelRange(data), data);
+}
+
+export function buildNiftiVolume(
+    file: { path: string; name: string },
+    header: nifti.NIFTI1 | nifti.NIFTI2,
+    storedRange: VoxelRange,
+    data?: VoxelData,
+): Volume {
+    const rescaleSlope = header.scl_slope || 1;
+    const rescaleIntercept = header.scl_inter || 0;
+    const { min, max } = rescaleVoxelRange(
+        storedRange,
+        rescaleSlope,
+        rescaleIntercept,
+    );
     const width = Math.max(max - min, 1);
 
     return {
@@ -91,7 +137,10 @@ export function loadNiftiVolume(file: {
             header.dims[2],
             Math.max(header.dims[3], 1),
         ],
+        affine: niftiAffine(header),
         data,
+        rescaleSlope,
+        rescaleIntercept,
         windowCenter: (min + max) / 2,
         windowWidth: width,
         min,
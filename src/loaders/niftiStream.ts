@@ -0,0 +1,208 @@
+import * as nifti from "nifti-reader-js";
+import { buildNiftiVolume, niftiVoxelCount, niftiVoxelType } from "./nifti";
+import type { MedicalFile, Volume, VoxelData } from "../types";
+import {
+    allocateVoxelData,
+    getVoxelRange,
+    littleEndianHost,
+    swapByteOrder,
+    voxelArrayType,
+} from "../voxels";
+
+type VoxelWriter = {
+    write: (chunk: Uint8Array) => void;
+    full: () => boolean;
+    finish: () => VoxelData;
+};
+
+const NIFTI1_HEADER_SIZE = 348;
+const NIFTI2_HEADER_SIZE = 540;
+const HEADER_PREFIX_SIZE = NIFTI2_HEADER_SIZE + 4;
+
+export function canStreamNifti() {
+    return typeof DecompressionStream !== "undefined";
+}
+
+async function* gunzipChunks(bytes: Uint8Array) {
+    const reader = new ReadableStream<Uint8Array>({
+        start(controller) {
+            controller.enqueue(bytes);
+            controller.close();
+        },
+    })
+        .pipeThrough(new DecompressionStream("gzip"))
+        .getReader();
+
+    // Stopping early, once the first volume is written, cancels the rest of
+    // the decompression instead of inflating frames that are never used.
+    try {
+        for (;;) {
+            const { done, value } = await reader.read();
+            if (done) return;
+            yield value;
+        }
+    } finally {
+        void reader.cancel().catch(() => undefined);
+    }
+}
+
+function appendBytes(current: Uint8Array, next: Uint8Array) {
+    const output = new Uint8Array(current.byteLength + next.byteLength);
+    output.set(current);
+    output.set(next, current.byteLength);
+    return output;
+}
+
+function voxelOffset(prefix: Uint8Array) {
+    const view = new DataView(
+        prefix.buffer,
+        prefix.byteOffset,
+        prefix.byteLength,
+    );
+    const littleEndian =
+        view.getInt32(0, true) === NIFTI1_HEADER_SIZE ||
+        view.getInt32(0, true) === NIFTI2_HEADER_SIZE;
+    const headerSize = view.getInt32(0, littleEndian);
+
+    if (headerSize === NIFTI1_HEADER_SIZE) {
+        return view.getFloat32(108, littleEndian);
+    }
+
+    if (headerSize === NIFTI2_HEADER_SIZE) {
+        return Number(view.getBigInt64(168, littleEndian));
+    }
+
+    throw new Error("Invalid NIfTI file.");
+}
+
+function createFloat64Writer(
+    voxelCount: number,
+    littleEndian: boolean,
+): VoxelWriter {
+    const output = allocateVoxelData(Float32Array, voxelCount);
+    const carry = new Uint8Array(Float64Array.BYTES_PER_ELEMENT);
+    const carryView = new DataView(carry.buffer);
+    let carried = 0;
+    let index = 0;
+
+    return {
+        write: (chunk) => {
+            const view = new DataView(
+                chunk.buffer,
+                chunk.byteOffset,
+                chunk.byteLength,
+            );
+            let position = 0;
+
+            if (carried > 0) {
+                position = Math.min(carry.byteLength - carried, chunk.length);
+                carry.set(chunk.subarray(0, position), carried);
+                carried += position;
+
+                if (carried < carry.byteLength) return;
+                output[index] = carryView.getFloat64(0, littleEndian);
+                index += 1;
+                carried = 0;
+            }
+
+            while (position + 8 <= chunk.byteLength && index < voxelCount) {
+                output[index] = view.getFloat64(position, littleEndian);
+                index += 1;
+                position += 8;
+            }
+
+            if (position < chunk.byteLength && index < voxelCount) {
+                carry.set(chunk.subarray(position));
+                carried = chunk.byteLength - position;
+            }
+        },
+        full: () => index >= voxelCount,
+        finish: () => {
+            if (index < voxelCount) {
+                throw new Error("NIfTI image data is truncated.");
+            }
+            return output;
+        },
+    };
+}
+
+// Only the first 3D volume is kept, matching the uncompressed loader; any
+// further frames of a 4D file are never written.
+function createVoxelWriter(header: nifti.NIFTI1 | nifti.NIFTI2): VoxelWriter {
+    const voxelCount = niftiVoxelCount(header);
+    const dataType = niftiVoxelType(header.datatypeCode);
+
+    if (dataType === "float64") {
+        return createFloat64Writer(voxelCount, header.littleEndian);
+    }
+
+    const ArrayType = voxelArrayType(dataType);
+    const output = allocateVoxelData(ArrayType, voxelCount);
+    const bytes = new Uint8Array(output.buffer);
+    let offset = 0;
+
+    return {
+        write: (chunk) => {
+            const length = Math.min(
+                chunk.byteLength,
+                bytes.byteLength - offset,
+            );
+            bytes.set(chunk.subarray(0, length), offset);
+            offset += length;
+        },
+        full: () => offset >= bytes.byteLength,
+        finish: () => {
+            if (offset < bytes.byteLength) {
+                throw new Error("NIfTI image data is truncated.");
+            }
+
+            if (
+                header.littleEndian !== littleEndianHost &&
+                ArrayType.BYTES_PER_ELEMENT > 1
+            ) {
+                swapByteOrder(bytes, ArrayType.BYTES_PER_ELEMENT);
+            }
+
+            return output;
+        },
+    };
+}
+
+export async function loadCompressedNiftiVolume(
+    file: MedicalFile,
+): Promise<Volume> {
+    const chunks = gunzipChunks(file.bytes);
+    let buffered = new Uint8Array(0);
+
+    const readChunk = async () => {
+        const next = await chunks.next();
+        if (next.done) return false;
+        buffered = appendBytes(buffered, next.value);
+        return true;
+    };
+
+    while (buffered.byteLength < HEADER_PREFIX_SIZE && (await readChunk()));
+
+    const dataOffset = voxelOffset(buffered);
+    while (buffered.byteLength < dataOffset && (await readChunk()));
+
+    const headerBuffer = buffered.buffer.slice(0, dataOffset);
+    if (!nifti.isNIFTI(headerBuffer)) {
+        throw new Error("Invalid NIfTI file.");
+    }
+
+    const header = nifti.readHeader(headerBuffer);
+    const writer = createVoxelWriter(header);
+    writer.write(buffered.subarray(dataOffset));
+    buffered = new Uint8Array(0);
+
+    if (writer.full()) await chunks.return();
+
+    for await (const chunk of chunks) {
+        writer.write(chunk);
+        if (writer.full()) break;
+    }
+
+    const data = writer.finish();
+    return buildNiftiVolume(file, header, getVoxelRange(data), data);
+}
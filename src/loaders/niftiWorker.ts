@@ -0,0 +1,11 @@
+import { loadCompressedNiftiVolume } from "./niftiStream";
+import { handleWorkerPoolRequests, transferableBuffer } from "./workerPool";
+import type { MedicalFile, Volume } from "../types";
+
+handleWorkerPoolRequests<MedicalFile, Volume>(async (file) => {
+    const volume = await loadCompressedNiftiVolume(file);
+    return {
+        result: volume,
+        transfer: volume.data ? transferableBuffer(volume.data) : [],
+    };
+});
@@ -1,6 +1,18 @@
-import type { Volume } from "../types";
-
-type NpyHeader = {
+import type {
+    RawVoxelType,
+    Volume,
+    VolumeVoxelLayout,
+    VoxelData,
+} from "../types";
+import {
+    decodeRawVoxels,
+    getVoxelRange,
+    littleEndianHost,
+    toSharedVoxelData,
+    type VoxelRange,
+} from "../voxels";
+
+export type NpyHeader = {
     descriptor: string;
     fortranOrder: boolean;
     shape: number[];
@@ -9,7 +21,7 @@ type NpyHeader = {
 
 const textDecoder = new TextDecoder("latin1");
 
-function parseHeader(bytes: Uint8Array): NpyHeader {
+export function parseNpyHeader(bytes: Uint8Array): NpyHeader {
     if (
         bytes[0] !== 0x93 ||
         bytes[1] !== 0x4e ||
@@ -65,73 +77,59 @@ function parseHeader(bytes: Uint8Array): NpyHeader {
     };
 }
 
-function readNumericData(bytes: Uint8Array, header: NpyHeader): Float32Array {
+const npyVoxelTypes: Record<string, RawVoxelType> = {
+    u1: "uint8",
+    i1: "int8",
+    u2: "uint16",
+    i2: "int16",
+    u4: "uint32",
+    i4: "int32",
+    f4: "float32",
+    f8: "float64",
+};
+
+export function npyVoxelLayout(header: NpyHeader): VolumeVoxelLayout {
     if (header.fortranOrder) {
         throw new Error("Fortran-order NPY files are not supported yet.");
     }
 
-    const buffer = bytes.buffer.slice(
-        bytes.byteOffset + header.dataOffset,
-        bytes.byteOffset + bytes.byteLength,
-    );
-    const littleEndian =
-        header.descriptor.startsWith("<") || header.descriptor.startsWith("|");
-    const type = header.descriptor.replace(/[<>=|]/, "");
-    const view = new DataView(buffer);
-    const elementCount = header.shape.reduce(
-        (total, value) => total * value,
-        1,
-    );
-    const output = new Float32Array(elementCount);
-
-    for (let index = 0; index < elementCount; index += 1) {
-        const offset = index * Number(type.slice(1));
-
-        switch (type) {
-            case "u1":
-                output[index] = view.getUint8(offset);
-                break;
-            case "i1":
-                output[index] = view.getInt8(offset);
-                break;
-            case "u2":
-                output[index] = view.getUint16(offset, littleEndian);
-                break;
-            case "i2":
-                output[index] = view.getInt16(offset, littleEndian);
-                break;
-            case "u4":
-                output[index] = view.getUint32(offset, littleEndian);
-                break;
-            case "i4":
-                output[index] = view.getInt32(offset, littleEndian);
-                break;
-            case "f4":
-                output[index] = view.getFloat32(offset, littleEndian);
-                break;
-            case "f8":
-                output[index] = view.getFloat64(offset, littleEndian);
-                break;
-            default:
-                throw new Error(
-                    `${header.descriptor} NPY data type is not supported.`,
-                );
-        }
+    const dataType = npyVoxelTypes[header.descriptor.replace(/[<>=|]/, "")];
+
+    if (!dataType) {
+        throw new Error(`${header.descriptor} NPY data type is not supported.`);
     }
 
-    return output;
+    return {
+        dataType,
+        byteOffset: header.dataOffset,
+        littleEndian:
+            header.descriptor.startsWith("<") ||
+            (!header.descriptor.startsWith(">") && littleEndianHost),
+    };
 }
 
-function getMinMax(data: Float32Array) {
-    let min = Number.POSITIVE_INFINITY;
-    let max = Number.NEGATIVE_INFINITY;
+export function npyChannelCount(header: NpyHeader) {
+    return header.shape.length === 4 ? header.shape[0] : 1;
+}
 
-    for (const value of data) {
-        if (value < min) min = value;
-        if (value > max) max = value;
-    }
+function readNumericData(bytes: Uint8Array, header: NpyHeader): VoxelData {
+    const layout = npyVoxelLayout(header);
+    const elementCount = header.shape.reduce(
+        (total, value) => total * value,
+        1,
+    );
 
-    return { min, max };
+    // NumPy pads the header so the payload starts on a 64-byte boundary, so
+    // native-order data is viewed in place without an intermediate copy and
+    // moved once into shared memory; 4D channels are views over that copy.
+    return toSharedVoxelData(
+        decodeRawVoxels(
+            bytes.subarray(layout.byteOffset),
+            layout.dataType,
+            layout.littleEndian,
+            elementCount,
+        ),
+    );
 }
 
 function parentFolderName(path: string) {
@@ -139,63 +137,31 @@ function parentFolderName(path: string) {
     return parts.length > 1 ? parts[parts.length - 2] : "Imported Files";
 }
 
-export function loadNpyVolume(file: {
-    path: string;
-    name: string;
-    bytes: Uint8Array;
-}): Volume[] {
-    const header = parseHeader(file.bytes);
-    const data = readNumericData(file.bytes, header);
-    const parentDir = parentFolderName(file.path);
-
+export function npyDimensions(header: NpyHeader): [number, number, number] {
     if (header.shape.length === 4) {
-        const [channelCount, depth, height, width] = header.shape;
-        const channelVoxelCount = depth * height * width;
-
-        return Array.from({ length: channelCount }, (_, channelIndex) => {
-            const channelOffset = channelIndex * channelVoxelCount;
-            const channelData = data.slice(
-                channelOffset,
-                channelOffset + channelVoxelCount,
-            );
-            const { min, max } = getMinMax(channelData);
-            const center = (min + max) / 2;
-            const windowWidth = Math.max(max - min, 1);
-            const channelLabel = `Channel ${channelIndex + 1}`;
-
-            return {
-                id: `npy:${file.path}:ch${channelIndex}`,
-                name: `${file.name} [${channelLabel}]`,
-                format: "NPY",
-                patientId: parentDir,
-                studyId: file.name,
-                seriesId: `${file.path}:ch${channelIndex}`,
-                dimensions: [width, height, depth],
-                data: channelData,
-                windowCenter: center,
-                windowWidth,
-                min,
-                max,
-                sourcePath: file.path,
-                sourceFileName: file.name,
-                sourceParentDir: parentDir,
-                channelIndex,
-                channelLabel,
-            };
-        });
+        const [, depth, height, width] = header.shape;
+        return [width, height, depth];
     }
 
     const [depthOrHeight, heightOrWidth, maybeWidth] = header.shape;
-    const dimensions: [number, number, number] =
-        header.shape.length === 3
-            ? [maybeWidth, heightOrWidth, depthOrHeight]
-            : [heightOrWidth, depthOrHeight, 1];
-    const { min, max } = getMinMax(data);
-    const center = (min + max) / 2;
-    const width = Math.max(max - min, 1);
-
-    return [
-        {
+    return header.shape.length === 3
+        ? [maybeWidth, heightOrWidth, depthOrHeight]
+        : [heightOrWidth, depthOrHeight, 1];
+}
+
+export function buildNpyVolumes(
+    file: { path: string; name: string },
+    header: NpyHeader,
+    channelRanges: VoxelRange[],
+    data?: VoxelData,
+): Volume[] {
+    const parentDir = parentFolderName(file.path);
+    const dimensions = npyDimensions(header);
+    const channelVoxelCount = dimensions[0] * dimensions[1] * dimensions[2];
+
+    return channelRanges.map(({ min, max }, channelIndex) => {
+        const channelOffset = channelIndex * channelVoxelCount;
+        const volume: Volume = {
             id: `npy:${file.path}`,
             name: file.name,
             format: "NPY",
@@ -203,14 +169,55 @@ export function loadNpyVolume(file: {
             studyId: file.name,
             seriesId: file.path,
             dimensions,
-            data,
-            windowCenter: center,
-            windowWidth: width,
+            data: data?.subarray(
+                channelOffset,
+                channelOffset + channelVoxelCount,
+            ),
+            rescaleSlope: 1,
+            rescaleIntercept: 0,
+            windowCenter: (min + max) / 2,
+            windowWidth: Math.max(max - min, 1),
             min,
             max,
             sourcePath: file.path,
             sourceFileName: file.name,
             sourceParentDir: parentDir,
-        },
-    ];
+        };
+
+        if (header.shape.length !== 4) return volume;
+
+        const channelLabel = `Channel ${channelIndex + 1}`;
+        return {
+            ...volume,
+            id: `npy:${file.path}:ch${channelIndex}`,
+            name: `${file.name} [${channelLabel}]`,
+            seriesId: `${file.path}:ch${channelIndex}`,
+            channelIndex,
+            channelCount: channelRanges.length,
+            channelLabel,
+        };
+    });
+}
+
+export function loadNpyVolume(file: {
+    path: string;
+    name: string;
+    bytes: Uint8Array;
+}): Volume[] {
+    const header = parseNpyHeader(file.bytes);
+    const data = readNumericData(file.bytes, header);
+    const channelCount = npyChannelCount(header);
+    const channelVoxelCount = data.length / channelCount;
+    const channelRanges = Array.from(
+        { length: channelCount },
+        (_, channelIndex) =>
+            getVoxelRange(
+                data.subarray(
+                    channelIndex * channelVoxelCount,
+                    (channelIndex + 1) * channelVoxelCount,
+                ),
+            ),
+    );
+
+    return buildNpyVolumes(file, header, channelRanges, data);
 }
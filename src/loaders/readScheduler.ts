@@ -0,0 +1,97 @@
+export type ReadSchedulerOptions<Item, Result> = {
+    concurrency: number;
+    maxBytesInFlight?: number;
+    sizeOf?: (item: Item) => number;
+    read: (item: Item) => Promise<Result>;
+    consume: (item: Item, result: Result) => Promise<void> | void;
+    onError?: (item: Item, error: unknown) => void;
+};
+
+export function runReadScheduler<Item, Result>(
+    items: Item[],
+    {
+        concurrency,
+        maxBytesInFlight = Number.POSITIVE_INFINITY,
+        sizeOf = () => 0,
+        read,
+        consume,
+        onError,
+    }: ReadSchedulerOptions<Item, Result>,
+) {
+    const maxActive = Math.max(Math.floor(concurrency), 1);
+
+    return new Promise<void>((resolve) => {
+        let nextIndex = 0;
+        let active = 0;
+        let bytesInFlight = 0;
+        let settled = 0;
+
+        const startNext = () => {
+            while (nextIndex < items.length && active < maxActive) {
+                const item = items[nextIndex];
+                const size = Math.max(sizeOf(item), 0);
+
+                if (active > 0 && bytesInFlight + size > maxBytesInFlight) {
+                    return;
+                }
+
+                nextIndex += 1;
+                active += 1;
+                bytesInFlight += size;
+
+                Promise.resolve()
+                    .then(() => read(item))
+                    .then((result) => consume(item, result))
+                    .catch((error: unknown) => onError?.(item, error))
+                    .finally(() => {
+                        active -= 1;
+                        bytesInFlight -= size;
+                        settled += 1;
+
+                        if (settled === items.length) {
+                            resolve();
+                            return;
+                        }
+
+                        startNext();
+                    });
+            }
+        };
+
+        if (items.length === 0) {
+            resolve();
+            return;
+        }
+
+        startNext();
+    });
+}
+
+export async function mapConcurrent<Item, Result>(
+    items: Item[],
+    concurrency: number,
+    map: (item: Item) => Promise<Result>,
+) {
+    const results = new Array<Result>(items.length);
+    let firstError: unknown;
+
+    await runReadScheduler(
+        items.map((item, index) => ({ item, index })),
+        {
+            concurrency,
+            read: ({ item }) => map(item),
+            consume: ({ index }, result) => {
+                results[index] = result;
+            },
+            onError: (_entry, error) => {
+                firstError ??= error;
+            },
+        },
+    );
+
+    if (firstError !== undefined) {
+        throw firstError;
+    }
+
+    return results;
+}
@@ -0,0 +1,57 @@
+import { readCachedVolumeData } from "./medicalFileChannel";
+import type { LoadedVolume, Volume } from "../types";
+import {
+    toSharedVoxelData,
+    voxelDataFromBytes,
+    voxelDataType,
+} from "../voxels";
+
+export function isVolumeCacheAvailable() {
+    return window.dcmViewer?.volumeCache !== undefined;
+}
+
+export async function lookupCachedVolumes(paths: string[]) {
+    const volumeCache = window.dcmViewer?.volumeCache;
+    return volumeCache && paths.length > 0
+        ? volumeCache.lookup(paths)
+        : ([] as Volume[]);
+}
+
+export async function loadCachedVolume(
+    volume: Volume,
+    cacheKey: string,
+): Promise<LoadedVolume> {
+    const { dataType, bytes } = await readCachedVolumeData(cacheKey);
+    return {
+        ...volume,
+        data: toSharedVoxelData(voxelDataFromBytes(dataType, bytes)),
+    };
+}
+
+export async function storeCachedVolume(volume: LoadedVolume) {
+    const volumeCache = window.dcmViewer?.volumeCache;
+    if (!volumeCache || volume.cacheKey || volume.renderMode === "difference") {
+        return undefined;
+    }
+
+    const { data, ...header } = volume;
+    delete header.slicePlanes;
+    delete header.pyramid;
+    const bytes = new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+    const ownsBuffer =
+        data.buffer instanceof ArrayBuffer &&
+        bytes.byteLength === data.buffer.byteLength;
+
+    return volumeCache.store(header, {
+        dataType: voxelDataType(data),
+        bytes: ownsBuffer ? bytes : bytes.slice(),
+    });
+}
+
+export async function volumeCacheUsage() {
+    return window.dcmViewer?.volumeCache?.usage();
+}
+
+export async function clearVolumeCache() {
+    return window.dcmViewer?.volumeCache?.clear();
+}
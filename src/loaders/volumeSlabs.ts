@@ -0,0 +1,276 @@
+import * as nifti from "nifti-reader-js";
+import {
+    canReadMedicalFileRange,
+    readMedicalFileRange,
+} from "./medicalFileChannel";
+import { buildNiftiVolume, niftiVoxelCount, niftiVoxelLayout } from "./nifti";
+import {
+    buildNpyVolumes,
+    npyChannelCount,
+    npyDimensions,
+    npyVoxelLayout,
+    parseNpyHeader,
+} from "./npy";
+import type {
+    LoadedVolume,
+    MedicalFileReference,
+    Volume,
+    VolumeVoxelLayout,
+} from "../types";
+import {
+    decodeRawVoxels,
+    getVoxelRange,
+    rawVoxelBytes,
+    toSharedVoxelData,
+} from "../voxels";
+
+type RangedVolumeProgress = {
+    current: number;
+    total: number;
+    message: string;
+};
+
+type CachedSlab = {
+    slab: VolumeSlab;
+    bytes: number;
+};
+
+export type VolumeSlab = {
+    volumeId: string;
+    firstSlice: number;
+    volume: LoadedVolume;
+};
+
+const RANGED_VOLUME_MIN_BYTES = 512 * 1024 * 1024;
+const HEADER_PROBE_BYTES = 64 * 1024;
+const RANGE_SCAN_BYTES = 64 * 1024 * 1024;
+const SLAB_TARGET_BYTES = 16 * 1024 * 1024;
+const MAX_CACHED_SLAB_BYTES = 256 * 1024 * 1024;
+const cachedSlabs = new Map<string, CachedSlab>();
+const pendingSlabs = new Map<string, Promise<VolumeSlab>>();
+let cachedSlabBytes = 0;
+
+export function isRangedVolumeReference(reference: MedicalFileReference) {
+    const lowerName = reference.name.toLowerCase();
+    return (
+        canReadMedicalFileRange() &&
+        reference.size >= RANGED_VOLUME_MIN_BYTES &&
+        (lowerName.endsWith(".nii") || lowerName.endsWith(".npy"))
+    );
+}
+
+export function isRangedVolume(volume: Volume) {
+    return volume.voxelLayout !== undefined && volume.sourcePath !== undefined;
+}
+
+async function scanStoredRange(
+    reference: MedicalFileReference,
+    layout: VolumeVoxelLayout,
+    voxelCount: number,
+    onProgress?: (progress: RangedVolumeProgress) => void,
+) {
+    const bytesPerValue = rawVoxelBytes(layout.dataType);
+    const chunkVoxels = Math.floor(RANGE_SCAN_BYTES / bytesPerValue);
+    let min = Number.POSITIVE_INFINITY;
+    let max = Number.NEGATIVE_INFINITY;
+
+    for (let start = 0; start < voxelCount; start += chunkVoxels) {
+        const count = Math.min(chunkVoxels, voxelCount - start);
+        const bytes = await readMedicalFileRange(
+            reference.path,
+            layout.byteOffset + start * bytesPerValue,
+            count * bytesPerValue,
+        );
+        const range = getVoxelRange(
+            decodeRawVoxels(
+                bytes,
+                layout.dataType,
+                layout.littleEndian,
+                count,
+            ),
+        );
+        min = Math.min(min, range.min);
+        max = Math.max(max, range.max);
+        onProgress?.({
+            current: start + count,
+            total: voxelCount,
+            message: `Scanning ${reference.name}`,
+        });
+    }
+
+    return { min, max };
+}
+
+async function loadRangedNifti(
+    reference: MedicalFileReference,
+    probe: Uint8Array,
+    onProgress?: (progress: RangedVolumeProgress) => void,
+) {
+    const buffer = probe.slice().buffer;
+    if (!nifti.isNIFTI(buffer)) {
+        throw new Error("Invalid NIfTI file.");
+    }
+
+    const header = nifti.readHeader(buffer);
+    const layout = niftiVoxelLayout(header);
+    const range = await scanStoredRange(
+        reference,
+        layout,
+        niftiVoxelCount(header),
+        onProgress,
+    );
+
+    return [
+        {
+            ...buildNiftiVolume(reference, header, range),
+            voxelLayout: layout,
+        },
+    ];
+}
+
+async function loadRangedNpy(
+    reference: MedicalFileReference,
+    probe: Uint8Array,
+    onProgress?: (progress: RangedVolumeProgress) => void,
+) {
+    const header = parseNpyHeader(probe);
+    const layout = npyVoxelLayout(header);
+    const [width, height, depth] = npyDimensions(header);
+    const channelVoxelCount = width * height * depth;
+    const channelBytes = channelVoxelCount * rawVoxelBytes(layout.dataType);
+    const channelLayouts = Array.from(
+        { length: npyChannelCount(header) },
+        (_, channelIndex) => ({
+            ...layout,
+            byteOffset: layout.byteOffset + channelIndex * channelBytes,
+        }),
+    );
+    const channelRanges = [];
+
+    for (const channelLayout of channelLayouts) {
+        channelRanges.push(
+            await scanStoredRange(
+                reference,
+                channelLayout,
+                channelVoxelCount,
+                onProgress,
+            ),
+        );
+    }
+
+    return buildNpyVolumes(reference, header, channelRanges).map(
+        (volume, channelIndex) => ({
+            ...volume,
+            voxelLayout: channelLayouts[channelIndex],
+        }),
+    );
+}
+
+export async function loadRangedVolumes(
+    reference: MedicalFileReference,
+    onProgress?: (progress: RangedVolumeProgress) => void,
+): Promise<Volume[]> {
+    const probe = await readMedicalFileRange(
+        reference.path,
+        0,
+        Math.min(reference.size, HEADER_PROBE_BYTES),
+    );
+
+    return reference.name.toLowerCase().endsWith(".npy")
+        ? loadRangedNpy(reference, probe, onProgress)
+        : loadRangedNifti(reference, probe, onProgress);
+}
+
+function slabSliceCount(volume: Volume, layout: VolumeVoxelLayout) {
+    const [width, height] = volume.dimensions;
+    const sliceBytes = width * height * rawVoxelBytes(layout.dataType);
+    return Math.max(Math.floor(SLAB_TARGET_BYTES / sliceBytes), 1);
+}
+
+function rememberSlab(key: string, slab: VolumeSlab) {
+    const bytes = slab.volume.data.byteLength;
+    cachedSlabs.set(key, { slab, bytes });
+    cachedSlabBytes += bytes;
+
+    for (const [cachedKey, cached] of cachedSlabs) {
+        if (cachedSlabBytes <= MAX_CACHED_SLAB_BYTES) break;
+        if (cachedKey === key) continue;
+        cachedSlabs.delete(cachedKey);
+        cachedSlabBytes -= cached.bytes;
+    }
+}
+
+async function readSlab(
+    volume: Volume,
+    layout: VolumeVoxelLayout,
+    sourcePath: string,
+    firstSlice: number,
+): Promise<VolumeSlab> {
+    const [width, height, depth] = volume.dimensions;
+    const sliceCount = Math.min(
+        slabSliceCount(volume, layout),
+        depth - firstSlice,
+    );
+    const sliceVoxels = width * height;
+    const bytesPerValue = rawVoxelBytes(layout.dataType);
+    const bytes = await readMedicalFileRange(
+        sourcePath,
+        layout.byteOffset + firstSlice * sliceVoxels * bytesPerValue,
+        sliceCount * sliceVoxels * bytesPerValue,
+    );
+
+    return {
+        volumeId: volume.id,
+        firstSlice,
+        volume: {
+            ...volume,
+            id: `${volume.id}:slab${firstSlice}`,
+            dimensions: [width, height, sliceCount],
+            data: toSharedVoxelData(
+                decodeRawVoxels(
+                    bytes,
+                    layout.dataType,
+                    layout.littleEndian,
+                    sliceCount * sliceVoxels,
+                ),
+            ),
+            voxelLayout: undefined,
+        },
+    };
+}
+
+export function readAxialSlab(
+    volume: Volume,
+    slice: number,
+): Promise<VolumeSlab> {
+    const { voxelLayout, sourcePath } = volume;
+    if (!voxelLayout || !sourcePath) {
+        return Promise.reject(
+            new Error(`${volume.name} cannot be read in slabs.`),
+        );
+    }
+
+    const slabSlices = slabSliceCount(volume, voxelLayout);
+    const firstSlice = Math.floor(slice / slabSlices) * slabSlices;
+    const key = `${volume.id}:${firstSlice}`;
+    const cached = cachedSlabs.get(key);
+
+    if (cached) {
+        cachedSlabs.delete(key);
+        cachedSlabs.set(key, cached);
+        return Promise.resolve(cached.slab);
+    }
+
+    let pending = pendingSlabs.get(key);
+    if (!pending) {
+        pending = readSlab(volume, voxelLayout, sourcePath, firstSlice)
+            .then((slab) => {
+                rememberSlab(key, slab);
+                return slab;
+            })
+            .finally(() => pendingSlabs.delete(key));
+        pendingSlabs.set(key, pending);
+    }
+
+    return pending;
+}
@@ -0,0 +1,185 @@
+type WorkerRequestMessage<Request> = {
+    id: number;
+    request: Request;
+};
+
+type WorkerReplyMessage<Response> = {
+    id: number;
+    result?: Response;
+    error?: string;
+};
+
+type PendingTask<Request, Response> = {
+    id: number;
+    request: Request;
+    transfer: Transferable[];
+    resolve: (response: Response) => void;
+    reject: (error: Error) => void;
+};
+
+export type WorkerPool<Request, Response> = {
+    size: number;
+    run: (request: Request, transfer?: Transferable[]) => Promise<Response>;
+    terminate: () => void;
+};
+
+export type WorkerHandlerResult<Response> = {
+    result: Response;
+    transfer?: Transferable[];
+};
+
+const MAX_POOL_SIZE = 16;
+
+export function canUseWorkers() {
+    return typeof Worker !== "undefined";
+}
+
+export function defaultWorkerPoolSize() {
+    const concurrency = globalThis.navigator?.hardwareConcurrency ?? 4;
+    return Math.min(Math.max(concurrency, 1), MAX_POOL_SIZE);
+}
+
+export function transferableBuffer(bytes: ArrayBufferView): Transferable[] {
+    const { buffer } = bytes;
+    return buffer instanceof ArrayBuffer &&
+        bytes.byteOffset === 0 &&
+        bytes.byteLength === buffer.byteLength
+        ? [buffer]
+        : [];
+}
+
+export function createWorkerPool<Request, Response>(
+    createWorker: () => Worker,
+    size = defaultWorkerPoolSize(),
+): WorkerPool<Request, Response> {
+    const workers: Worker[] = [];
+    const idleWorkers: Worker[] = [];
+    const runningTasks = new Map<Worker, PendingTask<Request, Response>>();
+    const queue: PendingTask<Request, Response>[] = [];
+    let nextTaskId = 0;
+
+    const dispatch = () => {
+        while (queue.length > 0) {
+            const worker =
+                idleWorkers.pop() ??
+                (workers.length < size ? spawnWorker() : undefined);
+            if (!worker) return;
+
+            const task = queue.shift();
+            if (!task) {
+                idleWorkers.push(worker);
+                return;
+            }
+
+            runningTasks.set(worker, task);
+            const message: WorkerRequestMessage<Request> = {
+                id: task.id,
+                request: task.request,
+            };
+            worker.postMessage(message, task.transfer);
+        }
+    };
+
+    const finishTask = (worker: Worker) => {
+        const task = runningTasks.get(worker);
+        runningTasks.delete(worker);
+        idleWorkers.push(worker);
+        dispatch();
+        return task;
+    };
+
+    const replaceWorker = (worker: Worker) => {
+        worker.terminate();
+        workers.splice(workers.indexOf(worker), 1);
+        const task = runningTasks.get(worker);
+        runningTasks.delete(worker);
+        dispatch();
+        return task;
+    };
+
+    function spawnWorker() {
+        const worker = createWorker();
+
+        worker.addEventListener(
+            "message",
+            (event: MessageEvent<WorkerReplyMessage<Response>>) => {
+                const task = finishTask(worker);
+                if (!task || task.id !== event.data.id) return;
+
+                if (event.data.error !== undefined) {
+                    task.reject(new Error(event.data.error));
+                    return;
+                }
+
+                task.resolve(event.data.result as Response);
+            },
+        );
+        worker.addEventListener("error", (event) => {
+            event.preventDefault();
+            replaceWorker(worker)?.reject(
+                new Error(event.message || "Worker failed unexpectedly."),
+            );
+        });
+
+        workers.push(worker);
+        return worker;
+    }
+
+    return {
+        size,
+        run: (request, transfer = []) =>
+            new Promise<Response>((resolve, reject) => {
+                queue.push({
+                    id: nextTaskId,
+                    request,
+                    transfer,
+                    resolve,
+                    reject,
+                });
+                nextTaskId += 1;
+                dispatch();
+            }),
+        terminate: () => {
+            for (const worker of workers) {
+                worker.terminate();
+            }
+
+            for (const task of [...runningTasks.values(), ...queue]) {
+                task.reject(new Error("Worker pool was terminated."));
+            }
+
+            workers.length = 0;
+            idleWorkers.length = 0;
+            runningTasks.clear();
+            queue.length = 0;
+        },
+    };
+}
+
+export function handleWorkerPoolRequests<Request, Response>(
+    handler: (
+        request: Request,
+    ) =>
+        | WorkerHandlerResult<Response>
+        | Promise<WorkerHandlerResult<Response>>,
+) {
+    globalThis.addEventListener(
+        "message",
+        async (event: MessageEvent<WorkerRequestMessage<Request>>) => {
+            const { id, request } = event.data;
+
+            try {
+                const { result, transfer = [] } = await handler(request);
+                const reply: WorkerReplyMessage<Response> = { id, result };
+                globalThis.postMessage(reply, { transfer });
+            } catch (error) {
+                const reply: WorkerReplyMessage<Response> = {
+                    id,
+                    error:
+                        error instanceof Error ? error.message : String(error),
+                };
+                globalThis.postMessage(reply);
+            }
+        },
+    );
+}
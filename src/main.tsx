@@ -8,3 +8,9 @@ createRoot(document.getElementById('root')!).render(
     <App />
   </StrictMode>,
 )
+
+if (import.meta.env.DEV) {
+  import('./benchmarks/fileTransfer').then(({ benchmarkFileTransfer }) => {
+    window.dcmViewerBenchmarks = { fileTransfer: benchmarkFileTransfer }
+  })
+}
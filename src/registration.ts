@@ -0,0 +1,525 @@
+import {
+    canUseWorkers,
+    createWorkerPool,
+    type WorkerPool,
+} from "./loaders/workerPool";
+import {
+    composeAffines,
+    IDENTITY_AFFINE,
+    invertAffine,
+    sourceFromTargetTransform,
+} from "./resampling";
+import type { LoadedVolume, VoxelData } from "./types";
+import { shareVolumeData } from "./voxels";
+
+export type RegistrationLevel = {
+    data: VoxelData;
+    dimensions: [number, number, number];
+};
+
+export type RegistrationRequest =
+    | {
+          type: "downsample";
+          source: RegistrationLevel;
+          output: Float32Array;
+          zStart: number;
+          zEnd: number;
+      }
+    | {
+          type: "metric";
+          fixed: RegistrationLevel;
+          moving: RegistrationLevel;
+          transforms: number[][];
+          stride: number;
+          zStart: number;
+          zEnd: number;
+      };
+
+export type RegistrationResponse = number[][];
+
+export type RegistrationProgress = {
+    current: number;
+    total: number;
+    message: string;
+};
+
+export type RegistrationResult = {
+    sourceFromTarget: number[];
+    correlation: number;
+};
+
+type RegistrationRunner = Pick<
+    WorkerPool<RegistrationRequest, RegistrationResponse>,
+    "size" | "run" | "terminate"
+>;
+
+const GAUSSIAN_WEIGHTS = [1 / 16, 4 / 16, 6 / 16, 4 / 16, 1 / 16];
+const COARSEST_LEVEL_SIZE = 48;
+const MAX_PYRAMID_LEVELS = 4;
+const FULL_RESOLUTION_MAX_VOXELS = 8 * 1024 * 1024;
+const METRIC_SAMPLE_VOXELS = 2 * 1024 * 1024;
+const MAX_ITERATIONS = 40;
+const MAX_STEP_HALVINGS = 4;
+
+function halfDimensions([width, height, depth]: [number, number, number]) {
+    return [
+        Math.ceil(width / 2),
+        Math.ceil(height / 2),
+        Math.ceil(depth / 2),
+    ] as [number, number, number];
+}
+
+// Blurs with a 5-tap binomial kernel along z, y and x while keeping every
+// second sample, writing output slices [zStart, zEnd).
+function downsampleGaussian(
+    { data, dimensions }: RegistrationLevel,
+    output: Float32Array,
+    zStart: number,
+    zEnd: number,
+) {
+    const [width, height, depth] = dimensions;
+    const [outputWidth, outputHeight] = halfDimensions(dimensions);
+    const planeSize = width * height;
+    const blurredPlane = new Float32Array(planeSize);
+    const blurredRows = new Float32Array(width * outputHeight);
+
+    for (let z = zStart; z < zEnd; z += 1) {
+        blurredPlane.fill(0);
+
+        for (let tap = 0; tap < 5; tap += 1) {
+            const sourceZ = Math.min(Math.max(z * 2 + tap - 2, 0), depth - 1);
+            const weight = GAUSSIAN_WEIGHTS[tap];
+            const start = sourceZ * planeSize;
+
+            for (let index = 0; index < planeSize; index += 1) {
+                blurredPlane[index] += data[start + index] * weight;
+            }
+        }
+
+        for (let y = 0; y < outputHeight; y += 1) {
+            for (let x = 0; x < width; x += 1) {
+                let sum = 0;
+
+                for (let tap = 0; tap < 5; tap += 1) {
+                    const sourceY = Math.min(
+                        Math.max(y * 2 + tap - 2, 0),
+                        height - 1,
+                    );
+                    sum +=
+                        blurredPlane[sourceY * width + x] *
+                        GAUSSIAN_WEIGHTS[tap];
+                }
+
+                blurredRows[y * width + x] = sum;
+            }
+        }
+
+        for (let y = 0; y < outputHeight; y += 1) {
+            const outputRow = (z * outputHeight + y) * outputWidth;
+
+            for (let x = 0; x < outputWidth; x += 1) {
+                let sum = 0;
+
+                for (let tap = 0; tap < 5; tap += 1) {
+                    const sourceX = Math.min(
+                        Math.max(x * 2 + tap - 2, 0),
+                        width - 1,
+                    );
+                    sum +=
+                        blurredRows[y * width + sourceX] *
+                        GAUSSIAN_WEIGHTS[tap];
+                }
+
+                output[outputRow + x] = sum;
+            }
+        }
+    }
+}
+
+function sampleTrilinear(
+    data: VoxelData,
+    [width, height, depth]: [number, number, number],
+    x: number,
+    y: number,
+    z: number,
+) {
+    const x0 = Math.floor(x);
+    const y0 = Math.floor(y);
+    const z0 = Math.floor(z);
+    const fx = x - x0;
+    const fy = y - y0;
+    const fz = z - z0;
+    const planeSize = width * height;
+    const dx = x0 < width - 1 ? 1 : 0;
+    const dy = y0 < height - 1 ? width : 0;
+    const dz = z0 < depth - 1 ? planeSize : 0;
+    const base = z0 * planeSize + y0 * width + x0;
+    const c00 = data[base] + (data[base + dx] - data[base]) * fx;
+    const c10 = data[base + dy] + (data[base + dy + dx] - data[base + dy]) * fx;
+    const c01 = data[base + dz] + (data[base + dz + dx] - data[base + dz]) * fx;
+    const c11 =
+        data[base + dz + dy] +
+        (data[base + dz + dy + dx] - data[base + dz + dy]) * fx;
+    const c0 = c00 + (c10 - c00) * fy;
+    const c1 = c01 + (c11 - c01) * fy;
+    return c0 + (c1 - c0) * fz;
+}
+
+// Returns [count, sumFixed, sumMoving, sumFixed², sumMoving², sumProduct]
+// per transform over the overlap of the fixed slab and the moving volume.
+function metricSums(
+    fixed: RegistrationLevel,
+    moving: RegistrationLevel,
+    transforms: number[][],
+    stride: number,
+    zStart: number,
+    zEnd: number,
+) {
+    const [width, height] = fixed.dimensions;
+    const [maxX, maxY, maxZ] = moving.dimensions.map((size) => size - 1);
+
+    return transforms.map((m) => {
+        const sums = [0, 0, 0, 0, 0, 0];
+
+        for (let z = zStart; z < zEnd; z += stride) {
+            for (let y = 0; y < height; y += stride) {
+                const row = (z * height + y) * width;
+
+                for (let x = 0; x < width; x += stride) {
+                    const sx = m[0] * x + m[1] * y + m[2] * z + m[3];
+                    const sy = m[4] * x + m[5] * y + m[6] * z + m[7];
+                    const sz = m[8] * x + m[9] * y + m[10] * z + m[11];
+                    if (
+                        sx < 0 ||
+                        sy < 0 ||
+                        sz < 0 ||
+                        sx > maxX ||
+                        sy > maxY ||
+                        sz > maxZ
+                    ) {
+                        continue;
+                    }
+
+                    const a = fixed.data[row + x];
+                    const b = sampleTrilinear(
+                        moving.data,
+                        moving.dimensions,
+                        sx,
+                        sy,
+                        sz,
+                    );
+                    sums[0] += 1;
+                    sums[1] += a;
+                    sums[2] += b;
+                    sums[3] += a * a;
+                    sums[4] += b * b;
+                    sums[5] += a * b;
+                }
+            }
+        }
+
+        return sums;
+    });
+}
+
+export function handleRegistrationRequest(
+    request: RegistrationRequest,
+): RegistrationResponse {
+    if (request.type === "downsample") {
+        downsampleGaussian(
+            request.source,
+            request.output,
+            request.zStart,
+            request.zEnd,
+        );
+        return [];
+    }
+
+    return metricSums(
+        request.fixed,
+        request.moving,
+        request.transforms,
+        request.stride,
+        request.zStart,
+        request.zEnd,
+    );
+}
+
+function createRegistrationRunner(): RegistrationRunner {
+    if (canUseWorkers() && typeof SharedArrayBuffer !== "undefined") {
+        return createWorkerPool<RegistrationRequest, RegistrationResponse>(
+            () =>
+                new Worker(
+                    new URL("./registrationWorker.ts", import.meta.url),
+                    { type: "module" },
+                ),
+        );
+    }
+
+    return {
+        size: 1,
+        run: async (request) => handleRegistrationRequest(request),
+        terminate: () => undefined,
+    };
+}
+
+function slabRanges(depth: number, parts: number, stride = 1) {
+    const slices = Math.ceil(depth / stride);
+    const perPart = Math.max(Math.ceil(slices / parts), 1);
+    const ranges: Array<[number, number]> = [];
+
+    for (let slice = 0; slice < slices; slice += perPart) {
+        ranges.push([
+            slice * stride,
+            Math.min((slice + perPart) * stride, depth),
+        ]);
+    }
+
+    return ranges;
+}
+
+async function downsampleLevel(
+    runner: RegistrationRunner,
+    source: RegistrationLevel,
+): Promise<RegistrationLevel> {
+    const dimensions = halfDimensions(source.dimensions);
+    const length = dimensions[0] * dimensions[1] * dimensions[2];
+    const bytes = length * Float32Array.BYTES_PER_ELEMENT;
+    const output =
+        typeof SharedArrayBuffer === "undefined"
+            ? new Float32Array(length)
+            : new Float32Array(new SharedArrayBuffer(bytes));
+
+    await Promise.all(
+        slabRanges(dimensions[2], runner.size).map(([zStart, zEnd]) =>
+            runner.run({ type: "downsample", source, output, zStart, zEnd }),
+        ),
+    );
+
+    return { data: output, dimensions };
+}
+
+// Levels run from full resolution (factor 1) to the coarsest level; each
+// level halves the previous one after a Gaussian blur.
+async function buildPyramid(
+    runner: RegistrationRunner,
+    volume: LoadedVolume,
+    levelCount: number,
+) {
+    const levels: RegistrationLevel[] = [
+        { data: shareVolumeData(volume).data, dimensions: volume.dimensions },
+    ];
+
+    while (levels.length < levelCount) {
+        levels.push(await downsampleLevel(runner, levels[levels.length - 1]));
+    }
+
+    return levels;
+}
+
+function pyramidLevelCount(dimensions: [number, number, number]) {
+    let levelCount = 1;
+    let size = Math.max(...dimensions);
+
+    while (size > COARSEST_LEVEL_SIZE && levelCount < MAX_PYRAMID_LEVELS) {
+        size = Math.ceil(size / 2);
+        levelCount += 1;
+    }
+
+    return levelCount;
+}
+
+// Rotation about `center` by Rz·Ry·Rx followed by a translation, as a
+// row-major 3x4 transform in fixed patient space.
+function rigidTransform(parameters: number[], center: number[]) {
+    const [rx, ry, rz, tx, ty, tz] = parameters;
+    const [cx, sx] = [Math.cos(rx), Math.sin(rx)];
+    const [cy, sy] = [Math.cos(ry), Math.sin(ry)];
+    const [cz, sz] = [Math.cos(rz), Math.sin(rz)];
+    const rotation = [
+        cz * cy,
+        cz * sy * sx - sz * cx,
+        cz * sy * cx + sz * sx,
+        sz * cy,
+        sz * sy * sx + cz * cx,
+        sz * sy * cx - cz * sx,
+        -sy,
+        cy * sx,
+        cy * cx,
+    ];
+    const translation = [tx, ty, tz];
+
+    return [0, 1, 2].flatMap((row) => {
+        const [r0, r1, r2] = rotation.slice(row * 3, row * 3 + 3);
+        return [
+            r0,
+            r1,
+            r2,
+            center[row] +
+                translation[row] -
+                (r0 * center[0] + r1 * center[1] + r2 * center[2]),
+        ];
+    });
+}
+
+function scaleAffine(factor: number) {
+    return [factor, 0, 0, 0, 0, factor, 0, 0, 0, 0, factor, 0];
+}
+
+function correlation([count, a, b, aa, bb, ab]: number[]) {
+    if (count < 64) return -1;
+
+    const covariance = ab - (a * b) / count;
+    const fixedVariance = aa - (a * a) / count;
+    const movingVariance = bb - (b * b) / count;
+    const denominator = Math.sqrt(fixedVariance * movingVariance);
+    return denominator > 0 ? covariance / denominator : -1;
+}
+
+// Registers the moving volume to the fixed one with a rigid transform that
+// maximises normalised cross-correlation. Each pyramid level runs a
+// step-halving search over the three rotations and three translations,
+// and every step evaluates all 13 candidates across the worker pool.
+export async function registerVolumes(
+    fixed: LoadedVolume,
+    moving: LoadedVolume,
+    onProgress?: (progress: RegistrationProgress) => void,
+): Promise<RegistrationResult> {
+    const runner = createRegistrationRunner();
+
+    try {
+        const levelCount = Math.min(
+            pyramidLevelCount(fixed.dimensions),
+            pyramidLevelCount(moving.dimensions),
+        );
+        const fixedLevels = await buildPyramid(runner, fixed, levelCount);
+        const movingLevels = await buildPyramid(runner, moving, levelCount);
+        const fixedVoxels =
+            fixed.dimensions[0] * fixed.dimensions[1] * fixed.dimensions[2];
+        const finestLevel =
+            levelCount > 1 && fixedVoxels > FULL_RESOLUTION_MAX_VOXELS ? 1 : 0;
+        const worldFromFixed = fixed.affine ?? IDENTITY_AFFINE;
+        const fixedFromWorld = invertAffine(worldFromFixed) ?? IDENTITY_AFFINE;
+        const movingFromFixed = sourceFromTargetTransform(fixed, moving);
+        const movingFromWorld = composeAffines(movingFromFixed, fixedFromWorld);
+        const center = [0, 1, 2].map((row) => {
+            const [m0, m1, m2, m3] = worldFromFixed.slice(row * 4, row * 4 + 4);
+            const [x, y, z] = fixed.dimensions.map((size) => (size - 1) / 2);
+            return m0 * x + m1 * y + m2 * z + m3;
+        });
+        const voxelSize = Math.min(
+            ...[0, 1, 2].map((column) =>
+                Math.hypot(
+                    worldFromFixed[column],
+                    worldFromFixed[4 + column],
+                    worldFromFixed[8 + column],
+                ),
+            ),
+        );
+        const fullTransform = (parameters: number[]) =>
+            composeAffines(
+                movingFromWorld,
+                composeAffines(
+                    rigidTransform(parameters, center),
+                    worldFromFixed,
+                ),
+            );
+        const levelsToRun = levelCount - finestLevel;
+        const total = levelsToRun * MAX_ITERATIONS;
+        let parameters = [0, 0, 0, 0, 0, 0];
+        let bestCorrelation = -1;
+
+        for (let level = levelCount - 1; level >= finestLevel; level -= 1) {
+            const factor = 2 ** level;
+            const fixedLevel = fixedLevels[level];
+            const movingLevel = movingLevels[level];
+            const [width, height, depth] = fixedLevel.dimensions;
+            const sampleRatio = (width * height * depth) / METRIC_SAMPLE_VOXELS;
+            const stride = Math.max(Math.ceil(Math.cbrt(sampleRatio)), 1);
+            const levelTransform = (candidate: number[]) =>
+                composeAffines(
+                    scaleAffine(1 / factor),
+                    composeAffines(
+                        fullTransform(candidate),
+                        scaleAffine(factor),
+                    ),
+                );
+            const evaluate = async (candidates: number[][]) => {
+                const transforms = candidates.map(levelTransform);
+                const partials = await Promise.all(
+                    slabRanges(depth, runner.size, stride).map(
+                        ([zStart, zEnd]) =>
+                            runner.run({
+                                type: "metric",
+                                fixed: fixedLevel,
+                                moving: movingLevel,
+                                transforms,
+                                stride,
+                                zStart,
+                                zEnd,
+                            }),
+                    ),
+                );
+
+                return transforms.map((_, index) =>
+                    correlation(
+                        partials.reduce(
+                            (sums, partial) =>
+                                sums.map(
+                                    (value, term) =>
+                                        value + partial[index][term],
+                                ),
+                            [0, 0, 0, 0, 0, 0],
+                        ),
+                    ),
+                );
+            };
+            const steps = [
+                ...Array<number>(3).fill(Math.min(0.01 * factor, 0.08)),
+                ...Array<number>(3).fill(2 * factor * voxelSize),
+            ];
+            const levelIndex = levelCount - 1 - level;
+            let halvings = 0;
+
+            for (
+                let iteration = 0;
+                iteration < MAX_ITERATIONS && halvings < MAX_STEP_HALVINGS;
+                iteration += 1
+            ) {
+                const candidates = [parameters];
+
+                for (let axis = 0; axis < 6; axis += 1) {
+                    for (const direction of [-1, 1]) {
+                        const candidate = [...parameters];
+                        candidate[axis] += direction * steps[axis];
+                        candidates.push(candidate);
+                    }
+                }
+
+                const scores = await evaluate(candidates);
+                const bestIndex = scores.indexOf(Math.max(...scores));
+                bestCorrelation = scores[bestIndex];
+
+                if (bestIndex === 0) {
+                    halvings += 1;
+                    for (let axis = 0; axis < 6; axis += 1) steps[axis] /= 2;
+                } else {
+                    parameters = candidates[bestIndex];
+                }
+
+                onProgress?.({
+                    current: levelIndex * MAX_ITERATIONS + iteration + 1,
+                    total,
+                    message: `Registering at 1/${factor} resolution (NCC ${bestCorrelation.toFixed(3)})`,
+                });
+            }
+        }
+
+        return {
+            sourceFromTarget: fullTransform(parameters),
+            correlation: bestCorrelation,
+        };
+    } finally {
+        runner.terminate();
+    }
+}
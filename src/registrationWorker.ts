@@ -0,0 +1,10 @@
+import { handleWorkerPoolRequests } from "./loaders/workerPool";
+import {
+    handleRegistrationRequest,
+    type RegistrationRequest,
+    type RegistrationResponse,
+} from "./registration";
+
+handleWorkerPoolRequests<RegistrationRequest, RegistrationResponse>(
+    (request) => ({ result: handleRegistrationRequest(request) }),
+);
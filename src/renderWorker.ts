@@ -0,0 +1,67 @@
+import {
+    createSliceFrameCache,
+    MAX_CACHED_FRAME_BYTES,
+    type SliceFrameCache,
+} from "./sliceFrameCache";
+import type { LoadedVolume } from "./types";
+import type {
+    RenderWorkerMessage,
+    SliceRenderRequest,
+} from "./viewportRenderer";
+
+let frames: SliceFrameCache | undefined;
+let frameBudget = MAX_CACHED_FRAME_BYTES;
+let volume: LoadedVolume | undefined;
+let lastRequest: SliceRenderRequest | undefined;
+let pendingRequest: SliceRenderRequest | undefined;
+let drawScheduled = false;
+
+function drawPendingRequest() {
+    drawScheduled = false;
+    const request = pendingRequest;
+    pendingRequest = undefined;
+
+    if (!frames || !volume || !request) return;
+    frames.setVolume(volume);
+    frames.draw(request);
+}
+
+function scheduleDraw() {
+    if (drawScheduled) return;
+
+    drawScheduled = true;
+    if (typeof requestAnimationFrame === "function") {
+        requestAnimationFrame(drawPendingRequest);
+    } else {
+        setTimeout(drawPendingRequest, 0);
+    }
+}
+
+globalThis.addEventListener(
+    "message",
+    (event: MessageEvent<RenderWorkerMessage>) => {
+        const message = event.data;
+
+        if (message.type === "canvas") {
+            frames = createSliceFrameCache(message.canvas, frameBudget);
+            return;
+        }
+
+        if (message.type === "budget") {
+            frameBudget = message.bytes;
+            frames?.setBudget(frameBudget);
+            return;
+        }
+
+        if (message.type === "volume") {
+            volume = message.volume;
+            pendingRequest ??= lastRequest;
+        } else {
+            // A newer request replaces any frame that has not been drawn yet.
+            pendingRequest = message.request;
+            lastRequest = message.request;
+        }
+
+        scheduleDraw();
+    },
+);
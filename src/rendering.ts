@@ -1,4 +1,11 @@
-import type { Axis, VisualizationColorMap, Volume } from "./types";
+import type {
+    Axis,
+    LoadedVolume,
+    SlabMode,
+    VisualizationColorMap,
+    Volume,
+} from "./types";
+import { littleEndianHost } from "./voxels";
 
 export type RenderVisualizationOptions = {
     colorMap: VisualizationColorMap;
@@ -6,6 +13,58 @@ export type RenderVisualizationOptions = {
     clipMax: number;
 };
 
+export type RenderCanvas = {
+    width: number;
+    height: number;
+    getContext(contextId: "2d"): CanvasImageData | null;
+};
+
+export type RenderTarget = {
+    data: Uint8ClampedArray;
+    width: number;
+    height: number;
+};
+
+export type SlabOptions = {
+    mode: Exclude<SlabMode, "slice">;
+    thickness: number;
+};
+
+// Running projection of one volume over the slices [start, end) along an
+// axis. MIP and MinIP remember which slice each pixel's extreme came from,
+// so dropping a slice only rescans the pixels it owned; AvgIP keeps sums.
+export type SlabAccumulator = {
+    volume?: LoadedVolume;
+    key: string;
+    start: number;
+    end: number;
+    offsets: Uint32Array;
+    values: Float32Array;
+    sources: Int32Array;
+    sums: Float64Array;
+};
+
+type WindowLookup = {
+    scale: number;
+    offset: number;
+    maxIndex: number;
+    colors: Uint32Array;
+};
+
+const LOOKUP_SIZE = 4096;
+const DIFFERENCE_LOOKUP_HALF = 2048;
+const MAX_CACHED_LOOKUPS = 32;
+const colorTables = new Map<VisualizationColorMap, Uint32Array>();
+const windowLookups = new Map<string, WindowLookup>();
+const canvasImageData = new WeakMap<RenderCanvas, ImageData>();
+let differenceColors: Uint32Array | undefined;
+
+function packColor(red: number, green: number, blue: number) {
+    return littleEndianHost
+        ? ((255 << 24) | (blue << 16) | (green << 8) | red) >>> 0
+        : ((red << 24) | (green << 16) | (blue << 8) | 255) >>> 0;
+}
+
 export function getSliceCount(volume: Volume, axis: Axis) {
     const [width, height, depth] = volume.dimensions;
     if (axis === "axial") return depth;
@@ -20,51 +79,25 @@ export function getSliceSize(volume: Volume, axis: Axis) {
     return { width: height, height: depth };
 }
 
-export function getVoxel(volume: Volume, x: number, y: number, z: number) {
-    const [width, height] = volume.dimensions;
-    return volume.data[z * width * height + y * width + x];
-}
-
-function writePixel(
-    imageData: ImageData,
-    pixelIndex: number,
-    red: number,
-    green: number,
-    blue: number,
+export function getVoxel(
+    volume: LoadedVolume,
+    x: number,
+    y: number,
+    z: number,
 ) {
-    imageData.data[pixelIndex] = red;
-    imageData.data[pixelIndex + 1] = green;
-    imageData.data[pixelIndex + 2] = blue;
-    imageData.data[pixelIndex + 3] = 255;
-}
-
-function writeDifferencePixel(
-    imageData: ImageData,
-    pixelIndex: number,
-    value: number,
-    maxAbsDifference: number,
-) {
-    const magnitude = Math.min(Math.abs(value) / maxAbsDifference, 1);
-    const channelFloor = Math.round(255 * (1 - magnitude));
-
-    if (value > 0) {
-        writePixel(imageData, pixelIndex, 255, channelFloor, channelFloor);
-        return;
-    }
-
-    if (value < 0) {
-        writePixel(imageData, pixelIndex, channelFloor, channelFloor, 255);
-        return;
-    }
-
-    writePixel(imageData, pixelIndex, 255, 255, 255);
+    const [width, height] = volume.dimensions;
+    const index = z * width * height + y * width + x;
+    return volume.data[index] * volume.rescaleSlope + volume.rescaleIntercept;
 }
 
 function lerp(left: number, right: number, ratio: number) {
     return Math.round(left + (right - left) * ratio);
 }
 
-function colorFromMap(colorMap: VisualizationColorMap, value: number) {
+export function colorFromMap(
+    colorMap: VisualizationColorMap,
+    value: number,
+) {
     const t = Math.min(Math.max(value, 0), 1);
 
     if (colorMap === "grayscale") {
@@ -142,24 +175,11 @@ function colorFromMap(colorMap: VisualizationColorMap, value: number) {
     return { red: 255, green: lerp(255, 0, ratio), blue: 0 };
 }
 
-export function renderSliceToCanvas(
-    canvas: HTMLCanvasElement,
-    volume: Volume,
-    axis: Axis,
-    slice: number,
+export function getWindowRange(
     windowCenter: number,
     windowWidth: number,
     visualization: RenderVisualizationOptions,
 ) {
-    const size = getSliceSize(volume, axis);
-    const context = canvas.getContext("2d");
-
-    if (!context) return;
-
-    canvas.width = size.width;
-    canvas.height = size.height;
-
-    const imageData = context.createImageData(size.width, size.height);
     const low = windowCenter - windowWidth / 2;
     const high = windowCenter + windowWidth / 2;
     const clipLow = Math.min(visualization.clipMin, visualization.clipMax);
@@ -170,46 +190,469 @@ export function renderSliceToCanvas(
         effectiveLow < effectiveHigh ? effectiveLow : Math.min(low, high);
     const rangeHigh =
         effectiveLow < effectiveHigh ? effectiveHigh : Math.max(low, high);
+
+    return { rangeLow, rangeHigh };
+}
+
+function colorTableFor(colorMap: VisualizationColorMap) {
+    const cached = colorTables.get(colorMap);
+    if (cached) return cached;
+
+    const table = new Uint32Array(LOOKUP_SIZE);
+    for (let index = 0; index < LOOKUP_SIZE; index += 1) {
+        const pixel = colorFromMap(colorMap, index / (LOOKUP_SIZE - 1));
+        table[index] = packColor(pixel.red, pixel.green, pixel.blue);
+    }
+
+    colorTables.set(colorMap, table);
+    return table;
+}
+
+function differenceColorTable() {
+    if (differenceColors) return differenceColors;
+
+    const half = DIFFERENCE_LOOKUP_HALF;
+    differenceColors = new Uint32Array(half * 2 + 1);
+
+    for (let index = 0; index <= half * 2; index += 1) {
+        const magnitude = Math.abs(index - half) / half;
+        const channelFloor = Math.round(255 * (1 - magnitude));
+        differenceColors[index] =
+            index > half
+                ? packColor(255, channelFloor, channelFloor)
+                : index < half
+                  ? packColor(channelFloor, channelFloor, 255)
+                  : packColor(255, 255, 255);
+    }
+
+    return differenceColors;
+}
+
+export function createWindowLookup(
+    volume: Pick<Volume, "min" | "max" | "renderMode">,
+    windowCenter: number,
+    windowWidth: number,
+    visualization: RenderVisualizationOptions,
+): WindowLookup {
+    if (volume.renderMode === "difference") {
+        const maxAbsDifference = Math.max(
+            Math.abs(volume.min),
+            Math.abs(volume.max),
+            1,
+        );
+        const key = `difference:${maxAbsDifference}`;
+        const cached = windowLookups.get(key);
+        if (cached) return cached;
+
+        return rememberLookup(key, {
+            scale: DIFFERENCE_LOOKUP_HALF / maxAbsDifference,
+            offset: DIFFERENCE_LOOKUP_HALF + 0.5,
+            maxIndex: DIFFERENCE_LOOKUP_HALF * 2,
+            colors: differenceColorTable(),
+        });
+    }
+
+    const { rangeLow, rangeHigh } = getWindowRange(
+        windowCenter,
+        windowWidth,
+        visualization,
+    );
+    const key = `${visualization.colorMap}:${rangeLow}:${rangeHigh}`;
+    const cached = windowLookups.get(key);
+    if (cached) return cached;
+
     const safeRange = Math.max(rangeHigh - rangeLow, 1);
-    const maxAbsDifference = Math.max(
-        Math.abs(volume.min),
-        Math.abs(volume.max),
-        1,
+    const scale = (LOOKUP_SIZE - 1) / safeRange;
+
+    return rememberLookup(key, {
+        scale,
+        offset: 0.5 - rangeLow * scale,
+        maxIndex: Math.floor((rangeHigh - rangeLow) * scale + 0.5),
+        colors: colorTableFor(visualization.colorMap),
+    });
+}
+
+function rememberLookup(key: string, lookup: WindowLookup) {
+    if (windowLookups.size >= MAX_CACHED_LOOKUPS) {
+        const oldestKey = windowLookups.keys().next().value;
+        if (oldestKey !== undefined) windowLookups.delete(oldestKey);
+    }
+
+    windowLookups.set(key, lookup);
+    return lookup;
+}
+
+function sliceLayout(volume: LoadedVolume, axis: Axis, slice: number) {
+    const [width, height, depth] = volume.dimensions;
+    const planeSize = width * height;
+    const coronalPlane = volume.slicePlanes?.coronal;
+    const sagittalPlane = volume.slicePlanes?.sagittal;
+
+    if (axis === "axial") {
+        return {
+            source: volume.data,
+            rowStart: (row: number) => slice * planeSize + row * width,
+            columnStride: 1,
+            sliceStride: planeSize,
+        };
+    }
+
+    if (axis === "coronal") {
+        if (coronalPlane) {
+            return {
+                source: coronalPlane,
+                rowStart: (row: number) =>
+                    (slice * depth + depth - 1 - row) * width,
+                columnStride: 1,
+                sliceStride: depth * width,
+            };
+        }
+
+        return {
+            source: volume.data,
+            rowStart: (row: number) =>
+                (depth - 1 - row) * planeSize + slice * width,
+            columnStride: 1,
+            sliceStride: width,
+        };
+    }
+
+    if (sagittalPlane) {
+        return {
+            source: sagittalPlane,
+            rowStart: (row: number) =>
+                (slice * depth + depth - 1 - row) * height,
+            columnStride: 1,
+            sliceStride: depth * height,
+        };
+    }
+
+    return {
+        source: volume.data,
+        rowStart: (row: number) => (depth - 1 - row) * planeSize + slice,
+        columnStride: width,
+        sliceStride: 1,
+    };
+}
+
+export function renderSliceToImageData(
+    target: RenderTarget,
+    volume: LoadedVolume,
+    axis: Axis,
+    slice: number,
+    windowCenter: number,
+    windowWidth: number,
+    visualization: RenderVisualizationOptions,
+) {
+    const { width, height } = target;
+    const { scale, offset, maxIndex, colors } = createWindowLookup(
+        volume,
+        windowCenter,
+        windowWidth,
+        visualization,
+    );
+    const { source, rowStart, columnStride } = sliceLayout(
+        volume,
+        axis,
+        slice,
+    );
+    const voxelScale = scale * volume.rescaleSlope;
+    const voxelOffset = volume.rescaleIntercept * scale + offset;
+    const pixels = new Uint32Array(
+        target.data.buffer,
+        target.data.byteOffset,
+        width * height,
+    );
+
+    for (let row = 0; row < height; row += 1) {
+        let voxelIndex = rowStart(row);
+        let pixelIndex = row * width;
+        const rowEnd = pixelIndex + width;
+
+        for (; pixelIndex < rowEnd; pixelIndex += 1) {
+            let index = source[voxelIndex] * voxelScale + voxelOffset;
+            if (index < 0) index = 0;
+            else if (index > maxIndex) index = maxIndex;
+            pixels[pixelIndex] = colors[index | 0];
+            voxelIndex += columnStride;
+        }
+    }
+}
+
+export function renderSliceToCanvas(
+    canvas: RenderCanvas,
+    volume: LoadedVolume,
+    axis: Axis,
+    slice: number,
+    windowCenter: number,
+    windowWidth: number,
+    visualization: RenderVisualizationOptions,
+) {
+    const size = getSliceSize(volume, axis);
+    const context = canvas.getContext("2d");
+
+    if (!context) return;
+
+    if (canvas.width !== size.width || canvas.height !== size.height) {
+        canvas.width = size.width;
+        canvas.height = size.height;
+    }
+
+    const cachedImageData = canvasImageData.get(canvas);
+    const imageData =
+        cachedImageData &&
+        cachedImageData.width === size.width &&
+        cachedImageData.height === size.height
+            ? cachedImageData
+            : context.createImageData(size.width, size.height);
+
+    canvasImageData.set(canvas, imageData);
+    renderSliceToImageData(
+        imageData,
+        volume,
+        axis,
+        slice,
+        windowCenter,
+        windowWidth,
+        visualization,
+    );
+    context.putImageData(imageData, 0, 0);
+}
+
+export function createSlabAccumulator(): SlabAccumulator {
+    return {
+        key: "",
+        start: 0,
+        end: 0,
+        offsets: new Uint32Array(0),
+        values: new Float32Array(0),
+        sources: new Int32Array(0),
+        sums: new Float64Array(0),
+    };
+}
+
+// The slab is centred on the current slice and shifted, not shrunk, at the
+// ends of the volume.
+export function getSlabRange(
+    volume: Volume,
+    axis: Axis,
+    slice: number,
+    thickness: number,
+) {
+    const sliceCount = getSliceCount(volume, axis);
+    const size = Math.min(Math.max(Math.round(thickness), 1), sliceCount);
+    const start = Math.min(
+        Math.max(slice - Math.floor((size - 1) / 2), 0),
+        sliceCount - size,
     );
+    return { start, end: start + size };
+}
+
+function resetSlab(
+    accumulator: SlabAccumulator,
+    volume: LoadedVolume,
+    axis: Axis,
+    key: string,
+) {
+    const { width, height } = getSliceSize(volume, axis);
+    const { rowStart, columnStride } = sliceLayout(volume, axis, 0);
+    const pixelCount = width * height;
+
+    if (accumulator.values.length !== pixelCount) {
+        accumulator.offsets = new Uint32Array(pixelCount);
+        accumulator.values = new Float32Array(pixelCount);
+        accumulator.sources = new Int32Array(pixelCount);
+        accumulator.sums = new Float64Array(pixelCount);
+    }
+
+    for (let row = 0; row < height; row += 1) {
+        let voxelIndex = rowStart(row);
+
+        for (let column = 0; column < width; column += 1) {
+            accumulator.offsets[row * width + column] = voxelIndex;
+            voxelIndex += columnStride;
+        }
+    }
+
+    accumulator.volume = volume;
+    accumulator.key = key;
+    accumulator.start = 0;
+    accumulator.end = 0;
+    accumulator.sources.fill(-1);
+    accumulator.sums.fill(0);
+}
+
+// Folds one slice into the projection. Ties go to the newer slice, so a
+// flat background keeps pointing at the leading edge while scrolling.
+function addSlabSlice(
+    accumulator: SlabAccumulator,
+    source: LoadedVolume["data"],
+    mode: SlabOptions["mode"],
+    slice: number,
+    sliceStride: number,
+) {
+    const { offsets, values, sources, sums } = accumulator;
+    const base = slice * sliceStride;
+
+    for (let pixel = 0; pixel < offsets.length; pixel += 1) {
+        const value = source[base + offsets[pixel]];
+
+        if (mode === "avgip") {
+            sums[pixel] += value;
+        } else if (
+            sources[pixel] < 0 ||
+            (mode === "mip" ? value >= values[pixel] : value <= values[pixel])
+        ) {
+            values[pixel] = value;
+            sources[pixel] = slice;
+        }
+    }
+}
+
+function removeSlabSlice(
+    accumulator: SlabAccumulator,
+    source: LoadedVolume["data"],
+    mode: SlabOptions["mode"],
+    slice: number,
+    sliceStride: number,
+    forward: boolean,
+) {
+    const { offsets, values, sources, sums, start, end } = accumulator;
+    const base = slice * sliceStride;
+
+    for (let pixel = 0; pixel < offsets.length; pixel += 1) {
+        if (mode === "avgip") {
+            sums[pixel] -= source[base + offsets[pixel]];
+            continue;
+        }
+
+        if (sources[pixel] !== slice) continue;
+
+        // Rescan this pixel towards the leading edge so ties keep favouring
+        // the newest slice.
+        let best = 0;
+        let bestSlice = -1;
+        for (let step = 0; step < end - start; step += 1) {
+            const candidate = forward ? start + step : end - 1 - step;
+            const value = source[candidate * sliceStride + offsets[pixel]];
+            if (
+                bestSlice < 0 ||
+                (mode === "mip" ? value >= best : value <= best)
+            ) {
+                best = value;
+                bestSlice = candidate;
+            }
+        }
+
+        values[pixel] = best;
+        sources[pixel] = bestSlice;
+    }
+}
+
+// Moves the accumulated slab to the range around `slice`. Overlapping
+// ranges only add the slices that entered and drop the ones that left, so
+// scrolling by one slice costs one slice read regardless of thickness.
+export function updateSlabAccumulator(
+    accumulator: SlabAccumulator,
+    volume: LoadedVolume,
+    axis: Axis,
+    slice: number,
+    slab: SlabOptions,
+) {
+    const { start, end } = getSlabRange(volume, axis, slice, slab.thickness);
+    const key = `${axis}:${slab.mode}`;
+    const { source, sliceStride } = sliceLayout(volume, axis, 0);
+    const overlaps =
+        accumulator.volume === volume &&
+        accumulator.key === key &&
+        start < accumulator.end &&
+        end > accumulator.start;
+
+    if (!overlaps) {
+        resetSlab(accumulator, volume, axis, key);
+        accumulator.start = start;
+        accumulator.end = end;
+        for (let index = start; index < end; index += 1) {
+            addSlabSlice(accumulator, source, slab.mode, index, sliceStride);
+        }
+    } else if (start !== accumulator.start || end !== accumulator.end) {
+        const previousStart = accumulator.start;
+        const previousEnd = accumulator.end;
+        const forward = start + end >= previousStart + previousEnd;
+        accumulator.start = start;
+        accumulator.end = end;
 
-    for (let row = 0; row < size.height; row += 1) {
-        for (let column = 0; column < size.width; column += 1) {
-            const depthRow = volume.dimensions[2] - 1 - row;
-            const value =
-                axis === "axial"
-                    ? getVoxel(volume, column, row, slice)
-                    : axis === "coronal"
-                      ? getVoxel(volume, column, slice, depthRow)
-                      : getVoxel(volume, slice, column, depthRow);
-            const clippedValue = Math.min(Math.max(value, rangeLow), rangeHigh);
-            const normalized = (clippedValue - rangeLow) / safeRange;
-            const pixelIndex = (row * size.width + column) * 4;
-
-            if (volume.renderMode === "difference") {
-                writeDifferencePixel(
-                    imageData,
-                    pixelIndex,
-                    value,
-                    maxAbsDifference,
-                );
-                continue;
+        const entering: number[] = [];
+        for (let index = start; index < end; index += 1) {
+            if (index < previousStart || index >= previousEnd) {
+                entering.push(index);
             }
+        }
+        if (!forward) entering.reverse();
+        for (const index of entering) {
+            addSlabSlice(accumulator, source, slab.mode, index, sliceStride);
+        }
 
-            const pixel = colorFromMap(visualization.colorMap, normalized);
-            writePixel(
-                imageData,
-                pixelIndex,
-                pixel.red,
-                pixel.green,
-                pixel.blue,
+        for (let index = previousStart; index < previousEnd; index += 1) {
+            if (index >= start && index < end) continue;
+            removeSlabSlice(
+                accumulator,
+                source,
+                slab.mode,
+                index,
+                sliceStride,
+                forward,
             );
         }
     }
 
-    context.putImageData(imageData, 0, 0);
+    if (slab.mode === "avgip") {
+        const { values, sums } = accumulator;
+        const count = end - start;
+        for (let pixel = 0; pixel < values.length; pixel += 1) {
+            values[pixel] = sums[pixel] / count;
+        }
+    }
+
+    return accumulator.values;
+}
+
+export function renderSlabToImageData(
+    target: RenderTarget,
+    volume: LoadedVolume,
+    axis: Axis,
+    slice: number,
+    windowCenter: number,
+    windowWidth: number,
+    visualization: RenderVisualizationOptions,
+    slab: SlabOptions,
+    accumulator: SlabAccumulator,
+) {
+    const values = updateSlabAccumulator(
+        accumulator,
+        volume,
+        axis,
+        slice,
+        slab,
+    );
+    const { scale, offset, maxIndex, colors } = createWindowLookup(
+        volume,
+        windowCenter,
+        windowWidth,
+        visualization,
+    );
+    const voxelScale = scale * volume.rescaleSlope;
+    const voxelOffset = volume.rescaleIntercept * scale + offset;
+    const pixels = new Uint32Array(
+        target.data.buffer,
+        target.data.byteOffset,
+        target.width * target.height,
+    );
+
+    for (let pixel = 0; pixel < pixels.length; pixel += 1) {
+        let index = values[pixel] * voxelScale + voxelOffset;
+        if (index < 0) index = 0;
+        else if (index > maxIndex) index = maxIndex;
+        pixels[pixel] = colors[index | 0];
+    }
 }
@@ -0,0 +1,26 @@
+import {
+    createResampleOutput,
+    resampleInTiles,
+    type ResampleMessage,
+    type ResampleRequest,
+} from "./resampling";
+
+globalThis.addEventListener(
+    "message",
+    (event: MessageEvent<ResampleRequest>) => {
+        const request = event.data;
+        const data = createResampleOutput(request.targetDimensions);
+        const post = (
+            message: ResampleMessage,
+            transfer: Transferable[] = [],
+        ) => globalThis.postMessage(message, { transfer });
+
+        resampleInTiles(request, data, ({ current, total }) =>
+            post({ type: "progress", current, total }),
+        );
+        post(
+            { type: "done", data },
+            data.buffer instanceof ArrayBuffer ? [data.buffer] : [],
+        );
+    },
+);
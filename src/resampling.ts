@@ -0,0 +1,301 @@
+import type { LoadedVolume, Volume, VoxelData } from "./types";
+import { shareVolumeData } from "./voxels";
+
+export type ResampleRequest = {
+    source: VoxelData;
+    sourceDimensions: [number, number, number];
+    rescaleSlope: number;
+    rescaleIntercept: number;
+    fillValue: number;
+    targetDimensions: [number, number, number];
+    sourceFromTarget: number[];
+};
+
+export type ResampleMessage =
+    | { type: "progress"; current: number; total: number }
+    | { type: "done"; data: Float32Array };
+
+export type ResampleBuild = {
+    volume: Promise<LoadedVolume>;
+    cancel: () => void;
+};
+
+type ResampleProgress = {
+    current: number;
+    total: number;
+};
+
+const TILE_VOXELS = 4 * 1024 * 1024;
+const IDENTITY_TOLERANCE = 1e-4;
+
+let registeredVolumeCount = 0;
+
+export const IDENTITY_AFFINE = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0];
+
+export function invertAffine(affine: number[]) {
+    const [a, b, c, tx, d, e, f, ty, g, h, i, tz] = affine;
+    const determinant =
+        a * (e * i - f * h) - b * (d * i - f * g) + c * (d * h - e * g);
+    if (Math.abs(determinant) < 1e-12) return undefined;
+
+    const inverse = [
+        (e * i - f * h) / determinant,
+        (c * h - b * i) / determinant,
+        (b * f - c * e) / determinant,
+        (f * g - d * i) / determinant,
+        (a * i - c * g) / determinant,
+        (c * d - a * f) / determinant,
+        (d * h - e * g) / determinant,
+        (b * g - a * h) / determinant,
+        (a * e - b * d) / determinant,
+    ];
+
+    return [0, 1, 2].flatMap((row) => {
+        const [r0, r1, r2] = inverse.slice(row * 3, row * 3 + 3);
+        return [r0, r1, r2, -(r0 * tx + r1 * ty + r2 * tz)];
+    });
+}
+
+export function composeAffines(outer: number[], inner: number[]) {
+    return [0, 1, 2].flatMap((row) => {
+        const [o0, o1, o2, ot] = outer.slice(row * 4, row * 4 + 4);
+        return [0, 1, 2, 3].map(
+            (column) =>
+                o0 * inner[column] +
+                o1 * inner[4 + column] +
+                o2 * inner[8 + column] +
+                (column === 3 ? ot : 0),
+        );
+    });
+}
+
+function extentFitTransform(target: Volume, source: Volume) {
+    const scale = [0, 1, 2].map((axis) =>
+        target.dimensions[axis] > 1
+            ? (source.dimensions[axis] - 1) / (target.dimensions[axis] - 1)
+            : 0,
+    );
+    return [scale[0], 0, 0, 0, 0, scale[1], 0, 0, 0, 0, scale[2], 0];
+}
+
+// Maps target voxel indices to source voxel indices through patient space.
+// Volumes without geometry (such as NPY) are stretched to the same extent,
+// which keeps the index-ratio pairing used before spacing was known.
+export function sourceFromTargetTransform(target: Volume, source: Volume) {
+    const sourceFromWorld = source.affine && invertAffine(source.affine);
+
+    return target.affine && sourceFromWorld
+        ? composeAffines(sourceFromWorld, target.affine)
+        : extentFitTransform(target, source);
+}
+
+export function needsResampling(target: Volume, source: Volume) {
+    const sameShape = target.dimensions.every(
+        (size, axis) => size === source.dimensions[axis],
+    );
+    if (!sameShape) return true;
+
+    const transform = sourceFromTargetTransform(target, source);
+    return transform.some(
+        (value, index) =>
+            Math.abs(value - IDENTITY_AFFINE[index]) > IDENTITY_TOLERANCE,
+    );
+}
+
+// Trilinear interpolation of the source at each target voxel in slices
+// [zStart, zEnd); samples outside the source grid take the fill value.
+export function resampleTile(
+    request: ResampleRequest,
+    output: Float32Array,
+    zStart: number,
+    zEnd: number,
+) {
+    const { source, sourceDimensions, sourceFromTarget: m } = request;
+    const [width, height, depth] = sourceDimensions;
+    const [targetWidth, targetHeight] = request.targetDimensions;
+    const planeSize = width * height;
+    const { rescaleSlope, rescaleIntercept, fillValue } = request;
+    const maxX = width - 1;
+    const maxY = height - 1;
+    const maxZ = depth - 1;
+    let target = zStart * targetWidth * targetHeight;
+
+    for (let z = zStart; z < zEnd; z += 1) {
+        for (let y = 0; y < targetHeight; y += 1) {
+            let sx = m[1] * y + m[2] * z + m[3];
+            let sy = m[5] * y + m[6] * z + m[7];
+            let sz = m[9] * y + m[10] * z + m[11];
+
+            for (let x = 0; x < targetWidth; x += 1) {
+                if (
+                    sx < 0 ||
+                    sy < 0 ||
+                    sz < 0 ||
+                    sx > maxX ||
+                    sy > maxY ||
+                    sz > maxZ
+                ) {
+                    output[target] = fillValue;
+                } else {
+                    const x0 = Math.floor(sx);
+                    const y0 = Math.floor(sy);
+                    const z0 = Math.floor(sz);
+                    const fx = sx - x0;
+                    const fy = sy - y0;
+                    const fz = sz - z0;
+                    const dx = x0 < maxX ? 1 : 0;
+                    const dy = y0 < maxY ? width : 0;
+                    const dz = z0 < maxZ ? planeSize : 0;
+                    const base = z0 * planeSize + y0 * width + x0;
+                    const c00 =
+                        source[base] + (source[base + dx] - source[base]) * fx;
+                    const c10 =
+                        source[base + dy] +
+                        (source[base + dy + dx] - source[base + dy]) * fx;
+                    const c01 =
+                        source[base + dz] +
+                        (source[base + dz + dx] - source[base + dz]) * fx;
+                    const c11 =
+                        source[base + dz + dy] +
+                        (source[base + dz + dy + dx] - source[base + dz + dy]) *
+                            fx;
+                    const c0 = c00 + (c10 - c00) * fy;
+                    const c1 = c01 + (c11 - c01) * fy;
+                    output[target] =
+                        (c0 + (c1 - c0) * fz) * rescaleSlope + rescaleIntercept;
+                }
+
+                target += 1;
+                sx += m[0];
+                sy += m[4];
+                sz += m[8];
+            }
+        }
+    }
+}
+
+export function resampleInTiles(
+    request: ResampleRequest,
+    output: Float32Array,
+    onProgress: (progress: ResampleProgress) => void,
+) {
+    const [width, height, depth] = request.targetDimensions;
+    const tileSlices = Math.max(
+        Math.floor(TILE_VOXELS / Math.max(width * height, 1)),
+        1,
+    );
+
+    for (let z = 0; z < depth; z += tileSlices) {
+        const zEnd = Math.min(z + tileSlices, depth);
+        resampleTile(request, output, z, zEnd);
+        onProgress({ current: zEnd, total: depth });
+    }
+}
+
+export function createResampleOutput(dimensions: [number, number, number]) {
+    const length = dimensions[0] * dimensions[1] * dimensions[2];
+    const bytes = length * Float32Array.BYTES_PER_ELEMENT;
+    return typeof SharedArrayBuffer === "undefined"
+        ? new Float32Array(length)
+        : new Float32Array(new SharedArrayBuffer(bytes));
+}
+
+function resampledVolume(
+    target: LoadedVolume,
+    source: LoadedVolume,
+    data: Float32Array,
+    registered: boolean,
+): LoadedVolume {
+    // Each registration gets its own id so slice caches keyed by volume id
+    // never serve pixels from an earlier alignment.
+    const id = registered
+        ? `registered:${(registeredVolumeCount += 1)}:${target.id}:${source.id}`
+        : `resampled:${target.id}:${source.id}`;
+
+    return {
+        ...source,
+        id,
+        name: `${source.name} (${registered ? "registered" : "resampled"})`,
+        dimensions: target.dimensions,
+        affine: target.affine,
+        data,
+        rescaleSlope: 1,
+        rescaleIntercept: 0,
+        sourcePath: undefined,
+        sourceFiles: undefined,
+        cacheKey: undefined,
+        voxelLayout: undefined,
+        slicePlanes: undefined,
+        pyramid: undefined,
+    };
+}
+
+// Puts the source volume onto the target volume's grid in a dedicated
+// worker. The output is written tile by tile; cancelling terminates it.
+// A registration transform, when given, replaces the geometric mapping.
+export function resampleVolume(
+    target: LoadedVolume,
+    source: LoadedVolume,
+    onProgress: (progress: ResampleProgress) => void,
+    registration?: number[],
+): ResampleBuild {
+    const transform =
+        registration ?? sourceFromTargetTransform(target, source);
+    const registered = registration !== undefined;
+    const request: ResampleRequest = {
+        source: shareVolumeData(source).data,
+        sourceDimensions: source.dimensions,
+        rescaleSlope: source.rescaleSlope,
+        rescaleIntercept: source.rescaleIntercept,
+        fillValue: source.min,
+        targetDimensions: target.dimensions,
+        sourceFromTarget: transform,
+    };
+
+    if (typeof Worker === "undefined") {
+        const data = createResampleOutput(target.dimensions);
+        resampleInTiles(request, data, onProgress);
+        return {
+            volume: Promise.resolve(
+                resampledVolume(target, source, data, registered),
+            ),
+            cancel: () => undefined,
+        };
+    }
+
+    const worker = new Worker(new URL("./resampleWorker.ts", import.meta.url), {
+        type: "module",
+    });
+    let rejectVolume: (error: Error) => void = () => undefined;
+
+    const volume = new Promise<LoadedVolume>((resolve, reject) => {
+        rejectVolume = reject;
+        worker.addEventListener(
+            "message",
+            (event: MessageEvent<ResampleMessage>) => {
+                const message = event.data;
+                if (message.type === "progress") {
+                    onProgress(message);
+                    return;
+                }
+
+                resolve(
+                    resampledVolume(target, source, message.data, registered),
+                );
+            },
+        );
+        worker.addEventListener("error", (event) => {
+            event.preventDefault();
+            reject(new Error(event.message || "Resampling failed."));
+        });
+        worker.postMessage(request);
+    }).finally(() => worker.terminate());
+
+    return {
+        volume,
+        cancel: () => {
+            worker.terminate();
+            rejectVolume(new Error("Resampling was cancelled."));
+        },
+    };
+}
@@ -0,0 +1,274 @@
+import {
+    createSlabAccumulator,
+    getSliceCount,
+    getSliceSize,
+    renderSlabToImageData,
+    renderSliceToImageData,
+    type RenderCanvas,
+} from "./rendering";
+import type { LoadedVolume } from "./types";
+import type { SliceRenderRequest } from "./viewportRenderer";
+import { previewVolume } from "./volumePyramid";
+
+export type SliceFrameCache = {
+    setVolume: (volume: LoadedVolume) => void;
+    draw: (request: SliceRenderRequest) => void;
+    setBudget: (bytes: number) => void;
+    dispose: () => void;
+};
+
+// Shared by every live viewport; see createViewportRenderer for the split.
+export const MAX_CACHED_FRAME_BYTES = 64 * 1024 * 1024;
+const PREFETCH_AHEAD = 8;
+const PREFETCH_BEHIND = 2;
+
+function viewKey(request: SliceRenderRequest) {
+    const { colorMap, clipMin, clipMax } = request.visualization;
+    return [
+        request.axis,
+        request.windowCenter,
+        request.windowWidth,
+        colorMap,
+        clipMin,
+        clipMax,
+    ].join(":");
+}
+
+function scheduleIdle(callback: () => void) {
+    if (typeof requestIdleCallback === "function") {
+        const handle = requestIdleCallback(callback);
+        return () => cancelIdleCallback(handle);
+    }
+
+    const handle = setTimeout(callback, 0);
+    return () => clearTimeout(handle);
+}
+
+// Rendered frames are kept per viewport for the current volume and view
+// settings, so scrolling back over recent slices only copies pixels. After
+// each draw, idle time renders the next slices in the scroll direction.
+export function createSliceFrameCache(
+    canvas: RenderCanvas,
+    budgetBytes = MAX_CACHED_FRAME_BYTES,
+): SliceFrameCache {
+    const frames = new Map<number, ImageData>();
+    let volume: LoadedVolume | undefined;
+    let currentViewKey = "";
+    let frameBytes = 0;
+    let lastSlice: number | undefined;
+    let direction = 1;
+    let cancelPrefetch: (() => void) | undefined;
+    let previewFrame: ImageData | undefined;
+    let slabFrame: ImageData | undefined;
+    let slabAccumulator = createSlabAccumulator();
+
+    const clearFrames = () => {
+        frames.clear();
+        frameBytes = 0;
+    };
+
+    const trimFrames = (keepSlice?: number) => {
+        for (const [cachedSlice, cachedFrame] of frames) {
+            if (frameBytes <= budgetBytes) break;
+            if (cachedSlice === keepSlice) continue;
+            frames.delete(cachedSlice);
+            frameBytes -= cachedFrame.data.byteLength;
+        }
+    };
+
+    const rememberFrame = (slice: number, frame: ImageData) => {
+        frames.set(slice, frame);
+        frameBytes += frame.data.byteLength;
+        trimFrames(slice);
+    };
+
+    const frameFor = (request: SliceRenderRequest, slice: number) => {
+        const cached = frames.get(slice);
+        if (cached) {
+            frames.delete(slice);
+            frames.set(slice, cached);
+            return cached;
+        }
+
+        const context = canvas.getContext("2d");
+        if (!volume || !context) return undefined;
+
+        const size = getSliceSize(volume, request.axis);
+        const frame = context.createImageData(size.width, size.height);
+        renderSliceToImageData(
+            frame,
+            volume,
+            request.axis,
+            slice,
+            request.windowCenter,
+            request.windowWidth,
+            request.visualization,
+        );
+        rememberFrame(slice, frame);
+        return frame;
+    };
+
+    // Interactive frames come from a downsampled pyramid level and are drawn
+    // into a smaller canvas that CSS scales up; they are never cached.
+    const drawPreview = (request: SliceRenderRequest) => {
+        const context = canvas.getContext("2d");
+        const preview = volume && previewVolume(volume, request.axis);
+        if (!preview || !context) return false;
+
+        const factor = preview.pyramid?.[0].factor ?? 1;
+        const slice = Math.min(
+            Math.floor(request.slice / factor),
+            getSliceCount(preview, request.axis) - 1,
+        );
+        const size = getSliceSize(preview, request.axis);
+        if (
+            !previewFrame ||
+            previewFrame.width !== size.width ||
+            previewFrame.height !== size.height
+        ) {
+            previewFrame = context.createImageData(size.width, size.height);
+        }
+
+        renderSliceToImageData(
+            previewFrame,
+            preview,
+            request.axis,
+            slice,
+            request.windowCenter,
+            request.windowWidth,
+            request.visualization,
+        );
+        if (canvas.width !== size.width || canvas.height !== size.height) {
+            canvas.width = size.width;
+            canvas.height = size.height;
+        }
+
+        context.putImageData(previewFrame, 0, 0);
+        return true;
+    };
+
+    // Slab projections are not cached per slice: the accumulator moves with
+    // the scroll position, and window changes only recolor its values.
+    const drawSlab = (request: SliceRenderRequest) => {
+        const context = canvas.getContext("2d");
+        if (!volume || !context || !request.slab) return;
+
+        const size = getSliceSize(volume, request.axis);
+        if (
+            !slabFrame ||
+            slabFrame.width !== size.width ||
+            slabFrame.height !== size.height
+        ) {
+            slabFrame = context.createImageData(size.width, size.height);
+        }
+
+        renderSlabToImageData(
+            slabFrame,
+            volume,
+            request.axis,
+            request.slice,
+            request.windowCenter,
+            request.windowWidth,
+            request.visualization,
+            request.slab,
+            slabAccumulator,
+        );
+        if (canvas.width !== size.width || canvas.height !== size.height) {
+            canvas.width = size.width;
+            canvas.height = size.height;
+        }
+
+        context.putImageData(slabFrame, 0, 0);
+    };
+
+    const prefetch = (request: SliceRenderRequest) => {
+        if (!volume) return;
+
+        const sliceCount = getSliceCount(volume, request.axis);
+        const pending: number[] = [];
+
+        for (let step = 1; step <= PREFETCH_AHEAD; step += 1) {
+            pending.push(request.slice + direction * step);
+        }
+
+        for (let step = 1; step <= PREFETCH_BEHIND; step += 1) {
+            pending.push(request.slice - direction * step);
+        }
+
+        const renderNext = () => {
+            cancelPrefetch = undefined;
+            const slice = pending.shift();
+            if (slice === undefined) return;
+
+            if (slice >= 0 && slice < sliceCount && !frames.has(slice)) {
+                frameFor(request, slice);
+            }
+
+            cancelPrefetch = scheduleIdle(renderNext);
+        };
+
+        cancelPrefetch = scheduleIdle(renderNext);
+    };
+
+    return {
+        setVolume: (nextVolume) => {
+            if (nextVolume === volume) return;
+
+            volume = nextVolume;
+            lastSlice = undefined;
+            clearFrames();
+        },
+        draw: (request) => {
+            cancelPrefetch?.();
+            cancelPrefetch = undefined;
+
+            if (request.slab) {
+                drawSlab(request);
+                return;
+            }
+
+            if (request.interactive && drawPreview(request)) return;
+
+            const context = canvas.getContext("2d");
+            if (!volume || !context) return;
+
+            const nextViewKey = viewKey(request);
+            if (nextViewKey !== currentViewKey) {
+                currentViewKey = nextViewKey;
+                lastSlice = undefined;
+                clearFrames();
+            }
+
+            if (lastSlice !== undefined && request.slice !== lastSlice) {
+                direction = request.slice > lastSlice ? 1 : -1;
+            }
+            lastSlice = request.slice;
+
+            const frame = frameFor(request, request.slice);
+            if (!frame) return;
+
+            if (
+                canvas.width !== frame.width ||
+                canvas.height !== frame.height
+            ) {
+                canvas.width = frame.width;
+                canvas.height = frame.height;
+            }
+
+            context.putImageData(frame, 0, 0);
+            prefetch(request);
+        },
+        setBudget: (bytes) => {
+            budgetBytes = bytes;
+            trimFrames();
+        },
+        dispose: () => {
+            cancelPrefetch?.();
+            cancelPrefetch = undefined;
+            clearFrames();
+            previewFrame = undefined;
+            slabFrame = undefined;
+            slabAccumulator = createSlabAccumulator();
+        },
+    };
+}
@@ -0,0 +1,18 @@
+import {
+    createSlicePlane,
+    transposeSlicePlane,
+    type SlicePlaneRequest,
+} from "./slicePlanes";
+
+globalThis.addEventListener(
+    "message",
+    (event: MessageEvent<SlicePlaneRequest>) => {
+        const { data, dimensions, axis } = event.data;
+        const plane = createSlicePlane(data);
+
+        transposeSlicePlane(data, dimensions, axis, plane);
+        globalThis.postMessage(plane, {
+            transfer: plane.buffer instanceof ArrayBuffer ? [plane.buffer] : [],
+        });
+    },
+);
@@ -0,0 +1,118 @@
+import type {
+    LoadedVolume,
+    SlicePlaneAxis,
+    Volume,
+    VoxelData,
+} from "./types";
+import { toSharedVoxelData, voxelArrayConstructor } from "./voxels";
+
+export type SlicePlaneRequest = {
+    data: VoxelData;
+    dimensions: [number, number, number];
+    axis: SlicePlaneAxis;
+};
+
+export type SlicePlaneBuild = {
+    plane: Promise<VoxelData>;
+    cancel: () => void;
+};
+
+export function canBuildSlicePlanes() {
+    return typeof Worker !== "undefined";
+}
+
+export function slicePlaneBytes(volume: Volume) {
+    let bytes = 0;
+
+    for (const plane of Object.values(volume.slicePlanes ?? {})) {
+        bytes += plane.byteLength;
+    }
+
+    return bytes;
+}
+
+export function createSlicePlane(data: VoxelData) {
+    const ArrayType = voxelArrayConstructor(data);
+    return typeof SharedArrayBuffer === "undefined"
+        ? new ArrayType(data.length)
+        : new ArrayType(new SharedArrayBuffer(data.byteLength));
+}
+
+// Coronal planes are stored as [y][z][x] and sagittal planes as [x][z][y],
+// so each coronal or sagittal slice is one contiguous run of voxels.
+export function transposeSlicePlane(
+    source: VoxelData,
+    dimensions: [number, number, number],
+    axis: SlicePlaneAxis,
+    output: VoxelData,
+) {
+    const [width, height, depth] = dimensions;
+    const planeSize = width * height;
+
+    if (axis === "coronal") {
+        for (let z = 0; z < depth; z += 1) {
+            for (let y = 0; y < height; y += 1) {
+                const rowStart = z * planeSize + y * width;
+                output.set(
+                    source.subarray(rowStart, rowStart + width),
+                    (y * depth + z) * width,
+                );
+            }
+        }
+        return;
+    }
+
+    const sagittalSize = height * depth;
+
+    for (let z = 0; z < depth; z += 1) {
+        for (let y = 0; y < height; y += 1) {
+            const rowStart = z * planeSize + y * width;
+            let target = z * height + y;
+
+            for (let x = 0; x < width; x += 1) {
+                output[target] = source[rowStart + x];
+                target += sagittalSize;
+            }
+        }
+    }
+}
+
+export function buildSlicePlane(
+    volume: LoadedVolume,
+    axis: SlicePlaneAxis,
+): SlicePlaneBuild {
+    const worker = new Worker(
+        new URL("./slicePlaneWorker.ts", import.meta.url),
+        { type: "module" },
+    );
+    let rejectPlane: (error: Error) => void = () => undefined;
+
+    const plane = new Promise<VoxelData>((resolve, reject) => {
+        rejectPlane = reject;
+        worker.addEventListener(
+            "message",
+            (event: MessageEvent<VoxelData>) => resolve(event.data),
+        );
+        worker.addEventListener("error", (event) => {
+            event.preventDefault();
+            reject(new Error(event.message || "Slice plane build failed."));
+        });
+
+        const request: SlicePlaneRequest = {
+            // Loaded volumes are already shared, so the worker reads the
+            // same memory instead of receiving a structured-clone copy.
+            data: toSharedVoxelData(volume.data),
+            dimensions: volume.dimensions,
+            axis,
+        };
+        worker.postMessage(request);
+    }).finally(() => worker.terminate());
+
+    return {
+        plane,
+        cancel: () => {
+            worker.terminate();
+            rejectPlane(new Error("Slice plane build was cancelled."));
+        },
+    };
+}
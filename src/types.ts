@@ -1,7 +1,11 @@
 export type Axis = "axial" | "coronal" | "sagittal";
 
+export type SlicePlaneAxis = Exclude<Axis, "axial">;
+
 export type VisualizationColorMap = "grayscale" | "hot" | "viridis" | "jet";
 
+export type SlabMode = "slice" | "mip" | "minip" | "avgip";
+
 export type MedicalFile = {
     path: string;
     name: string;
@@ -16,6 +20,38 @@ export type MedicalFileReference = {
 
 export type VolumeFormat = "DICOM" | "NIfTI" | "NPY";
 
+export type VoxelData =
+    | Int8Array
+    | Uint8Array
+    | Int16Array
+    | Uint16Array
+    | Int32Array
+    | Uint32Array
+    | Float32Array;
+
+export type VoxelDataType =
+    | "int8"
+    | "uint8"
+    | "int16"
+    | "uint16"
+    | "int32"
+    | "uint32"
+    | "float32";
+
+export type RawVoxelType = VoxelDataType | "float64";
+
+export type VolumeVoxelLayout = {
+    dataType: RawVoxelType;
+    byteOffset: number;
+    littleEndian: boolean;
+};
+
+export type VolumePyramidLevel = {
+    factor: number;
+    dimensions: [number, number, number];
+    data: VoxelData;
+};
+
 export type VolumeMetadataEntry = {
     tagId: string;
     tagName: string;
@@ -33,18 +69,41 @@ export type Volume = {
     studyId: string;
     seriesId: string;
     dimensions: [number, number, number];
-    data: Float32Array;
+    // Row-major 3x4 transform from voxel indices to LPS patient space in mm.
+    affine?: number[];
+    data?: VoxelData;
+    rescaleSlope: number;
+    rescaleIntercept: number;
     windowCenter: number;
     windowWidth: number;
     min: number;
     max: number;
-    metadata?: VolumeMetadataEntry[];
     renderMode?: "grayscale" | "difference";
+    differenceSources?: [string, string];
     sourcePath?: string;
     sourceFileName?: string;
     sourceParentDir?: string;
+    sourceFiles?: Array<Pick<MedicalFileReference, "path" | "name">>;
     channelIndex?: number;
+    channelCount?: number;
     channelLabel?: string;
+    cacheKey?: string;
+    voxelLayout?: VolumeVoxelLayout;
+    slicePlanes?: Partial<Record<SlicePlaneAxis, VoxelData>>;
+    pyramid?: VolumePyramidLevel[];
+};
+
+export type LoadedVolume = Volume & { data: VoxelData };
+
+export type CachedVolumeData = {
+    dataType: VoxelDataType;
+    bytes: Uint8Array | ArrayBuffer;
+};
+
+export type VolumeCacheUsage = {
+    entries: number;
+    bytes: number;
+    maxBytes: number;
 };
 
 export type StudyNode = {
@@ -67,6 +126,8 @@ export type ViewportState = {
     clipMin: number;
     clipMax: number;
     showColorbar: boolean;
+    slabMode: SlabMode;
+    slabThickness: number;
 };
 
 declare global {
@@ -74,6 +135,23 @@ declare global {
         dcmViewer?: {
             openMedicalFiles: () => Promise<MedicalFileReference[]>;
             readMedicalFile: (path: string) => Promise<MedicalFile>;
+            readMedicalFileRange?: (
+                path: string,
+                offset: number,
+                length: number,
+            ) => Promise<Uint8Array>;
+            openMedicalFileChannel?: () => void;
+            releaseMedicalFiles?: (paths: string[]) => void;
+            volumeCache?: {
+                lookup: (paths: string[]) => Promise<Volume[]>;
+                read: (cacheKey: string) => Promise<CachedVolumeData>;
+                store: (
+                    volume: Volume,
+                    data: CachedVolumeData,
+                ) => Promise<string | undefined>;
+                clear: () => Promise<VolumeCacheUsage>;
+                usage: () => Promise<VolumeCacheUsage>;
+            };
         };
     }
 }
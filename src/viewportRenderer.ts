@@ -0,0 +1,113 @@
+import type { RenderVisualizationOptions, SlabOptions } from "./rendering";
+import {
+    createSliceFrameCache,
+    MAX_CACHED_FRAME_BYTES,
+} from "./sliceFrameCache";
+import type { Axis, LoadedVolume } from "./types";
+import { shareVolumeData } from "./voxels";
+
+export type SliceRenderRequest = {
+    axis: Axis;
+    slice: number;
+    windowCenter: number;
+    windowWidth: number;
+    visualization: RenderVisualizationOptions;
+    interactive?: boolean;
+    slab?: SlabOptions;
+};
+
+export type RenderWorkerMessage =
+    | { type: "canvas"; canvas: OffscreenCanvas }
+    | { type: "volume"; volume: LoadedVolume }
+    | { type: "budget"; bytes: number }
+    | { type: "render"; request: SliceRenderRequest };
+
+export type ViewportRenderer = {
+    setVolume: (volume: LoadedVolume) => void;
+    render: (request: SliceRenderRequest) => void;
+    dispose: () => void;
+};
+
+type FrameCachedRenderer = ViewportRenderer & {
+    setFrameBudget: (bytes: number) => void;
+};
+
+const liveRenderers = new Set<FrameCachedRenderer>();
+
+export function canRenderInWorker() {
+    return (
+        typeof Worker !== "undefined" &&
+        typeof OffscreenCanvas !== "undefined" &&
+        typeof SharedArrayBuffer !== "undefined" &&
+        "transferControlToOffscreen" in HTMLCanvasElement.prototype
+    );
+}
+
+function createWorkerRenderer(
+    canvas: HTMLCanvasElement,
+): FrameCachedRenderer {
+    const worker = new Worker(new URL("./renderWorker.ts", import.meta.url), {
+        type: "module",
+    });
+    const offscreenCanvas = canvas.transferControlToOffscreen();
+    const post = (
+        message: RenderWorkerMessage,
+        transfer: Transferable[] = [],
+    ) => worker.postMessage(message, transfer);
+    let currentVolume: LoadedVolume | undefined;
+
+    post({ type: "canvas", canvas: offscreenCanvas }, [offscreenCanvas]);
+
+    return {
+        setVolume: (volume) => {
+            if (volume === currentVolume) return;
+
+            currentVolume = volume;
+            post({ type: "volume", volume: shareVolumeData(volume) });
+        },
+        render: (request) => post({ type: "render", request }),
+        setFrameBudget: (bytes) => post({ type: "budget", bytes }),
+        dispose: () => worker.terminate(),
+    };
+}
+
+function createMainThreadRenderer(
+    canvas: HTMLCanvasElement,
+): FrameCachedRenderer {
+    const frames = createSliceFrameCache(canvas);
+
+    return {
+        setVolume: frames.setVolume,
+        render: frames.draw,
+        setFrameBudget: frames.setBudget,
+        dispose: frames.dispose,
+    };
+}
+
+function splitFrameBudget() {
+    const share = Math.floor(MAX_CACHED_FRAME_BYTES / liveRenderers.size);
+    for (const renderer of liveRenderers) renderer.setFrameBudget(share);
+}
+
+// The frame cache cap covers all viewports, wherever they render: live
+// renderers split it evenly and are rebalanced as viewports come and go.
+export function createViewportRenderer(
+    canvas: HTMLCanvasElement,
+): ViewportRenderer {
+    const renderer = canRenderInWorker()
+        ? createWorkerRenderer(canvas)
+        : createMainThreadRenderer(canvas);
+    liveRenderers.add(renderer);
+    splitFrameBudget();
+
+    return {
+        setVolume: renderer.setVolume,
+        render: renderer.render,
+        dispose: () => {
+            renderer.dispose();
+            if (liveRenderers.delete(renderer) && liveRenderers.size > 0) {
+                splitFrameBudget();
+            }
+        },
+    };
+}
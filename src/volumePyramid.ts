@@ -0,0 +1,178 @@
+import { getSliceSize } from "./rendering";
+import type {
+    Axis,
+    LoadedVolume,
+    Volume,
+    VolumePyramidLevel,
+    VoxelData,
+} from "./types";
+import { toSharedVoxelData, voxelArrayConstructor } from "./voxels";
+
+export type VolumePyramidRequest = {
+    data: VoxelData;
+    dimensions: [number, number, number];
+};
+
+export type VolumePyramidBuild = {
+    levels: Promise<VolumePyramidLevel[]>;
+    cancel: () => void;
+};
+
+const PYRAMID_FACTORS = [2, 4];
+const PREVIEW_MAX_SLICE_SIZE = 256;
+
+export function canBuildVolumePyramid() {
+    return typeof Worker !== "undefined";
+}
+
+export function needsVolumePyramid(volume: Volume) {
+    return Math.max(...volume.dimensions) > PREVIEW_MAX_SLICE_SIZE;
+}
+
+// The 2x and 4x levels hold 1/8 and 1/64 of the source voxels.
+export function estimateVolumePyramidBytes(volume: LoadedVolume) {
+    return Math.ceil((volume.data.byteLength * 9) / 64);
+}
+
+export function volumePyramidBytes(volume: Volume) {
+    let bytes = 0;
+
+    for (const level of volume.pyramid ?? []) {
+        bytes += level.data.byteLength;
+    }
+
+    return bytes;
+}
+
+function downsample(
+    source: VoxelData,
+    [width, height, depth]: [number, number, number],
+    factor: number,
+): VolumePyramidLevel {
+    const dimensions: [number, number, number] = [
+        Math.ceil(width / factor),
+        Math.ceil(height / factor),
+        Math.ceil(depth / factor),
+    ];
+    const [levelWidth, levelHeight, levelDepth] = dimensions;
+    const levelSize = levelWidth * levelHeight * levelDepth;
+    const sums = new Float64Array(levelSize);
+    const counts = new Uint16Array(levelSize);
+    let sourceIndex = 0;
+
+    for (let z = 0; z < depth; z += 1) {
+        const planeStart = Math.floor(z / factor) * levelWidth * levelHeight;
+
+        for (let y = 0; y < height; y += 1) {
+            const rowStart = planeStart + Math.floor(y / factor) * levelWidth;
+
+            for (let x = 0; x < width; x += 1) {
+                const target = rowStart + Math.floor(x / factor);
+                sums[target] += source[sourceIndex];
+                counts[target] += 1;
+                sourceIndex += 1;
+            }
+        }
+    }
+
+    const ArrayType = voxelArrayConstructor(source);
+    const levelBytes = levelSize * ArrayType.BYTES_PER_ELEMENT;
+    const data =
+        typeof SharedArrayBuffer === "undefined"
+            ? new ArrayType(levelSize)
+            : new ArrayType(new SharedArrayBuffer(levelBytes));
+    const rounded = !(source instanceof Float32Array);
+
+    for (let index = 0; index < levelSize; index += 1) {
+        const mean = sums[index] / counts[index];
+        data[index] = rounded ? Math.round(mean) : mean;
+    }
+
+    return { factor, dimensions, data };
+}
+
+// Each level halves the previous one, so the 4x level is averaged from the
+// 2x level rather than from the full-resolution voxels.
+export function downsampleVolumePyramid({
+    data,
+    dimensions,
+}: VolumePyramidRequest) {
+    const levels: VolumePyramidLevel[] = [];
+    let source = { factor: 1, dimensions, data };
+
+    for (const factor of PYRAMID_FACTORS) {
+        if (source.dimensions.every((size) => size <= 1)) break;
+
+        const level = downsample(
+            source.data,
+            source.dimensions,
+            factor / source.factor,
+        );
+        level.factor = factor;
+        levels.push(level);
+        source = level;
+    }
+
+    return levels;
+}
+
+export function previewVolume(
+    volume: LoadedVolume,
+    axis: Axis,
+): LoadedVolume | undefined {
+    const { width, height } = getSliceSize(volume, axis);
+    const sliceSize = Math.max(width, height);
+    if (sliceSize <= PREVIEW_MAX_SLICE_SIZE || !volume.pyramid?.length) {
+        return undefined;
+    }
+
+    const level =
+        volume.pyramid.find(
+            (item) => sliceSize / item.factor <= PREVIEW_MAX_SLICE_SIZE,
+        ) ?? volume.pyramid[volume.pyramid.length - 1];
+
+    return {
+        ...volume,
+        id: `${volume.id}:x${level.factor}`,
+        dimensions: level.dimensions,
+        data: level.data,
+        slicePlanes: undefined,
+        pyramid: [level],
+    };
+}
+
+export function buildVolumePyramid(volume: LoadedVolume): VolumePyramidBuild {
+    const worker = new Worker(
+        new URL("./volumePyramidWorker.ts", import.meta.url),
+        { type: "module" },
+    );
+    let rejectLevels: (error: Error) => void = () => undefined;
+
+    const levels = new Promise<VolumePyramidLevel[]>((resolve, reject) => {
+        rejectLevels = reject;
+        worker.addEventListener(
+            "message",
+            (event: MessageEvent<VolumePyramidLevel[]>) => resolve(event.data),
+        );
+        worker.addEventListener("error", (event) => {
+            event.preventDefault();
+            reject(new Error(event.message || "Volume pyramid build failed."));
+        });
+
+        const request: VolumePyramidRequest = {
+            // Loaded volumes are already shared, so the worker reads the
+            // same memory instead of receiving a structured-clone copy.
+            data: toSharedVoxelData(volume.data),
+            dimensions: volume.dimensions,
+        };
+        worker.postMessage(request);
+    }).finally(() => worker.terminate());
+
+    return {
+        levels,
+        cancel: () => {
+            worker.terminate();
+            rejectLevels(new Error("Volume pyramid build was cancelled."));
+        },
+    };
+}
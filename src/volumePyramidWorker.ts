@@ -0,0 +1,18 @@
+import {
+    downsampleVolumePyramid,
+    type VolumePyramidRequest,
+} from "./volumePyramid";
+
+globalThis.addEventListener(
+    "message",
+    (event: MessageEvent<VolumePyramidRequest>) => {
+        const levels = downsampleVolumePyramid(event.data);
+        globalThis.postMessage(levels, {
+            transfer: levels.flatMap((level) =>
+                level.data.buffer instanceof ArrayBuffer
+                    ? [level.data.buffer]
+                    : [],
+            ),
+        });
+    },
+);
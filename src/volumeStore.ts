@@ -0,0 +1,99 @@
+import { slicePlaneBytes } from "./slicePlanes";
+import type { LoadedVolume, Volume } from "./types";
+import { volumePyramidBytes } from "./volumePyramid";
+import { isVolumeLoaded, volumeSourcePaths } from "./voxels";
+
+export const DEFAULT_MEMORY_BUDGET_MB = 2048;
+export const MIN_MEMORY_BUDGET_MB = 256;
+
+type EvictionOptions = {
+    budgetBytes: number;
+    inUse: Set<string>;
+    lastUsed: Map<string, number>;
+};
+
+function derivedBytes(volume: Volume) {
+    return slicePlaneBytes(volume) + volumePyramidBytes(volume);
+}
+
+// Channels of a 4D NPY are views over one tensor buffer, so voxel bytes are
+// counted once per distinct buffer rather than once per volume.
+export function residentVolumeBytes(volumes: Volume[]) {
+    const buffers = new Set<ArrayBufferLike>();
+    let bytes = 0;
+
+    for (const volume of volumes) {
+        bytes += derivedBytes(volume);
+        if (!volume.data || buffers.has(volume.data.buffer)) continue;
+        buffers.add(volume.data.buffer);
+        bytes += volume.data.buffer.byteLength;
+    }
+
+    return bytes;
+}
+
+export function canReloadVolume(volume: Volume) {
+    return (
+        volume.cacheKey !== undefined || volumeSourcePaths(volume).length > 0
+    );
+}
+
+export function touchVolumes(
+    lastUsed: Map<string, number>,
+    volumeIds: Iterable<string>,
+) {
+    const now = performance.now();
+
+    for (const volumeId of volumeIds) {
+        lastUsed.set(volumeId, now);
+    }
+}
+
+export function evictVolumesOverBudget(
+    volumes: Volume[],
+    { budgetBytes, inUse, lastUsed }: EvictionOptions,
+) {
+    let residentBytes = residentVolumeBytes(volumes);
+    if (residentBytes <= budgetBytes) return volumes;
+
+    // Volumes sharing a buffer only free it together, so they are evicted
+    // as one group, and only when none of them is in use.
+    const groups = new Map<ArrayBufferLike, LoadedVolume[]>();
+
+    for (const volume of volumes) {
+        if (!isVolumeLoaded(volume)) continue;
+        const group = groups.get(volume.data.buffer);
+        if (group) group.push(volume);
+        else groups.set(volume.data.buffer, [volume]);
+    }
+
+    const groupLastUsed = (group: LoadedVolume[]) =>
+        Math.max(...group.map((volume) => lastUsed.get(volume.id) ?? 0));
+    const candidates = [...groups.values()]
+        .filter((group) =>
+            group.every(
+                (volume) => !inUse.has(volume.id) && canReloadVolume(volume),
+            ),
+        )
+        .sort((left, right) => groupLastUsed(left) - groupLastUsed(right));
+    const evicted = new Set<string>();
+
+    for (const group of candidates) {
+        if (residentBytes <= budgetBytes) break;
+        residentBytes -= residentVolumeBytes(group);
+        for (const volume of group) evicted.add(volume.id);
+    }
+
+    if (evicted.size === 0) return volumes;
+
+    return volumes.map((volume) =>
+        evicted.has(volume.id)
+            ? {
+                  ...volume,
+                  data: undefined,
+                  slicePlanes: undefined,
+                  pyramid: undefined,
+              }
+            : volume,
+    );
+}
@@ -0,0 +1,200 @@
+import type {
+    LoadedVolume,
+    RawVoxelType,
+    Volume,
+    VoxelData,
+    VoxelDataType,
+} from "./types";
+
+export type VoxelArrayConstructor = {
+    new (length: number): VoxelData;
+    new (
+        buffer: ArrayBufferLike,
+        byteOffset?: number,
+        length?: number,
+    ): VoxelData;
+    BYTES_PER_ELEMENT: number;
+};
+
+type RawVoxelArrayConstructor = {
+    new (
+        buffer: ArrayBufferLike,
+        byteOffset?: number,
+        length?: number,
+    ): VoxelData | Float64Array;
+    BYTES_PER_ELEMENT: number;
+};
+
+export type VoxelRange = {
+    min: number;
+    max: number;
+};
+
+export const littleEndianHost =
+    new Uint8Array(new Uint16Array([1]).buffer)[0] === 1;
+
+const voxelArrayTypes: Record<VoxelDataType, VoxelArrayConstructor> = {
+    int8: Int8Array,
+    uint8: Uint8Array,
+    int16: Int16Array,
+    uint16: Uint16Array,
+    int32: Int32Array,
+    uint32: Uint32Array,
+    float32: Float32Array,
+};
+const rawVoxelArrayTypes: Record<RawVoxelType, RawVoxelArrayConstructor> = {
+    ...voxelArrayTypes,
+    float64: Float64Array,
+};
+
+export function voxelArrayType(type: VoxelDataType) {
+    return voxelArrayTypes[type];
+}
+
+export function voxelArrayConstructor(data: VoxelData) {
+    return data.constructor as VoxelArrayConstructor;
+}
+
+export function swapByteOrder(bytes: Uint8Array, bytesPerValue: number) {
+    for (let start = 0; start < bytes.byteLength; start += bytesPerValue) {
+        for (let low = 0; low < bytesPerValue / 2; low += 1) {
+            const high = start + bytesPerValue - 1 - low;
+            const value = bytes[start + low];
+            bytes[start + low] = bytes[high];
+            bytes[high] = value;
+        }
+    }
+}
+
+export function rawVoxelBytes(type: RawVoxelType) {
+    return rawVoxelArrayTypes[type].BYTES_PER_ELEMENT;
+}
+
+export function decodeRawVoxels(
+    bytes: Uint8Array,
+    type: RawVoxelType,
+    littleEndian: boolean,
+    length: number,
+): VoxelData {
+    const ArrayType = rawVoxelArrayTypes[type];
+    const bytesPerValue = ArrayType.BYTES_PER_ELEMENT;
+    const byteLength = length * bytesPerValue;
+
+    if (bytes.byteLength < byteLength) {
+        throw new Error("Voxel data is smaller than the volume dimensions.");
+    }
+
+    const needsSwap = bytesPerValue > 1 && littleEndian !== littleEndianHost;
+    let values: VoxelData | Float64Array;
+
+    if (!needsSwap && bytes.byteOffset % bytesPerValue === 0) {
+        values = new ArrayType(bytes.buffer, bytes.byteOffset, length);
+    } else {
+        const copied = bytes.slice(0, byteLength);
+        if (needsSwap) swapByteOrder(copied, bytesPerValue);
+        values = new ArrayType(copied.buffer, 0, length);
+    }
+
+    return values instanceof Float64Array ? Float32Array.from(values) : values;
+}
+
+export function rescaleVoxelRange(
+    stored: VoxelRange,
+    slope = 1,
+    intercept = 0,
+): VoxelRange {
+    const low = stored.min * slope + intercept;
+    const high = stored.max * slope + intercept;
+    return slope < 0 ? { min: high, max: low } : { min: low, max: high };
+}
+
+export function getVoxelRange(data: VoxelData, slope = 1, intercept = 0) {
+    let storedMin = Number.POSITIVE_INFINITY;
+    let storedMax = Number.NEGATIVE_INFINITY;
+
+    for (let index = 0; index < data.length; index += 1) {
+        const value = data[index];
+        if (value < storedMin) storedMin = value;
+        if (value > storedMax) storedMax = value;
+    }
+
+    return rescaleVoxelRange(
+        { min: storedMin, max: storedMax },
+        slope,
+        intercept,
+    );
+}
+
+export function isVolumeLoaded(volume: Volume): volume is LoadedVolume {
+    return volume.data !== undefined;
+}
+
+export function volumeSourcePaths(volume: Volume) {
+    if (volume.sourceFiles) {
+        return volume.sourceFiles.map((sourceFile) => sourceFile.path);
+    }
+
+    return volume.sourcePath ? [volume.sourcePath] : [];
+}
+
+export function voxelDataType(data: VoxelData): VoxelDataType {
+    if (data instanceof Int8Array) return "int8";
+    if (data instanceof Uint8Array) return "uint8";
+    if (data instanceof Int16Array) return "int16";
+    if (data instanceof Uint16Array) return "uint16";
+    if (data instanceof Int32Array) return "int32";
+    if (data instanceof Uint32Array) return "uint32";
+    return "float32";
+}
+
+// Loaders allocate voxel data here so the renderer and every worker read the
+// one resident copy through SharedArrayBuffer wherever it is available.
+export function allocateVoxelData(
+    ArrayType: VoxelArrayConstructor,
+    length: number,
+): VoxelData {
+    return typeof SharedArrayBuffer === "undefined"
+        ? new ArrayType(length)
+        : new ArrayType(
+              new SharedArrayBuffer(length * ArrayType.BYTES_PER_ELEMENT),
+          );
+}
+
+// Copies only the viewed voxels of non-shared data, such as a view over the
+// bytes of a file, into shared memory. Loaded volumes are already shared,
+// so this is a no-op for them.
+export function toSharedVoxelData(data: VoxelData): VoxelData {
+    if (
+        typeof SharedArrayBuffer === "undefined" ||
+        data.buffer instanceof SharedArrayBuffer
+    ) {
+        return data;
+    }
+
+    const shared = allocateVoxelData(voxelArrayConstructor(data), data.length);
+    shared.set(data);
+    return shared;
+}
+
+export function shareVolumeData(volume: LoadedVolume): LoadedVolume {
+    const data = toSharedVoxelData(volume.data);
+    return data === volume.data ? volume : { ...volume, data };
+}
+
+export function voxelDataFromBytes(
+    dataType: VoxelDataType,
+    bytes: Uint8Array | ArrayBuffer,
+): VoxelData {
+    const ArrayType = voxelArrayTypes[dataType];
+    const view = bytes instanceof Uint8Array ? bytes : new Uint8Array(bytes);
+
+    if (view.byteOffset % ArrayType.BYTES_PER_ELEMENT === 0) {
+        return new ArrayType(
+            view.buffer,
+            view.byteOffset,
+            view.byteLength / ArrayType.BYTES_PER_ELEMENT,
+        );
+    }
+
+    return new ArrayType(view.slice().buffer);
+}
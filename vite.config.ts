@@ -1,12 +1,33 @@
-import { defineConfig } from "vite";
+import { defineConfig, type Plugin } from "vite";
 import react from "@vitejs/plugin-react";
 import electron from "vite-plugin-electron/simple";
 import { fileURLToPath, URL } from "node:url";
 
 const zlibShimExpression = `({ inflateRawSync: function () { throw new Error("Compressed DICOM transfer syntaxes are not supported yet."); } })`;
 
+const dicomParserZlibShim: Plugin = {
+    name: "dicom-parser-zlib-shim",
+    enforce: "pre",
+    transform(code, id) {
+        if (!id.includes("dicom-parser")) return null;
+
+        return code.replace(/require\(["']zlib["']\)/g, zlibShimExpression);
+    },
+};
+
+const crossOriginIsolationHeaders = {
+    "Cross-Origin-Opener-Policy": "same-origin",
+    "Cross-Origin-Embedder-Policy": "require-corp",
+};
+
 // https://vite.dev/config/
 export default defineConfig({
+    server: {
+        headers: crossOriginIsolationHeaders,
+    },
+    preview: {
+        headers: crossOriginIsolationHeaders,
+    },
     resolve: {
         alias: {
             zlib: fileURLToPath(
@@ -14,19 +35,12 @@ export default defineConfig({
             ),
         },
     },
+    worker: {
+        format: "es",
+        plugins: () => [dicomParserZlibShim],
+    },
     plugins: [
-        {
-            name: "dicom-parser-zlib-shim",
-            enforce: "pre",
-            transform(code, id) {
-                if (!id.includes("dicom-parser")) return null;
-
-                return code.replace(
-                    /require\(["']zlib["']\)/g,
-                    zlibShimExpression,
-                );
-            },
-        },
+        dicomParserZlibShim,
         react(),
         electron({
             main: {